@@ -1,7 +1,32 @@
 # agents.py
-from gemini_agent import llm
-from tools import MealPlanner, TaskOptimizer, CalendarManager, MarkdownBuilder
-from memory import MemoryStore
+import hashlib
+import json
+import threading
+import time
+from datetime import date
+from typing import IO, Any, Callable, Dict, Iterator, List
+
+import registry
+import templates
+import validation
+from calendar_engine import IcsCalendar, load_ics
+from config import LLM_FUSED_MODE, LLM_TEMPLATES, PLAN_DEADLINE_SECONDS, PLAN_VALIDATION, VALIDATION_MAX_REPAIRS
+from fused_plan import (
+    FUSED_GENERATION_CONFIG,
+    FusedPlan,
+    build_fused_prompt,
+    parse_fused_response,
+    section_token_counts,
+)
+from gemini_agent import GEMINI_MODEL_NAME, llm, llm_with_usage
+from horizon import HorizonState, WeekPlan
+from personality_engine import STAGE_DEPENDENCIES, stage_context
+from pipeline import OrderedStreamWriter, Stage, StageGraph
+from tools import LLM_MEAL_PLAN_KEY
+from memory import MemoryStore, user_key
+from resilience import Deadline, with_fallback
+from tracing import annotate, current_span, traced
+from task_engine import Task, load_tasks, prioritize
 
 
 class BaseAgent:
@@ -10,6 +35,7 @@ class BaseAgent:
 
     def log(self, message: str):
         print(f"[{self.name}] {message}")
+        current_span().event(message)
 
 
 class RoutineDesignerAgent(BaseAgent):
@@ -17,18 +43,28 @@ class RoutineDesignerAgent(BaseAgent):
     Builds a personalized daily routine using prefs + personality.
     """
 
-    def generate(self, prefs: dict, personality: dict, use_llm: bool = False) -> str:
+    @traced
+    def generate(
+        self,
+        prefs: dict,
+        personality: dict,
+        use_llm: bool = False,
+        on_chunk: Callable[[str], None] | None = None,
+        problems: List[str] | None = None,
+        use_cache: bool = True
+    ) -> str:
         self.log("Generating daily routine...")
 
         if use_llm:
+            context = stage_context("routine", prefs, personality)
             prompt = f"""
 You are a lifestyle optimization coach.
 
 User preferences:
-{prefs}
+{context["prefs"]}
 
 Behavior profile:
-{personality}
+{context["personality"]}
 
 Task:
 Generate a realistic, healthy, and productive weekday routine.
@@ -39,7 +75,9 @@ Generate a realistic, healthy, and productive weekday routine.
 
 Return the routine as bullet points only.
             """
-            return llm(prompt)
+            # A re-request after a failed validation says what to fix
+            prompt += validation.repair_note(problems)
+            return llm(prompt, use_cache=use_cache, on_chunk=on_chunk)
 
         # Offline fallback: simple deterministic schedule
         routine = []
@@ -56,59 +94,559 @@ Return the routine as bullet points only.
         return "\n".join(routine)
 
 
+# Share of the deadline kept back for calendar merge, scheduling and rendering
+DEADLINE_RESERVE = 0.1
+
+# How stage outputs that are not plain JSON are stored in MemoryStore
+STAGE_CODECS = {
+    "tasks": (
+        lambda tasks: [t.to_dict() for t in tasks],
+        lambda data: [Task.from_dict(d) for d in data],
+    ),
+}
+
+
+def stage_fingerprint(stage: str, prefs: dict, personality: dict, use_llm: bool, fused: bool = False) -> str:
+    """
+    Hash of everything a stage's output depends on: the profile fields its
+    LLM prompt shows (stage_context, which covers what its offline branch
+    reads as well) and the model.
+    """
+    payload = {
+        "model": GEMINI_MODEL_NAME if use_llm else None,
+        "fused": fused and use_llm,
+        **stage_context(stage, prefs, personality),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class FusedPlannerAgent(BaseAgent):
+    """
+    Generates routine, meals, shopping list and tasks with one structured
+    Gemini call (see fused_plan.py).
+    """
+
+    def profile_context(self, prefs: dict, personality: dict) -> dict:
+        """Only the fields the generation stages read, each sent once."""
+        context = {}
+        for deps in STAGE_DEPENDENCIES.values():
+            for f in deps["prefs"]:
+                if f != "tasks" and f in prefs:
+                    context[f] = prefs[f]
+            for f in deps["personality"]:
+                if f in personality:
+                    context[f] = personality[f]
+        return context
+
+    @traced
+    def generate(self, prefs: dict, personality: dict) -> FusedPlan | None:
+        """Return the fused plan, or None if the answer could not be parsed."""
+        self.log("Generating routine, meals and tasks in one call...")
+
+        base_tasks = load_tasks(prefs.get("tasks"))
+        prompt = build_fused_prompt(self.profile_context(prefs, personality), base_tasks)
+        text, usage = llm_with_usage(prompt, generation_config=FUSED_GENERATION_CONFIG)
+        try:
+            plan = parse_fused_response(text, base_tasks)
+        except ValueError as ex:
+            self.log(f"{ex}; falling back to separate prompts")
+            return None
+        plan.usage = section_token_counts(plan, prompt, usage)
+        return plan
+
+
 class OrchestratorAgent(BaseAgent):
     """
     Coordinates all agents, glues everything together.
+    Agents and tools come from the registry and are built on first use.
     """
 
-    def __init__(self, use_llm: bool = False, user_prefs: dict | None = None, personality: dict | None = None):
+    routine_agent = registry.component("routine_agent")
+    fused_planner = registry.component("fused_planner")
+    meal_planner = registry.component("meal_planner")
+    task_optimizer = registry.component("task_optimizer")
+    calendar_manager = registry.component("calendar_manager")
+    markdown_builder = registry.component("markdown_builder")
+
+    def __init__(
+        self,
+        use_llm: bool = False,
+        user_prefs: dict | None = None,
+        personality: dict | None = None,
+        persist_memory: bool = True,
+        incremental: bool = True,
+        fused: bool = LLM_FUSED_MODE,
+        deadline: float | None = PLAN_DEADLINE_SECONDS or None,
+        memory: MemoryStore | None = None,
+        use_templates: bool = LLM_TEMPLATES,
+        validate: bool = PLAN_VALIDATION
+    ):
         super().__init__("Orchestrator")
         self.use_llm = use_llm
+        # One structured LLM call for routine, meals and tasks (LLM mode only)
+        self.fused = fused and use_llm
+        # Latency budget in seconds for one run (None = wait for the LLM)
+        self.deadline = deadline
+        # Serve LLM sections from per-archetype templates where one exists (LLM mode only)
+        self.use_templates = use_templates and use_llm
+        # Check each LLM section and re-request only the ones that fail (LLM mode only)
+        self.validate = validate and use_llm
+        self.max_repairs = VALIDATION_MAX_REPAIRS
+        self.persist_memory = persist_memory
+        # Reusing stored stage outputs only makes sense when we also persist them
+        self.incremental = incremental and persist_memory
         self.prefs = user_prefs or {}
         self.personality = personality or {}
 
-        self.memory = MemoryStore()
+        # A long-lived caller (server.py) shares one store and its connections across plans
+        self.memory = memory or MemoryStore()
 
-        self.routine_agent = RoutineDesignerAgent("RoutineDesigner")
-        self.meal_planner = MealPlanner("MealPlanner")
-        self.task_optimizer = TaskOptimizer("TaskOptimizer")
-        self.calendar_manager = CalendarManager("CalendarSync")
-        self.markdown_builder = MarkdownBuilder("MarkdownBuilder")
+        self.stage_timings: dict = {}
+        self.token_usage: Dict[str, int] = {}
+        # Stages that used the offline result in the last run, with the reason
+        self.fallbacks: Dict[str, str] = {}
+        # Stages whose LLM answer failed validation in the last run, with the number of re-requests
+        self.repairs: Dict[str, int] = {}
+        # Problems found in the last run's merged calendar (conflicting blocks and events)
+        self.conflicts: List[str] = []
+        self._deadline: Deadline | None = None
+        self._templated: Dict[str, Any] = {}
+        # Stages whose LLM call was left running in the background; their streamed chunks are dropped
+        self._abandoned: set = set()
+        self._abandon_lock = threading.Lock()
 
-    def run_full_pipeline(self) -> str:
-        self.log(f"Starting full LifeNavigator pipeline (LLM mode = {self.use_llm})")
+    def build_stage_graph(self) -> StageGraph:
+        """
+        Declare the pipeline as a graph: each stage lists the stages it needs.
+        Routine, meals and tasks are independent and run concurrently; in
+        fused mode they are all read from the single "plan" stage.
+        """
+        return StageGraph(self._plan_stages() + [
+            Stage("calendar", self._calendar, inputs=["routine"]),
+            Stage("schedule", lambda tasks, calendar: self.task_optimizer.schedule_tasks(
+                tasks, calendar, self.prefs, self.personality
+            ), inputs=["tasks", "calendar"]),
+            Stage("markdown", lambda routine, meals, schedule, calendar: self.markdown_builder.build_markdown(
+                self.prefs,
+                self.personality,
+                routine,
+                meals[0],
+                meals[1],
+                schedule,
+                calendar
+            ), inputs=["routine", "meals", "schedule", "calendar"]),
+        ])
+
+    def _start_run(self):
+        self.fallbacks = {}
+        self.repairs = {}
+        self.conflicts = []
+        self.token_usage = {}
+        self._templated = {}
+        self._abandoned = set()
+        self._deadline = Deadline(self.deadline) if self.deadline else None
+
+    def _llm_or_offline(self, stage: str, llm_func: Callable[[], Any], offline_func: Callable[[], Any]):
+        """
+        Run a stage's LLM branch within what is left of the deadline, and use
+        its offline branch if the budget runs out, the call fails or the
+        circuit breaker is open.
+        """
+        if not self.use_llm or "plan" in self.fallbacks:
+            # Offline mode, or the fused call already gave up on the LLM for this run
+            return offline_func()
+        timeout = None
+        if self._deadline is not None:
+            timeout = self._deadline.remaining(reserve=self._deadline.budget * DEADLINE_RESERVE)
+        result, reason = with_fallback(llm_func, offline_func, timeout, on_abandon=lambda: self._abandon(stage))
+        if reason:
+            annotate(fallback=reason)
+            self.fallbacks[stage] = reason
+            self.log(f"{stage}: using offline result ({reason})")
+        return result
+
+    def _abandon(self, stage: str):
+        """
+        Mark `stage`'s LLM call as abandoned. Taking the lock waits for a
+        chunk that is being written; no chunk of the call is written after.
+        """
+        with self._abandon_lock:
+            self._abandoned.add(stage)
+
+    def _problems(self, stage: str, result: Any) -> List[str]:
+        """What is wrong with an LLM stage's output (empty if it is usable)."""
+        problems = validation.section_problems(stage, result, self.prefs)
+        if problems:
+            annotate(invalid=len(problems))
+            self.log(f"{stage}: answer failed validation ({'; '.join(problems)})")
+        return problems
+
+    def _validated(self, stage: str, llm_func: Callable[[List[str] | None], Any], offline_func: Callable[[], Any]):
+        """
+        _llm_or_offline for a section that is checked before use. An answer
+        that fails validation is re-requested with its problems listed, at
+        most max_repairs times, and then replaced by the offline result.
+        Only this section is asked for again; the rest of the plan stands.
+        """
+        if not self.validate:
+            return self._llm_or_offline(stage, lambda: llm_func(None), offline_func)
+        problems = None
+        for attempt in range(self.max_repairs + 1):
+            if attempt:
+                self.repairs[stage] = attempt
+                annotate(repairs=attempt)
+            result = self._llm_or_offline(stage, lambda problems=problems: llm_func(problems), offline_func)
+            if stage in self.fallbacks or "plan" in self.fallbacks:
+                # Already the offline result, which needs no checking
+                return result
+            problems = self._problems(stage, result)
+            if not problems:
+                return result
+        reason = f"failed validation: {problems[0]}"
+        annotate(fallback=reason)
+        self.fallbacks[stage] = reason
+        self.log(f"{stage}: using offline result ({reason})")
+        return offline_func()
 
-        # 1. Routine
-        routine_text = self.routine_agent.generate(
-            self.prefs, self.personality, self.use_llm
+    def _template(self, section: str):
+        """This run's `section` built from the user's archetype template, or None."""
+        if not self.use_templates:
+            return None
+        if section not in self._templated:
+            result = templates.get_store().render(section, self.prefs, self.personality)
+            self._templated[section] = result
+            if result is not None:
+                annotate(template=True)
+                self.log(f"{section}: served from the archetype template")
+        return self._templated[section]
+
+    def _generate_plan(self) -> FusedPlan | None:
+        if all(self._template(section) is not None for section in templates.SECTIONS):
+            # Every section has a template, so the fused call is not needed
+            return None
+        plan = self._llm_or_offline(
+            "plan", lambda: self.fused_planner.generate(self.prefs, self.personality), lambda: None
+        )
+        if plan is not None:
+            self.token_usage = plan.usage
+        return plan
+
+    def _routine(self, plan: FusedPlan | None = None, on_chunk: Callable[[str], None] | None = None) -> str:
+        # A fused section that fails validation is asked for again on its own
+        if plan is not None and not (self.validate and self._problems("routine", plan.routine_text)):
+            return plan.routine_text
+        templated = self._template("routine")
+        if templated is not None:
+            return templated
+        return self._validated(
+            "routine",
+            lambda problems: self.routine_agent.generate(
+                self.prefs, self.personality, True, on_chunk=None if problems else on_chunk, problems=problems
+            ),
+            lambda: self.routine_agent.generate(self.prefs, self.personality, False)
         )
 
-        # 2. Meals
-        weekly_meals, shopping_list = self.meal_planner.generate_meal_plan(
-            self.prefs, self.personality, self.use_llm
+    def _meals(
+        self,
+        plan: FusedPlan | None = None,
+        on_chunk: Callable[[str], None] | None = None,
+        history: Dict[str, int] | None = None
+    ):
+        if plan is not None and not (self.validate and self._problems("meals", (plan.meals, plan.shopping))):
+            return plan.meals, plan.shopping
+        # A template is the same every week, so later weeks of a horizon plan skip it
+        templated = None if history else self._template("meals")
+        if templated is not None:
+            return templated
+        return self._validated(
+            "meals",
+            lambda problems: self.meal_planner.generate_meal_plan(
+                self.prefs, self.personality, True,
+                on_chunk=None if problems else on_chunk, problems=problems, history=history
+            ),
+            lambda: self.meal_planner.generate_meal_plan(self.prefs, self.personality, False, history=history)
         )
 
-        # 3. Tasks
-        optimized_tasks = self.task_optimizer.optimize_tasks(
-            self.prefs, self.personality, self.use_llm
+    def _tasks(self, plan: FusedPlan | None = None):
+        if plan is not None and plan.tasks and not (self.validate and self._problems("tasks", plan.tasks)):
+            return prioritize(plan.tasks)
+        templated = self._template("tasks")
+        if templated is not None:
+            return templated
+        return self._validated(
+            "tasks",
+            lambda problems: self.task_optimizer.optimize_tasks(self.prefs, self.personality, True, problems=problems),
+            lambda: self.task_optimizer.optimize_tasks(self.prefs, self.personality, False)
         )
 
-        # 4. Calendar
-        merged_calendar = self.calendar_manager.merge_with_events(routine_text)
-
-        # 5. Markdown assembly
-        final_markdown = self.markdown_builder.build_markdown(
-            self.prefs,
-            self.personality,
-            routine_text,
-            weekly_meals,
-            shopping_list,
-            optimized_tasks,
-            merged_calendar
+    def _calendar(self, routine: str, start_date: date | None = None, ics: IcsCalendar | None = None) -> dict:
+        """
+        The routine merged with the user's calendar (`ics`, or the profile's
+        calendar_ics file), checked for conflicts. They cannot be
+        re-requested like an LLM section, so they are logged and kept in
+        self.conflicts; the scheduler only uses free time anyway.
+        """
+        calendar = self.calendar_manager.merge_with_events(
+            routine, start_date=start_date, ics_path=self.prefs.get("calendar_ics"), ics=ics
         )
+        problems = validation.section_problems("calendar", calendar)
+        if problems:
+            annotate(conflicts=len(problems))
+            self.conflicts = problems
+            self.log(f"calendar: {len(problems)} problems in the merged schedule ({'; '.join(problems[:3])})")
+        return calendar
+
+    def _plan_stages(self) -> list:
+        """
+        The routine, meals and tasks stages. In fused mode they read the
+        "plan" stage and only call their own agent if it could not be parsed.
+        """
+        if not self.fused:
+            return [
+                Stage("routine", self._routine),
+                Stage("meals", self._meals),
+                Stage("tasks", self._tasks),
+            ]
+        return [
+            Stage("plan", self._generate_plan),
+            Stage("routine", self._routine, inputs=["plan"]),
+            Stage("meals", self._meals, inputs=["plan"]),
+            Stage("tasks", self._tasks, inputs=["plan"]),
+        ]
+
+    def _reusable_outputs(self, fingerprints: Dict[str, str]) -> Dict[str, Any]:
+        """Stage outputs from the previous run whose inputs are unchanged."""
+        if not self.incremental:
+            return {}
+        stored = self.memory.load_stage_outputs(user_key(self.prefs))
+        reused = {}
+        for stage, fingerprint in fingerprints.items():
+            record = stored.get(stage, {})
+            if record.get("fingerprint") == fingerprint:
+                decode = STAGE_CODECS.get(stage, (None, lambda v: v))[1]
+                reused[stage] = decode(record["output"])
+        return reused
+
+    @traced
+    def run_full_pipeline(self) -> str:
+        self.log(f"Starting full LifeNavigator pipeline (LLM mode = {self.use_llm})")
+        self._start_run()
+
+        fingerprints = {
+            stage: stage_fingerprint(stage, self.prefs, self.personality, self.use_llm, self.fused)
+            for stage in STAGE_DEPENDENCIES
+        }
+        reused = self._reusable_outputs(fingerprints)
+        if reused:
+            self.log(f"Reusing unchanged stages: {', '.join(sorted(reused))}")
+        if self.fused and set(STAGE_DEPENDENCIES) <= set(reused):
+            # Nothing reads the fused call's answer, so skip it
+            reused["plan"] = None
+
+        graph = self.build_stage_graph()
+        pipeline_start = time.perf_counter()
+        results = graph.run(precomputed=reused)
+        self.stage_timings = dict(graph.timings)
+        self.stage_timings["total"] = time.perf_counter() - pipeline_start
+
+        for stage, seconds in self.stage_timings.items():
+            self.log(f"  {stage:<10} {seconds * 1000:8.1f} ms")
+        self._log_token_usage()
+
+        # Save preferences and the stage outputs the next run may reuse
+        if self.persist_memory:
+            self.memory.save_preferences(self.prefs)
+            self.memory.save_stage_outputs({
+                stage: {
+                    "fingerprint": fingerprints[stage],
+                    "output": STAGE_CODECS.get(stage, (lambda v: v,))[0](results[stage])
+                }
+                # Offline stand-ins are not stored, so the next run retries the LLM
+                for stage in STAGE_DEPENDENCIES if stage not in self.fallbacks
+            }, user_key(self.prefs))
+
+        self.log("Pipeline complete.")
+        return results["markdown"]
+
+    def _log_token_usage(self):
+        if self.token_usage:
+            self.log("Tokens used by the fused call: " + ", ".join(
+                f"{section} {count}" for section, count in self.token_usage.items()
+            ))
+
+    @traced
+    def stream_pipeline(self, sink: IO[str]) -> None:
+        """
+        Like run_full_pipeline, but writes the plan to `sink` section by section.
+        LLM sections are streamed token by token while they are at the head
+        of the document; sections that finish early are buffered so the
+        output is byte-identical to run_full_pipeline's. If a section's
+        stream is cut off by the deadline, or the streamed answer fails
+        validation, the offline or repaired version follows whatever had
+        already been written.
+        """
+        self.log(f"Starting streaming LifeNavigator pipeline (LLM mode = {self.use_llm})")
+        mb = self.markdown_builder
+        writer = OrderedStreamWriter(sink, ["header", "routine", "meals", "tasks", "calendar"])
+        pipeline_start = time.perf_counter()
+        self._start_run()
+
+        writer.write("header", mb.render_header(self.prefs, self.personality))
+        writer.close("header")
+
+        first_content = []
+
+        def emit(section: str, text: str):
+            if not first_content:
+                first_content.append(time.perf_counter())
+            writer.write(section, text)
+
+        def streamer(section: str, preamble: str = ""):
+            """
+            on_chunk callback for a section's LLM stream. The preamble is written
+            with the first chunk; chunks from a call that was abandoned for the
+            offline result are dropped (see _abandon).
+            """
+            started = []
+
+            def on_chunk(chunk: str):
+                with self._abandon_lock:
+                    if section in self._abandoned:
+                        return
+                    if not started:
+                        started.append(True)
+                        writer.write(section, preamble)
+                    emit(section, chunk)
+            return on_chunk, started
+
+        def routine_stage(plan=None):
+            # Only the per-section LLM prompts stream; a fused plan arrives whole
+            on_chunk, started = streamer("routine")
+            writer.write("routine", mb.ROUTINE_HEADING)
+            routine = self._routine(plan, on_chunk=on_chunk if self.use_llm and plan is None else None)
+            if not started or "routine" in self.fallbacks or "routine" in self.repairs:
+                if started:
+                    # Keep the replacement apart from the part that was already streamed
+                    writer.write("routine", "\n\n")
+                emit("routine", routine)
+            writer.write("routine", "\n\n")
+            writer.close("routine")
+            return routine
+
+        def meals_stage(plan=None):
+            on_chunk, started = streamer("meals", f"{mb.MEALS_HEADING}### {LLM_MEAL_PLAN_KEY}\n")
+            meals, shopping = self._meals(plan, on_chunk=on_chunk if self.use_llm and plan is None else None)
+            if started:
+                writer.write("meals", "\n\n")
+            if not started or "meals" in self.fallbacks or "meals" in self.repairs:
+                emit("meals", mb.render_meals(meals))
+            writer.write("meals", mb.render_shopping(shopping))
+            writer.close("meals")
+            return meals, shopping
+
+        def tasks_stage(plan=None):
+            # Tasks are shown once scheduled, so they are not streamed token by token
+            return self._tasks(plan)
+
+        def calendar_stage(routine):
+            calendar = self._calendar(routine)
+            writer.write("calendar", mb.render_calendar(calendar))
+            writer.close("calendar")
+            return calendar
+
+        def schedule_stage(tasks, calendar):
+            schedule = self.task_optimizer.schedule_tasks(tasks, calendar, self.prefs, self.personality)
+            emit("tasks", mb.render_tasks(schedule))
+            writer.close("tasks")
+            return schedule
+
+        plan_inputs = ["plan"] if self.fused else []
+        graph = StageGraph(([Stage("plan", self._generate_plan)] if self.fused else []) + [
+            Stage("routine", routine_stage, inputs=plan_inputs),
+            Stage("meals", meals_stage, inputs=plan_inputs),
+            Stage("tasks", tasks_stage, inputs=plan_inputs),
+            Stage("calendar", calendar_stage, inputs=["routine"]),
+            Stage("schedule", schedule_stage, inputs=["tasks", "calendar"]),
+        ])
+        graph.run()
+        self.stage_timings = dict(graph.timings)
+        if first_content:
+            self.stage_timings["first_content"] = first_content[0] - pipeline_start
+        self.stage_timings["total"] = time.perf_counter() - pipeline_start
+
+        for stage, seconds in self.stage_timings.items():
+            self.log(f"  {stage:<13} {seconds * 1000:8.1f} ms")
+        self._log_token_usage()
+
+        if self.persist_memory:
+            self.memory.save_preferences(self.prefs)
+
+        self.log("Pipeline complete.")
+
+    def iter_weeks(self, weeks: int, start_date: date | None = None) -> Iterator[WeekPlan]:
+        """
+        Plan `weeks` consecutive weeks, yielding each one as soon as it is
+        done. Nothing is planned ahead of the caller. The routine and the
+        task list are made once, in week 1; every week then gets its own
+        meal plan (steering clear of recent dishes), calendar window and
+        schedule, and tasks without free time move on to the next week
+        (see horizon.HorizonState). The calendar file is indexed once and
+        every week queries its own window, so all weeks see the same
+        version of it. Each week runs under its own deadline; fallbacks,
+        repairs and stage_timings describe the latest week.
+        """
+        self.log(f"Planning {weeks} weeks (LLM mode = {self.use_llm})")
+        ics_path = self.prefs.get("calendar_ics")
+        ics = load_ics(ics_path) if ics_path else None
+        state = HorizonState(start_date)
+        routine = None
+        for number in range(1, weeks + 1):
+            self._start_run()
+            history = state.meal_history()
+            graph = StageGraph([
+                Stage("routine", self._routine),
+                Stage("tasks", self._tasks),
+                Stage("meals", lambda: self._meals(history=history)),
+                Stage("calendar", lambda routine: self._calendar(routine, start_date=state.start, ics=ics), inputs=["routine"]),
+                Stage("schedule", lambda tasks, calendar: self.task_optimizer.schedule_tasks(
+                    tasks, calendar, self.prefs, self.personality
+                ), inputs=["tasks", "calendar"]),
+            ])
+            precomputed = {"routine": routine, "tasks": state.carry_over} if number > 1 else None
+            results = graph.run(precomputed=precomputed)
+            self.stage_timings = dict(graph.timings)
+
+            routine = results["routine"]
+            meals, shopping = results["meals"]
+            calendar = results["calendar"]
+            week = WeekPlan(
+                number, date.fromisoformat(calendar["window"][0]), routine, meals, shopping,
+                results["schedule"], calendar
+            )
+            state.advance(week)
+            yield week
+
+    @traced
+    def stream_weeks(self, sink: IO[str], weeks: int, start_date: date | None = None) -> None:
+        """
+        Write a `weeks`-long plan to `sink` week by week as iter_weeks
+        produces it: the profile and daily routine once, then each week's
+        meals, shopping list, tasks and calendar. Only the current week is
+        held in memory.
+        """
+        self.log(f"Starting {weeks}-week LifeNavigator plan (LLM mode = {self.use_llm})")
+        mb = self.markdown_builder
+        sink.write(mb.render_header(self.prefs, self.personality))
+        sink.flush()
+        for week in self.iter_weeks(weeks, start_date):
+            if week.number == 1:
+                sink.write(mb.render_routine(week.routine))
+            mb.write_week(sink, week)
+            sink.flush()
+        sink.write("---\nGenerated by Agent LifeNavigator.\n")
+        sink.flush()
 
-        # 6. Save preferences
-        self.memory.save_preferences(self.prefs)
+        if self.persist_memory:
+            self.memory.save_preferences(self.prefs)
 
         self.log("Pipeline complete.")
-        return final_markdown
@@ -0,0 +1,368 @@
+# archive.py
+"""
+Content-addressed archive of generated plans.
+
+A plan is split at its "## " headings. Each distinct section is stored
+once, keyed by its BLAKE2b digest, and a plan is only a manifest of
+section numbers. Most sections are shared by large groups of users (the
+offline meal plan, task schedule and calendar are the same for everyone
+with the same diet, tasks and events), so a stored plan costs a few dozen
+bytes plus whatever is new in it.
+
+The archive is a directory of append-only files:
+
+- sections.dat  section text (UTF-8), back to back
+- sections.idx  28 bytes per section: digest, offset, length
+- plans.dat     per plan: section count, then a 4-byte section number each
+- plans.idx     32 bytes per plan: user digest, created_at, offset in plans.dat
+
+Records are appended data first, index last, so a crash leaves at most
+an unindexed tail that is never read. Writers in several processes take
+an flock on the directory's lock file. Reads go through mmap: a section
+is a memoryview into sections.dat, so a past plan can be written to a
+file or socket, or two plans compared section by section, without
+regenerating or copying anything.
+
+    python archive.py stats
+    python archive.py list USER_ID
+    python archive.py show PLAN_ID
+    python archive.py diff PLAN_A PLAN_B
+"""
+
+import argparse
+import difflib
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+from config import PLAN_ARCHIVE_PATH
+
+try:
+    import fcntl
+except ImportError:  # Windows: one writer process at a time
+    fcntl = None
+
+_SECTION = struct.Struct("<16sQI")
+_PLAN = struct.Struct("<16sdQ")
+_COUNT = struct.Struct("<H")
+_NUMBER = struct.Struct("<I")
+
+# A plan section starts at each level-2 heading
+_SECTION_START = re.compile(r"^(?=## )", re.MULTILINE)
+
+
+def digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def split_sections(markdown: str) -> List[str]:
+    """The plan's sections; joined back together they give the plan unchanged."""
+    return [part for part in _SECTION_START.split(markdown) if part]
+
+
+class _Mapped:
+    """A read-only mmap of an append-only file, remapped when it has grown."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.map: mmap.mmap | None = None
+
+    def view(self, end: int) -> memoryview:
+        """The file's first `end` bytes (remapping if the current map is shorter)."""
+        if self.map is None or len(self.map) < end:
+            with open(self.path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < end:
+                    raise ValueError(f"{self.path} is shorter than its index")
+                # Views handed out earlier keep the old map alive until they are released
+                self.map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        return memoryview(self.map)[:end]
+
+
+class PlanArchive:
+    """Stores plans as manifests of deduplicated sections; see the module docstring."""
+
+    def __init__(self, path: str = PLAN_ARCHIVE_PATH):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: os.path.join(path, name) for name in ("sections.dat", "sections.idx", "plans.dat", "plans.idx")}
+        for file in self._files.values():
+            open(file, "ab").close()
+        self._maps = {name: _Mapped(file) for name, file in self._files.items()}
+        self._lock = threading.Lock()
+        self._numbers: Dict[bytes, int] = {}  # section digest -> section number
+        self._sections = 0  # indexed sections loaded into _numbers
+        self._users: Dict[bytes, List[int]] = {}  # user digest -> plan ids, oldest first
+        self._plans = 0  # indexed plans loaded into _users
+        with self._lock:
+            self._sync()
+
+    def log(self, message: str):
+        print(f"[PlanArchive] {message}")
+
+    def _size(self, name: str) -> int:
+        return os.path.getsize(self._files[name])
+
+    def _sync(self):
+        """Pick up records appended since the last sync, by us or another process."""
+        data_size = self._size("sections.dat")
+        count = self._size("sections.idx") // _SECTION.size
+        if count > self._sections:
+            index = self._maps["sections.idx"].view(count * _SECTION.size)
+            for number in range(self._sections, count):
+                key, offset, length = _SECTION.unpack_from(index, number * _SECTION.size)
+                if offset + length > data_size:
+                    count = number
+                    break
+                self._numbers[key] = number
+            index.release()
+            self._sections = count
+        count = self._size("plans.idx") // _PLAN.size
+        if count > self._plans:
+            index = self._maps["plans.idx"].view(count * _PLAN.size)
+            for plan_id in range(self._plans, count):
+                user = _PLAN.unpack_from(index, plan_id * _PLAN.size)[0]
+                self._users.setdefault(user, []).append(plan_id)
+            index.release()
+            self._plans = count
+
+    def _truncate_torn(self):
+        """Drop index records a crashed writer left half-written, before appending after them."""
+        for name, end in (("sections.idx", self._sections * _SECTION.size), ("plans.idx", self._plans * _PLAN.size)):
+            if self._size(name) > end:
+                self.log(f"Dropping {self._size(name) - end} bytes of a torn record in {name}")
+                os.truncate(self._files[name], end)
+
+    # ---- writing ----
+
+    def put(self, user_id: str, markdown: str, created_at: float | None = None) -> int:
+        """Store a plan; returns its plan id. Sections already in the archive are not stored again."""
+        parts = [part.encode("utf-8") for part in split_sections(markdown)]
+        if len(parts) > 0xFFFF:
+            raise ValueError(f"Plan has {len(parts)} sections, at most {0xFFFF} are supported")
+        with self._lock, open(os.path.join(self.path, "lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self._sync()
+            self._truncate_torn()
+            numbers = []
+            new_data, new_index = [], []
+            offset = self._size("sections.dat")
+            for part in parts:
+                key = digest(part)
+                number = self._numbers.get(key)
+                if number is None:
+                    number = self._sections + len(new_index)
+                    self._numbers[key] = number
+                    new_data.append(part)
+                    new_index.append(_SECTION.pack(key, offset, len(part)))
+                    offset += len(part)
+                numbers.append(number)
+            manifest = _COUNT.pack(len(numbers)) + b"".join(_NUMBER.pack(n) for n in numbers)
+            user = digest(user_id.encode("utf-8"))
+            record = _PLAN.pack(user, created_at or time.time(), self._size("plans.dat"))
+            try:
+                self._append("sections.dat", b"".join(new_data))
+                self._append("sections.idx", b"".join(new_index))
+                self._append("plans.dat", manifest)
+                self._append("plans.idx", record)
+            except BaseException:
+                # Nothing got indexed; forget the numbers handed out above
+                for key in [k for k, n in self._numbers.items() if n >= self._sections]:
+                    del self._numbers[key]
+                raise
+            self._sections += len(new_index)
+            plan_id = self._plans
+            self._plans += 1
+            self._users.setdefault(user, []).append(plan_id)
+        return plan_id
+
+    def _append(self, name: str, data: bytes):
+        if data:
+            with open(self._files[name], "ab") as f:
+                f.write(data)
+                f.flush()
+
+    # ---- reading ----
+
+    def __len__(self) -> int:
+        return self._size("plans.idx") // _PLAN.size
+
+    def _plan_record(self, plan_id: int) -> Tuple[bytes, float, int]:
+        if not 0 <= plan_id < len(self):
+            raise KeyError(f"No plan {plan_id} in {self.path}")
+        with self._lock:
+            index = self._maps["plans.idx"].view((plan_id + 1) * _PLAN.size)
+            record = _PLAN.unpack_from(index, plan_id * _PLAN.size)
+            index.release()
+        return record
+
+    def manifest(self, plan_id: int) -> List[int]:
+        """Section numbers of a plan, in order."""
+        offset = self._plan_record(plan_id)[2]
+        with self._lock:
+            head = self._maps["plans.dat"].view(offset + _COUNT.size)
+            count = _COUNT.unpack_from(head, offset)[0]
+            head.release()
+            data = self._maps["plans.dat"].view(offset + _COUNT.size + count * _NUMBER.size)
+            numbers = [n for (n,) in _NUMBER.iter_unpack(data[offset + _COUNT.size:])]
+            data.release()
+        return numbers
+
+    def section(self, number: int) -> memoryview:
+        """One section's UTF-8 bytes, as a view into the mapped data file."""
+        with self._lock:
+            index = self._maps["sections.idx"].view((number + 1) * _SECTION.size)
+            _, offset, length = _SECTION.unpack_from(index, number * _SECTION.size)
+            index.release()
+            return self._maps["sections.dat"].view(offset + length)[offset:]
+
+    def section_digest(self, number: int) -> bytes:
+        with self._lock:
+            index = self._maps["sections.idx"].view((number + 1) * _SECTION.size)
+            key = _SECTION.unpack_from(index, number * _SECTION.size)[0]
+            index.release()
+        return key
+
+    def sections(self, plan_id: int) -> Iterator[memoryview]:
+        for number in self.manifest(plan_id):
+            yield self.section(number)
+
+    def write_plan(self, plan_id: int, out: BinaryIO) -> int:
+        """Write a stored plan to a binary stream straight from the map; returns bytes written."""
+        written = 0
+        for view in self.sections(plan_id):
+            out.write(view)
+            written += len(view)
+        return written
+
+    def get(self, plan_id: int) -> str:
+        return b"".join(self.sections(plan_id)).decode("utf-8")
+
+    def info(self, plan_id: int) -> dict:
+        _, created_at, _ = self._plan_record(plan_id)
+        numbers = self.manifest(plan_id)
+        return {
+            "plan_id": plan_id,
+            "created_at": created_at,
+            "sections": len(numbers),
+            "bytes": sum(len(self.section(n)) for n in numbers),
+        }
+
+    def plan_ids(self, user_id: str) -> List[int]:
+        """A user's plans, oldest first."""
+        key = digest(user_id.encode("utf-8"))
+        with self._lock:
+            # Only plans appended since the last lookup (e.g. by another process) are read
+            self._sync()
+            return list(self._users.get(key, ()))
+
+    def latest(self, user_id: str) -> int | None:
+        ids = self.plan_ids(user_id)
+        return ids[-1] if ids else None
+
+    def diff(self, old_id: int, new_id: int) -> List[str]:
+        """
+        Unified diff of two plans. Sections are matched by digest first, so
+        only the text of sections that actually changed is read and compared.
+        """
+        old, new = self.manifest(old_id), self.manifest(new_id)
+        lines = []
+        matcher = difflib.SequenceMatcher(a=[self.section_digest(n) for n in old],
+                                          b=[self.section_digest(n) for n in new], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            before = "".join(bytes(self.section(n)).decode("utf-8") for n in old[i1:i2])
+            after = "".join(bytes(self.section(n)).decode("utf-8") for n in new[j1:j2])
+            lines.extend(difflib.unified_diff(
+                before.splitlines(keepends=True), after.splitlines(keepends=True),
+                f"plan {old_id}", f"plan {new_id}", n=1
+            ))
+        return lines
+
+    def stats(self) -> dict:
+        """Plan and section counts, stored bytes and the bytes the plans would take as Markdown."""
+        plans = len(self)
+        with self._lock:
+            self._sync()
+            lengths = []
+            if self._sections:
+                index = self._maps["sections.idx"].view(self._sections * _SECTION.size)
+                lengths = [length for _, _, length in _SECTION.iter_unpack(index)]
+                index.release()
+        plan_bytes = 0
+        for plan_id in range(plans):
+            plan_bytes += sum(lengths[n] for n in self.manifest(plan_id))
+        stored = sum(self._size(name) for name in self._files)
+        return {
+            "plans": plans,
+            "sections": len(lengths),
+            "plan_bytes": plan_bytes,
+            "stored_bytes": stored,
+            "ratio": plan_bytes / stored if stored else 0.0,
+        }
+
+
+_archive: PlanArchive | None = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> PlanArchive:
+    """Return the process-wide archive at PLAN_ARCHIVE_PATH."""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = PlanArchive(PLAN_ARCHIVE_PATH)
+    return _archive
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Browse the plan archive.")
+    parser.add_argument("--path", default=PLAN_ARCHIVE_PATH, help="Archive directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Plans, distinct sections and space saved")
+    listing = sub.add_parser("list", help="A user's archived plans")
+    listing.add_argument("user_id")
+    show = sub.add_parser("show", help="Print an archived plan")
+    show.add_argument("plan_id", type=int)
+    diff = sub.add_parser("diff", help="Show what changed between two plans")
+    diff.add_argument("old_id", type=int)
+    diff.add_argument("new_id", type=int)
+    args = parser.parse_args(argv)
+
+    if not args.path:
+        parser.error("no archive: set PLAN_ARCHIVE_PATH or pass --path")
+    archive = PlanArchive(args.path)
+    try:
+        if args.command == "stats":
+            stats = archive.stats()
+            print(f"{stats['plans']} plans, {stats['sections']} distinct sections")
+            print(f"{stats['plan_bytes']:,} bytes of Markdown stored in {stats['stored_bytes']:,} bytes "
+                  f"({stats['ratio']:.1f}x smaller)")
+        elif args.command == "list":
+            for plan_id in archive.plan_ids(args.user_id):
+                info = archive.info(plan_id)
+                created = datetime.fromtimestamp(info["created_at"]).isoformat(" ", "seconds")
+                print(f"{plan_id:>8}  {created}  {info['sections']:>3} sections  {info['bytes']:>8} bytes")
+        elif args.command == "show":
+            archive.write_plan(args.plan_id, sys.stdout.buffer)
+            sys.stdout.flush()
+        else:
+            sys.stdout.writelines(archive.diff(args.old_id, args.new_id))
+    except KeyError as ex:
+        print(ex.args[0], file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# batch.py
+"""
+Non-interactive batch planning.
+
+Streams profiles from a JSONL/NDJSON file (one profile per line), plans
+them on a worker pool and streams each finished plan to disk as soon as
+it is ready. Completed user ids are appended to a checkpoint file so a
+crashed run can be resumed without redoing finished users. A line that
+is not valid JSON or a profile whose plan fails is written to an errors
+file (<input>.errors) and checkpointed too, so one bad record never stops
+the run or a resume.
+
+    python batch.py profiles.jsonl --out-dir plans/
+    python batch.py profiles.jsonl --out plans.jsonl --llm --workers 16
+    python batch.py profiles.jsonl --archive .plan_archive
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, Set, Tuple
+
+import tracing
+from agents import OrchestratorAgent
+from archive import PlanArchive
+from config import PLAN_DEADLINE_SECONDS
+from personality_engine import personalize_profile
+
+
+def iter_profiles(path: str, skip: Set[str] | None = None,
+                  errors: "ErrorLog | None" = None) -> Iterator[Tuple[str, dict]]:
+    """
+    Yield (user_id, profile) pairs one line at a time.
+    The id comes from "user_id"/"id" in the profile, or the line number.
+    Lines that are not a JSON object are reported to `errors` as
+    "line-<n>" and skipped (without `errors`, they raise ValueError).
+    """
+    skip = skip or set()
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                profile = json.loads(line)
+                if not isinstance(profile, dict):
+                    raise ValueError(f"expected a JSON object, got {type(profile).__name__}")
+            except ValueError as ex:
+                if errors is None:
+                    raise ValueError(f"{path}:{line_no}: {ex}") from ex
+                if f"line-{line_no}" not in skip:
+                    errors.record(f"line-{line_no}", ex)
+                continue
+            user_id = str(profile.get("user_id") or profile.get("id") or f"line-{line_no}")
+            if user_id not in skip:
+                yield user_id, profile
+
+
+def plan_profile(
+    user_id: str,
+    profile: dict,
+    use_llm: bool = False,
+    save_memory: bool = False,
+    deadline: float | None = None
+) -> Tuple[str, str]:
+    """Run the full pipeline for one profile. Executed inside pool workers."""
+    profile.setdefault("user_id", user_id)
+    orchestrator = OrchestratorAgent(
+        use_llm=use_llm,
+        user_prefs=profile,
+        personality=personalize_profile(profile),
+        persist_memory=save_memory,
+        deadline=deadline
+    )
+    return user_id, orchestrator.run_full_pipeline()
+
+
+def _silence_worker():
+    """Pool initializer: drop per-agent log lines inside worker processes."""
+    sys.stdout = open(os.devnull, "w")
+
+
+class Checkpoint:
+    """
+    Append-only list of finished user ids.
+    An id is only recorded after its plan has been flushed to the output.
+    """
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self.done: Set[str] = set()
+        self._file = None
+        if path:
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    self.done = {line.strip() for line in f if line.strip()}
+            self._file = open(path, "a")
+
+    def mark(self, user_id: str):
+        self.done.add(user_id)
+        if self._file:
+            self._file.write(user_id + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+class ErrorLog:
+    """
+    Records that could not be planned, as {user_id, error} JSON lines.
+    Each one is also marked in the checkpoint, so a resumed run skips it
+    instead of failing on it again.
+    """
+
+    def __init__(self, path: str | None, checkpoint: Checkpoint | None = None):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.count = 0
+        self._file = open(path, "a") if path else None
+
+    def record(self, user_id: str, error: BaseException):
+        self.count += 1
+        message = f"{type(error).__name__}: {error}"
+        print(f"✖ {user_id}: {message}", file=sys.stderr)
+        if self._file:
+            self._file.write(json.dumps({"user_id": user_id, "error": message}) + "\n")
+            self._file.flush()
+        if self.checkpoint is not None:
+            self.checkpoint.mark(user_id)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+class PlanWriter:
+    """
+    Writes finished plans as one Markdown file per user (out_dir), as JSON
+    lines in a single file (out_file) or into a PlanArchive (archive_dir).
+    """
+
+    def __init__(self, out_dir: str | None = None, out_file: str | None = None, archive_dir: str | None = None):
+        if not out_dir and not out_file and not archive_dir:
+            raise ValueError("One of out_dir, out_file or archive_dir is required")
+        self.out_dir = out_dir
+        self._file = None
+        self.archive = None
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        elif out_file:
+            self._file = open(out_file, "a")
+        else:
+            self.archive = PlanArchive(archive_dir)
+
+    def write(self, user_id: str, markdown: str):
+        if self.archive is not None:
+            self.archive.put(user_id, markdown)
+        elif self.out_dir:
+            safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)
+            with open(os.path.join(self.out_dir, f"{safe_id}.md"), "w") as f:
+                f.write(markdown)
+        else:
+            self._file.write(json.dumps({"user_id": user_id, "plan": markdown}) + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def run_offline(profiles: Iterator[Tuple[str, dict]], writer: PlanWriter, checkpoint: Checkpoint,
+                workers: int, verbose: bool = False, save_memory: bool = False,
+                errors: ErrorLog | None = None) -> int:
+    """
+    Fan profiles out over a process pool. At most `workers * 2` plans are
+    in flight, so memory stays bounded regardless of input size.
+    Returns the number of plans written.
+    """
+    completed = 0
+    max_pending = workers * 2
+    initializer = None if verbose else _silence_worker
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as pool:
+        pending: Dict[Future, str] = {}
+        for user_id, profile in profiles:
+            pending[pool.submit(plan_profile, user_id, profile, False, save_memory)] = user_id
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                completed += _drain(done, pending, writer, checkpoint, errors)
+        if pending:
+            done, _ = wait(pending)
+            completed += _drain(done, pending, writer, checkpoint, errors)
+    return completed
+
+
+def _drain(done, pending: dict, writer: PlanWriter, checkpoint: Checkpoint, errors: ErrorLog | None) -> int:
+    """Write the finished plans and record the failed ones; returns plans written."""
+    written = 0
+    for future in done:
+        user_id = pending.pop(future)
+        try:
+            _, markdown = future.result()
+        except Exception as ex:
+            if errors is None:
+                raise
+            errors.record(user_id, ex)
+            continue
+        writer.write(user_id, markdown)
+        checkpoint.mark(user_id)
+        written += 1
+    return written
+
+
+async def run_llm(profiles: Iterator[Tuple[str, dict]], writer: PlanWriter, checkpoint: Checkpoint,
+                  workers: int, save_memory: bool = False, deadline: float | None = None,
+                  errors: ErrorLog | None = None) -> int:
+    """
+    Plan with the LLM using a bounded pool of concurrent pipelines.
+    Pipelines are I/O bound on Gemini, so threads driven by asyncio are enough;
+    the shared Gemini client still caps in-flight requests.
+    With a deadline, each plan's LLM stages fall back to the offline result
+    once that plan's budget runs out.
+    """
+    completed = 0
+    pending: Dict[asyncio.Task, str] = {}
+
+    for user_id, profile in profiles:
+        task = asyncio.create_task(asyncio.to_thread(plan_profile, user_id, profile, True, save_memory, deadline))
+        pending[task] = user_id
+        if len(pending) >= workers:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            completed += _drain(done, pending, writer, checkpoint, errors)
+    if pending:
+        done, _ = await asyncio.wait(pending)
+        completed += _drain(done, pending, writer, checkpoint, errors)
+    return completed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate life plans for many profiles.")
+    parser.add_argument("input", help="JSONL/NDJSON file with one profile per line")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out-dir", help="Write one <user_id>.md per profile into this directory")
+    target.add_argument("--out", help="Append {user_id, plan} JSON lines to this file")
+    target.add_argument("--archive", help="Store plans in the deduplicated plan archive in this directory")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <input>.checkpoint)")
+    parser.add_argument("--errors", help="Failed records as JSON lines (default: <input>.errors)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--llm", action="store_true", help="Use Gemini instead of the offline rule-based path")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Per-plan latency budget in seconds for --llm (default: PLAN_DEADLINE_SECONDS)")
+    parser.add_argument("--save-memory", action="store_true",
+                        help="Store each user's preferences and stage outputs in memory.db")
+    parser.add_argument("--verbose", action="store_true", help="Show per-agent log lines")
+    args = parser.parse_args(argv)
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.input}.checkpoint")
+    writer = PlanWriter(out_dir=args.out_dir, out_file=args.out, archive_dir=args.archive)
+    errors = ErrorLog(args.errors or f"{args.input}.errors", checkpoint)
+    if checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)} profiles already planned")
+
+    profiles = iter_profiles(args.input, skip=set(checkpoint.done), errors=errors)
+    start = time.perf_counter()
+    try:
+        if args.llm:
+            # Pipelines run in threads here, so silence the whole process instead.
+            with open(os.devnull, "w") as devnull:
+                quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+                with quiet:
+                    completed = asyncio.run(run_llm(
+                        profiles, writer, checkpoint, args.workers, args.save_memory,
+                        args.deadline or PLAN_DEADLINE_SECONDS or None, errors
+                    ))
+        else:
+            completed = run_offline(profiles, writer, checkpoint, args.workers, args.verbose, args.save_memory, errors)
+    finally:
+        writer.close()
+        errors.close()
+        checkpoint.close()
+        tracing.write_metrics()
+    elapsed = time.perf_counter() - start
+
+    rate = completed / elapsed if elapsed > 0 else 0.0
+    print(f"✔ Planned {completed} profiles in {elapsed:.2f}s ({rate:.1f} plans/s)")
+    if errors.count:
+        print(f"✖ {errors.count} records failed; see {errors.path}")
+    if writer.archive is not None:
+        stats = writer.archive.stats()
+        print(f"🗄  Archive: {stats['plans']} plans in {stats['stored_bytes']:,} bytes ({stats['ratio']:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
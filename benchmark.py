@@ -0,0 +1,519 @@
+# benchmark.py
+"""
+Performance benchmarks for Agent LifeNavigator.
+
+    python benchmark.py markdown [--size 10000]
+    python benchmark.py pipeline [--runs 5] [--latency 0.05 --jitter 0.01 --error-rate 0]
+    python benchmark.py batch [--count 200 --workers 4]
+    python benchmark.py startup [--runs 5]         # cold start of a fresh interpreter
+    python benchmark.py personality [--profiles 200000]
+    python benchmark.py validation [--sections 50000]
+    python benchmark.py horizon [--weeks 52]
+    python benchmark.py archive [--plans 500]
+    python benchmark.py all --check              # fail on regressions vs benchmark_baselines.json
+    python benchmark.py all --update-baselines   # record the current numbers as the baseline
+
+LLM-mode numbers use fake_gemini's local stand-in, so no API key or network
+is needed and results are repeatable.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+from agents import OrchestratorAgent
+from archive import PlanArchive
+from fake_gemini import fake_gemini
+from personality_engine import personalize_batch, personalize_profile, profile_columns
+from tools import MarkdownBuilder
+from user_input import DEFAULT_PROFILE
+from validation import section_problems
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+
+# Latency metrics may be this much slower than baseline before failing
+DEFAULT_TOLERANCE = 0.25
+# ...and always get this much slack, so sub-millisecond timings don't flap
+ABSOLUTE_SLACK_MS = 2.0
+# Per-item timings in microseconds (archive reads and writes, validation,
+# scoring) swing by tens of percent with scheduler and disk noise
+ABSOLUTE_SLACK_US = 50.0
+
+
+def _measure(func):
+    """Run func once and return (result, seconds, peak traced bytes)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _large_plan(size: int) -> dict:
+    return {
+        "prefs": DEFAULT_PROFILE,
+        "personality": personalize_profile(DEFAULT_PROFILE),
+        "routine": "\n".join(f"{h:02d}:00–{h:02d}:30 Block {h}" for h in range(24)),
+        "meals": {
+            f"Day {d}": {"Breakfast": "Oats", "Lunch": "Tofu bowl", "Dinner": "Dal and rice"}
+            for d in range(size // 10)
+        },
+        "shopping": [f"Item {i}" for i in range(size // 10)],
+        "tasks": [f"({i % 3 + 1}) Task number {i}" for i in range(size)],
+        "calendar": {"events": [f"2025-11-28 10:00 Event number {i}" for i in range(size)]},
+    }
+
+
+def bench_markdown(size: int = 10_000) -> dict:
+    """
+    Render a plan with `size` tasks and `size` calendar events, then re-render
+    it with only the task list changed. Rendering at size and 2*size shows
+    whether cost grows linearly.
+    """
+    results = {}
+    for n in (size, size * 2):
+        plan = _large_plan(n)
+        builder = MarkdownBuilder("MarkdownBuilder")
+        args = (plan["prefs"], plan["personality"], plan["routine"], plan["meals"],
+                plan["shopping"], plan["tasks"], plan["calendar"])
+        md, elapsed, peak = _measure(lambda: builder.build_markdown(*args))
+        results[n] = {"seconds": elapsed, "peak_bytes": peak, "chars": len(md)}
+
+        changed = list(plan["tasks"]) + ["(1) One more task"]
+        args = args[:5] + (changed,) + args[6:]
+        _, elapsed, _ = _measure(lambda: builder.build_markdown(*args))
+        results[n]["rerender_seconds"] = elapsed
+        results[n]["rerendered"] = list(builder.rerendered)
+
+    small, large = results[size], results[size * 2]
+    results["time_ratio"] = large["seconds"] / small["seconds"]
+    results["memory_ratio"] = large["peak_bytes"] / small["peak_bytes"]
+    return results
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _quiet():
+    """Silence agent log lines while measuring."""
+    return contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def _orchestrator(use_llm: bool, fused: bool = False, prefs: dict | None = None) -> OrchestratorAgent:
+    prefs = dict(prefs or DEFAULT_PROFILE)
+    return OrchestratorAgent(
+        use_llm=use_llm,
+        user_prefs=prefs,
+        personality=personalize_profile(prefs),
+        persist_memory=False,
+        fused=fused,
+        deadline=None
+    )
+
+
+def bench_pipeline(mode: str, runs: int = 5, **fake_options) -> dict:
+    """
+    Plan the default profile `runs` times in one mode ("offline", "llm",
+    "fused" or "stream") and report per-stage and end-to-end latency
+    (mean and p95, ms), peak traced memory of one run, and LLM calls and
+    tokens per plan, and sections re-requested after failing validation.
+    """
+    use_llm = mode != "offline"
+    fused = mode == "fused"
+    stage_samples: Dict[str, List[float]] = {}
+    totals = []
+    fallbacks = 0
+    repairs = 0
+
+    def plan_once():
+        orchestrator = _orchestrator(use_llm, fused)
+        if mode == "stream":
+            orchestrator.stream_pipeline(open(os.devnull, "w"))
+        else:
+            orchestrator.run_full_pipeline()
+        return orchestrator
+
+    with fake_gemini(**fake_options) as fake, _quiet():
+        for _ in range(runs):
+            start = time.perf_counter()
+            orchestrator = plan_once()
+            totals.append(time.perf_counter() - start)
+            fallbacks += len(orchestrator.fallbacks)
+            repairs += sum(orchestrator.repairs.values())
+            for stage, seconds in orchestrator.stage_timings.items():
+                if stage != "total":
+                    stage_samples.setdefault(stage, []).append(seconds)
+        calls, tokens = fake.calls, fake.prompt_tokens + fake.output_tokens
+        _, _, peak = _measure(plan_once)
+
+    result = {
+        "total_ms": statistics.mean(totals) * 1000,
+        "total_p95_ms": _percentile(totals, 0.95) * 1000,
+        "peak_kib": peak / 1024,
+        "llm_calls_per_plan": calls / runs,
+        "llm_tokens_per_plan": tokens / runs,
+        "fallbacks": fallbacks,
+        "repairs": repairs,
+    }
+    for stage, samples in stage_samples.items():
+        result[f"stage.{stage}_ms"] = statistics.mean(samples) * 1000
+    return result
+
+
+def _variant_profiles(count: int):
+    """Yield `count` distinct profiles derived from the default one."""
+    diets = ["balanced", "vegetarian", "vegan", "high_protein"]
+    for i in range(count):
+        prefs = dict(DEFAULT_PROFILE)
+        prefs.update(
+            user_id=f"bench-{i}",
+            wake_time=f"{5 + i % 6:02d}:00",
+            diet_type=diets[i % len(diets)],
+            wants_gym=bool(i % 2),
+        )
+        yield prefs
+
+
+def bench_batch(count: int = 200, workers: int = 4, llm_count: int = 40, **fake_options) -> dict:
+    """
+    Throughput of batch.py: `count` profiles offline on a process pool and
+    `llm_count` profiles in LLM mode against the fake Gemini.
+    """
+    from batch import Checkpoint, PlanWriter, iter_profiles, run_llm, run_offline
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, n in (("offline", count), ("llm", llm_count)):
+            source = os.path.join(tmp, f"{mode}.jsonl")
+            with open(source, "w") as f:
+                for prefs in _variant_profiles(n):
+                    f.write(json.dumps(prefs) + "\n")
+            writer = PlanWriter(out_file=os.path.join(tmp, f"{mode}.out.jsonl"))
+            checkpoint = Checkpoint(None)
+            start = time.perf_counter()
+            if mode == "offline":
+                completed = run_offline(iter_profiles(source), writer, checkpoint, workers)
+            else:
+                with fake_gemini(**fake_options), _quiet():
+                    import asyncio
+                    completed = asyncio.run(run_llm(iter_profiles(source), writer, checkpoint, workers * 4))
+            elapsed = time.perf_counter() - start
+            writer.close()
+            results[f"{mode}.plans_per_s"] = completed / elapsed
+    return results
+
+
+def bench_personality(count: int = 200_000) -> dict:
+    """
+    personalize_profile() row by row vs personalize_batch() on columns, for
+    `count` variant profiles: cost (microseconds) and retained memory
+    (bytes) per profile. Fails loudly if the outputs ever differ.
+    """
+    profiles = list(_variant_profiles(count))
+    columns = profile_columns(profiles)
+
+    def timed(func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    def retained(func):
+        tracemalloc.start()
+        result = func()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return result, size
+
+    row_seconds = timed(lambda: [personalize_profile(p) for p in profiles])
+    batch_seconds = timed(lambda: personalize_batch(columns))
+    rows, row_bytes = retained(lambda: [personalize_profile(p) for p in profiles])
+    batch, batch_bytes = retained(lambda: personalize_batch(columns))
+
+    if batch.to_dicts() != rows:
+        raise AssertionError("personalize_batch() output differs from personalize_profile()")
+    return {
+        "scalar_us": row_seconds / count * 1e6,
+        "batch_us": batch_seconds / count * 1e6,
+        "scalar_bytes": row_bytes / count,
+        "batch_bytes": batch_bytes / count,
+    }
+
+
+def bench_validation(count: int = 50_000) -> dict:
+    """
+    Cost (microseconds) of checking one LLM routine, meal plan and task
+    list (fake Gemini answers), each checked `count` times. Fails loudly if
+    a valid answer is ever rejected.
+    """
+    orchestrator = _orchestrator(True)
+    prefs, personality = orchestrator.prefs, orchestrator.personality
+    with fake_gemini(latency=0.0), _quiet():
+        sections = {
+            "routine": orchestrator.routine_agent.generate(prefs, personality, True),
+            "meals": orchestrator.meal_planner.generate_meal_plan(prefs, personality, True),
+            "tasks": orchestrator.task_optimizer.optimize_tasks(prefs, personality, True),
+        }
+    results = {}
+    for section, answer in sections.items():
+        problems = section_problems(section, answer, prefs)
+        if problems:
+            raise AssertionError(f"valid {section} answer rejected: {problems}")
+        start = time.perf_counter()
+        for _ in range(count):
+            section_problems(section, answer, prefs)
+        results[f"{section}_us"] = (time.perf_counter() - start) / count * 1e6
+    return results
+
+
+def bench_horizon(weeks: int = 52) -> dict:
+    """
+    An offline `weeks`-long plan streamed to /dev/null: time to the first
+    week and per later week (ms), and peak traced memory (KiB), which
+    should stay flat as `weeks` grows.
+    """
+    def plan():
+        timings = []
+        start = time.perf_counter()
+        for _ in _orchestrator(False).iter_weeks(weeks):
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    with _quiet():
+        plan()
+        timings, _, peak = _measure(plan)
+    return {
+        "first_week_ms": timings[0] * 1000,
+        "week_ms": (timings[-1] - timings[0]) / max(1, len(timings) - 1) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+
+def bench_archive(plans: int = 500) -> dict:
+    """
+    `plans` offline plans of variant profiles stored in a fresh PlanArchive:
+    bytes on disk per plan next to the plan's own size, and the cost
+    (microseconds) of storing a plan and of reading one back. Fails loudly
+    if a plan does not read back unchanged.
+    """
+    with _quiet():
+        markdowns = [_orchestrator(False, prefs=prefs).run_full_pipeline() for prefs in _variant_profiles(plans)]
+    with tempfile.TemporaryDirectory() as tmp, _quiet():
+        archive = PlanArchive(os.path.join(tmp, "archive"))
+        start = time.perf_counter()
+        ids = [archive.put(f"bench-{i}", markdown) for i, markdown in enumerate(markdowns)]
+        put_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        stored = [archive.get(plan_id) for plan_id in ids]
+        get_seconds = time.perf_counter() - start
+        if stored != markdowns:
+            raise AssertionError("archived plans do not read back unchanged")
+        stats = archive.stats()
+    return {
+        "plan_bytes": stats["plan_bytes"] / plans,
+        "stored_bytes_per_plan": stats["stored_bytes"] / plans,
+        "put_us": put_seconds / plans * 1e6,
+        "get_us": get_seconds / plans * 1e6,
+    }
+
+
+# Runs in a fresh interpreter: time the imports and the first offline plan,
+# and report whether the Gemini SDK got loaded along the way
+_STARTUP_SCRIPT = """
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+from agents import OrchestratorAgent
+from personality_engine import personalize_profile
+from user_input import DEFAULT_PROFILE
+imported = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    OrchestratorAgent(
+        user_prefs=dict(DEFAULT_PROFILE),
+        personality=personalize_profile(DEFAULT_PROFILE),
+        persist_memory=False,
+        deadline=None
+    ).run_full_pipeline()
+done = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "offline_plan_ms": (done - imported) * 1000,
+    "llm_sdk_imported": float("google.generativeai" in sys.modules),
+}))
+"""
+
+
+def bench_startup(runs: int = 5) -> dict:
+    """
+    Cold start of an offline worker: `runs` fresh interpreters each import
+    the agents and plan one profile. Reports the median import time, first
+    plan time and whole-process wall time (ms). Bytecode is cached in a
+    temporary directory and warmed up by one untimed run, as on a deployed
+    worker.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])),
+                   PYTHONPYCACHEPREFIX=tmp, LLM_CACHE_DISABLED="1")
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        samples: Dict[str, List[float]] = {}
+        for i in range(runs + 1):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT], cwd=tmp, env=env,
+                                 capture_output=True, text=True, check=True).stdout
+            elapsed = time.perf_counter() - start
+            if i == 0:
+                continue
+            result = json.loads(out.strip().splitlines()[-1])
+            result["process_ms"] = elapsed * 1000
+            for name, value in result.items():
+                samples.setdefault(name, []).append(value)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def run_suites(suites: List[str], args) -> Dict[str, float]:
+    """Run the chosen suites and flatten their numbers into {metric: value}."""
+    fake_options = {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate}
+    metrics: Dict[str, float] = {}
+    if "markdown" in suites:
+        results = bench_markdown(args.size)
+        metrics["markdown.render_ms"] = results[args.size]["seconds"] * 1000
+        metrics["markdown.rerender_ms"] = results[args.size]["rerender_seconds"] * 1000
+        metrics["markdown.peak_kib"] = results[args.size]["peak_bytes"] / 1024
+    if "pipeline" in suites:
+        for mode in ("offline", "llm", "fused", "stream"):
+            for name, value in bench_pipeline(mode, args.runs, **fake_options).items():
+                metrics[f"pipeline.{mode}.{name}"] = value
+    if "batch" in suites:
+        for name, value in bench_batch(args.count, args.workers, **fake_options).items():
+            metrics[f"batch.{name}"] = value
+    if "personality" in suites:
+        for name, value in bench_personality(args.profiles).items():
+            metrics[f"personality.{name}"] = value
+    if "validation" in suites:
+        for name, value in bench_validation(args.sections).items():
+            metrics[f"validation.{name}"] = value
+    if "horizon" in suites:
+        for name, value in bench_horizon(args.weeks).items():
+            metrics[f"horizon.{name}"] = value
+    if "archive" in suites:
+        for name, value in bench_archive(args.plans).items():
+            metrics[f"archive.{name}"] = value
+    if "startup" in suites:
+        for name, value in bench_startup(args.runs).items():
+            metrics[f"startup.{name}"] = value
+    return metrics
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_s")
+
+
+def _absolute_slack(metric: str) -> float:
+    if metric.endswith("_ms"):
+        return ABSOLUTE_SLACK_MS
+    if metric.endswith("_us"):
+        return ABSOLUTE_SLACK_US
+    return 0.0
+
+
+def compare(metrics: Dict[str, float], baselines: Dict[str, float], tolerance: float) -> List[str]:
+    """
+    Regressions against the baseline, as readable lines.
+    Throughput may not drop by more than `tolerance`; latency and memory may
+    not grow by more than `tolerance` (plus a small absolute slack for
+    timings); LLM call and token counts, fallbacks, repairs and whether an
+    offline start loaded the Gemini SDK may not grow at all.
+    """
+    regressions = []
+    for metric, value in sorted(metrics.items()):
+        base = baselines.get(metric)
+        if base is None:
+            continue
+        if higher_is_better(metric):
+            limit = base * (1 - tolerance)
+            failed = value < limit
+        elif metric.endswith(("llm_calls_per_plan", "llm_tokens_per_plan", "fallbacks", "repairs", "llm_sdk_imported")):
+            limit = base
+            failed = value > limit + 1e-9
+        else:
+            limit = base * (1 + tolerance) + _absolute_slack(metric)
+            failed = value > limit
+        if failed:
+            regressions.append(f"{metric}: {value:.2f} (baseline {base:.2f}, limit {limit:.2f})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agent LifeNavigator benchmarks")
+    parser.add_argument("suite", choices=["markdown", "pipeline", "batch", "personality", "validation", "horizon", "archive", "startup", "all"])
+    parser.add_argument("--size", type=int, default=10_000, help="markdown: tasks and events per plan")
+    parser.add_argument("--runs", type=int, default=5, help="pipeline: plans per mode; startup: interpreter runs")
+    parser.add_argument("--count", type=int, default=200, help="batch: offline profiles")
+    parser.add_argument("--profiles", type=int, default=200_000, help="personality: profiles per run")
+    parser.add_argument("--sections", type=int, default=50_000, help="validation: checks per section")
+    parser.add_argument("--weeks", type=int, default=52, help="horizon: weeks per plan")
+    parser.add_argument("--plans", type=int, default=500, help="archive: plans stored")
+    parser.add_argument("--workers", type=int, default=4, help="batch: worker processes")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Gemini latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="fake Gemini latency jitter (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake Gemini error rate (0-1)")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any metric regressed vs the baseline")
+    parser.add_argument("--update-baselines", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--baselines", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    if args.suite == "markdown" and not (args.check or args.update_baselines):
+        results = bench_markdown(args.size)
+        for n in (args.size, args.size * 2):
+            r = results[n]
+            print(f"{n:>7} tasks+events: render {r['seconds'] * 1000:7.1f} ms, "
+                  f"peak {r['peak_bytes'] / 1024:8.0f} KiB, "
+                  f"re-render {r['rerender_seconds'] * 1000:6.1f} ms ({', '.join(r['rerendered'])})")
+        print(f"2x size -> {results['time_ratio']:.2f}x time, {results['memory_ratio']:.2f}x memory")
+        return 0
+
+    suites = ["markdown", "pipeline", "batch", "personality", "validation", "horizon", "archive", "startup"] if args.suite == "all" else [args.suite]
+    metrics = run_suites(suites, args)
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, "r") as f:
+            baselines = json.load(f)
+
+    for metric, value in sorted(metrics.items()):
+        base = baselines.get(metric)
+        change = f"  ({(value / base - 1) * 100:+6.1f}% vs baseline)" if base else ""
+        print(f"{metric:<40} {value:12.2f}{change}")
+
+    if args.update_baselines:
+        baselines.update(metrics)
+        with open(args.baselines, "w") as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write("\n")
+        print(f"Baselines written to {args.baselines}")
+        return 0
+
+    if args.check:
+        regressions = compare(metrics, baselines, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,539 @@
+# calendar_engine.py
+"""
+Scheduling core for CalendarManager.
+
+Routine blocks and events are parsed into typed intervals and stored in a
+per-day sorted-array index. Each day keeps its intervals sorted by start
+together with a running maximum of end times, which turns overlap queries
+into a binary search plus a scan over the actual matches.
+"""
+
+from __future__ import annotations
+
+import bisect
+import heapq
+import itertools
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# "07:00–07:30 Morning hygiene", "- 18:00 - 19:00: Gym", "23:00 Wind down"
+_RANGE = re.compile(r"(\d{1,2}):(\d{2})\s*(?:[–—-]|to)\s*(\d{1,2}):(\d{2})\s*:?\s*(.*)")
+_SINGLE = re.compile(r"(\d{1,2}):(\d{2})\s*:?\s*(.*)")
+# "2025-11-28 10:00 Team standup" or "2025-11-28 10:00–11:00 Team standup"
+_EVENT = re.compile(
+    r"(\d{4}-\d{2}-\d{2})\s+(\d{1,2}):(\d{2})(?:\s*[–—-]\s*(\d{1,2}):(\d{2}))?\s+(.*)"
+)
+
+DEFAULT_BLOCK = timedelta(minutes=30)
+DEFAULT_EVENT = timedelta(hours=1)
+
+
+@dataclass(frozen=True, slots=True)
+class Interval:
+    start: datetime
+    end: datetime
+    title: str
+    kind: str = "event"
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        return self.start < end and start < self.end
+
+    def __str__(self) -> str:
+        return f"{self.start:%Y-%m-%d %H:%M}–{self.end:%H:%M} {self.title}"
+
+
+def parse_routine(text: str) -> List[Tuple[time, timedelta, str]]:
+    """
+    Parse routine lines into (start time, duration, title).
+    Lines without a time are ignored; a single time means a 30 minute block.
+    """
+    blocks = []
+    for line in text.splitlines():
+        line = line.strip().lstrip("-*• ").strip()
+        match = _RANGE.match(line)
+        if match:
+            h1, m1, h2, m2, title = match.groups()
+            start = int(h1) * 60 + int(m1)
+            end = int(h2) * 60 + int(m2)
+            if end <= start:
+                end += 24 * 60  # crosses midnight
+            blocks.append((time(int(h1) % 24, int(m1)), timedelta(minutes=end - start), title.strip()))
+            continue
+        match = _SINGLE.match(line)
+        if match:
+            h, m, title = match.groups()
+            blocks.append((time(int(h) % 24, int(m)), DEFAULT_BLOCK, title.strip()))
+    return blocks
+
+
+def parse_event(line: str) -> Optional[Interval]:
+    """Parse 'YYYY-MM-DD HH:MM[–HH:MM] Title'; events without an end last an hour."""
+    match = _EVENT.match(line.strip())
+    if not match:
+        return None
+    day, h1, m1, h2, m2, title = match.groups()
+    start = datetime.combine(date.fromisoformat(day), time(int(h1), int(m1)))
+    if h2 is not None:
+        end = datetime.combine(start.date(), time(int(h2) % 24, int(m2)))
+        if end <= start:
+            end += timedelta(days=1)
+    else:
+        end = start + DEFAULT_EVENT
+    return Interval(start, end, title.strip(), "event")
+
+
+class DayIndex:
+    """
+    Intervals touching one day, sorted by start, with a prefix maximum of
+    end times. Inserts are buffered and sorted lazily on the next query,
+    so bulk loading is O(n log n).
+    """
+
+    __slots__ = ("_items", "_starts", "_max_end", "_dirty")
+
+    def __init__(self):
+        self._items: List[Interval] = []
+        self._starts: List[datetime] = []
+        self._max_end: List[datetime] = []
+        self._dirty = False
+
+    def add(self, interval: Interval):
+        self._items.append(interval)
+        self._dirty = True
+
+    def _build(self):
+        if not self._dirty:
+            return
+        self._items.sort(key=lambda iv: (iv.start, iv.end))
+        self._starts = [iv.start for iv in self._items]
+        self._max_end = []
+        running = None
+        for iv in self._items:
+            running = iv.end if running is None or iv.end > running else running
+            self._max_end.append(running)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Interval]:
+        self._build()
+        return iter(self._items)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Interval]:
+        self._build()
+        # First interval whose running max end passes `start`; nothing before it can overlap.
+        i = bisect.bisect_right(self._max_end, start)
+        stop = bisect.bisect_left(self._starts, end)
+        return [iv for iv in self._items[i:stop] if iv.end > start]
+
+    def conflicts(self) -> List[Tuple[Interval, Interval]]:
+        """All overlapping pairs, via a sweep with a heap of active end times."""
+        self._build()
+        pairs = []
+        active: List[Tuple[datetime, int]] = []
+        for idx, iv in enumerate(self._items):
+            while active and active[0][0] <= iv.start:
+                heapq.heappop(active)
+            pairs.extend((self._items[j], iv) for _, j in active)
+            heapq.heappush(active, (iv.end, idx))
+        return pairs
+
+
+class CalendarIndex:
+    """
+    Date-bucketed interval index. An interval is registered in every day it
+    touches, so queries for a day or week only look at that day's buckets.
+    """
+
+    def __init__(self):
+        self._days: Dict[date, DayIndex] = {}
+
+    def add(self, interval: Interval):
+        day = interval.start.date()
+        last = (interval.end - timedelta(microseconds=1)).date()
+        while day <= last:
+            self._days.setdefault(day, DayIndex()).add(interval)
+            day += timedelta(days=1)
+
+    def add_all(self, intervals: Iterable[Interval]):
+        for interval in intervals:
+            self.add(interval)
+
+    def build(self):
+        """Sort every day's intervals now instead of on the first query."""
+        for bucket in self._days.values():
+            bucket._build()
+
+    def add_routine(self, routine_text: str, start_date: date, days: int = 7, weekdays_only: bool = True):
+        """Repeat the parsed routine on every (week)day of the window."""
+        blocks = parse_routine(routine_text)
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            if weekdays_only and day.weekday() >= 5:
+                continue
+            for start, duration, title in blocks:
+                begin = datetime.combine(day, start)
+                kind = "work" if re.search(r"\b(work|study)\b", title, re.IGNORECASE) else "routine"
+                self.add(Interval(begin, begin + duration, title, kind))
+
+    def day(self, day: date) -> List[Interval]:
+        bucket = self._days.get(day)
+        return list(bucket) if bucket else []
+
+    def days(self, start_date: date, end_date: date) -> Iterator[Tuple[date, List[Interval]]]:
+        """Yield (day, intervals) for each day in [start_date, end_date)."""
+        day = start_date
+        while day < end_date:
+            yield day, self.day(day)
+            day += timedelta(days=1)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Interval]:
+        found, seen = [], set()
+        day = start.date()
+        while day <= (end - timedelta(microseconds=1)).date():
+            bucket = self._days.get(day)
+            if bucket:
+                for iv in bucket.overlapping(start, end):
+                    if id(iv) not in seen:
+                        seen.add(id(iv))
+                        found.append(iv)
+            day += timedelta(days=1)
+        return found
+
+    def conflicts(self, start_date: date | None = None, end_date: date | None = None) -> List[Tuple[Interval, Interval]]:
+        """Overlapping pairs in [start_date, end_date); pairs spanning midnight are reported once."""
+        pairs, seen = [], set()
+        for day in sorted(self._days):
+            if (start_date and day < start_date) or (end_date and day >= end_date):
+                continue
+            for a, b in self._days[day].conflicts():
+                key = (id(a), id(b))
+                if key not in seen:
+                    seen.add(key)
+                    pairs.append((a, b))
+        return pairs
+
+    def free_slots(
+        self,
+        day: date,
+        duration: timedelta,
+        day_start: time = time(7, 0),
+        day_end: time = time(22, 0)
+    ) -> List[Tuple[datetime, datetime]]:
+        """Gaps of at least `duration` between day_start and day_end."""
+        cursor = datetime.combine(day, day_start)
+        limit = datetime.combine(day, day_end)
+        slots = []
+        for iv in self.overlapping(cursor, limit):
+            if iv.start - cursor >= duration:
+                slots.append((cursor, iv.start))
+            if iv.end > cursor:
+                cursor = iv.end
+        if limit - cursor >= duration:
+            slots.append((cursor, limit))
+        return slots
+
+    def __len__(self) -> int:
+        return len({id(iv) for bucket in self._days.values() for iv in bucket})
+
+
+# ---------------------------------------------------------------------------
+# iCalendar (.ics) ingestion
+# ---------------------------------------------------------------------------
+
+_WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+_DURATION = re.compile(r"([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?")
+
+
+def _unfolded_lines(f) -> Iterator[str]:
+    """Join RFC 5545 folded lines (continuations start with a space or tab) one line at a time."""
+    current = None
+    for raw in f:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+_TZID = re.compile(r'TZID="?([^";:]+)"?', re.IGNORECASE)
+
+
+def _zone(params: str) -> Optional[ZoneInfo]:
+    match = _TZID.search(params)
+    if not match:
+        return None
+    try:
+        return ZoneInfo(match.group(1).strip())
+    except (ZoneInfoNotFoundError, ValueError):
+        return None  # e.g. a Windows zone name defined in a VTIMEZONE block
+
+
+def _parse_ics_datetime(value: str, params: str) -> Tuple[datetime, bool]:
+    """
+    Return (naive local datetime, all_day). UTC times ("...Z") and times
+    with an IANA TZID are converted to the local zone; floating times and
+    unknown TZIDs are taken as local time. Raises ValueError when the value
+    is not a DATE or DATE-TIME.
+    """
+    # Sliced by hand: strptime dominates import time on multi-megabyte files.
+    v = value.strip()
+    day = datetime(int(v[0:4]), int(v[4:6]), int(v[6:8]))
+    if "VALUE=DATE" in params.upper() or len(v) == 8:
+        return day, True
+    dt = day.replace(hour=int(v[9:11]), minute=int(v[11:13]), second=int(v[13:15] or 0))
+    zone = timezone.utc if v.endswith("Z") else _zone(params)
+    if zone is not None:
+        dt = dt.replace(tzinfo=zone).astimezone().replace(tzinfo=None)
+    return dt, False
+
+
+def _parse_duration(value: str) -> timedelta:
+    match = _DURATION.fullmatch(value.strip())
+    if not match:
+        return DEFAULT_EVENT
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    delta = timedelta(
+        weeks=int(weeks or 0), days=int(days or 0),
+        hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0)
+    )
+    return -delta if sign == "-" else delta
+
+
+def _unescape(text: str) -> str:
+    return text.replace("\\n", " ").replace("\\N", " ").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+
+def _add_months(dt: datetime, months: int) -> Optional[datetime]:
+    month = dt.month - 1 + months
+    try:
+        return dt.replace(year=dt.year + month // 12, month=month % 12 + 1)
+    except ValueError:
+        return None  # e.g. the 31st in a 30-day month: RFC 5545 skips it
+
+
+def _occurrences(start: datetime, rule: Dict[str, str], window_start: datetime,
+                 window_end: datetime, duration: timedelta) -> Iterator[datetime]:
+    """
+    Lazily expand an RRULE, yielding only starts whose occurrence touches the window.
+    DAILY and plain WEEKLY rules jump straight to the window instead of
+    walking years of history.
+    """
+    freq = rule.get("FREQ", "DAILY")
+    interval = max(int(rule.get("INTERVAL", "1")), 1)
+    count = int(rule["COUNT"]) if "COUNT" in rule else None
+    until = _parse_ics_datetime(rule["UNTIL"], "")[0] if "UNTIL" in rule else None
+    byday = [_WEEKDAYS[d[-2:]] for d in rule.get("BYDAY", "").split(",") if d[-2:] in _WEEKDAYS]
+
+    def emit(candidates: Iterable[datetime]) -> Iterator[datetime]:
+        nonlocal count
+        for occ in candidates:
+            if occ >= window_end or (until and occ > until) or count == 0:
+                return
+            if count is not None:
+                count -= 1
+            if occ + duration > window_start:
+                yield occ
+
+    if freq in ("DAILY", "WEEKLY") and not (freq == "WEEKLY" and byday):
+        step = timedelta(days=interval if freq == "DAILY" else 7 * interval)
+        skip = max(0, (window_start - duration - start) // step)
+        if count is not None:
+            count = max(count - skip, 0)
+        first = start + skip * step
+        yield from emit(first + i * step for i in itertools.count())
+        return
+
+    if freq == "WEEKLY":
+        def weekly():
+            week0 = start - timedelta(days=start.weekday())
+            for w in itertools.count():
+                week = week0 + timedelta(weeks=w * interval)
+                for wd in sorted(byday):
+                    occ = week + timedelta(days=wd)
+                    if occ >= start:
+                        yield occ
+        yield from emit(weekly())
+    elif freq == "MONTHLY":
+        yield from emit(o for o in (_add_months(start, i * interval) for i in itertools.count()) if o)
+    elif freq == "YEARLY":
+        yield from emit(o for o in (_add_months(start, 12 * i * interval) for i in itertools.count()) if o)
+
+
+def _vevents(path: str) -> Iterator[Tuple[Dict[str, Tuple[str, str]], List[Tuple[str, str]]]]:
+    """Yield (properties, EXDATE values) for each VEVENT, reading the file line by line."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        props: Optional[Dict[str, Tuple[str, str]]] = None
+        exdates: List[Tuple[str, str]] = []
+        for line in _unfolded_lines(f):
+            if line == "BEGIN:VEVENT":
+                props, exdates = {}, []
+                continue
+            if props is None:
+                continue
+            if line == "END:VEVENT":
+                yield props, exdates
+                props = None
+                continue
+
+            head, _, value = line.partition(":")
+            name, _, params = head.partition(";")
+            name = name.upper()
+            if name == "EXDATE":
+                exdates.extend((part, params) for part in value.split(","))
+            elif name in ("DTSTART", "DTEND", "DURATION", "SUMMARY", "RRULE", "STATUS"):
+                props[name] = (value, params)
+
+
+@dataclass(frozen=True, slots=True)
+class _IcsEvent:
+    start: datetime
+    duration: timedelta
+    title: str
+    kind: str
+    rule: Optional[Dict[str, str]]
+    exdates: frozenset
+
+    def occurrences(self, window_start: datetime, window_end: datetime) -> Iterator[Interval]:
+        """Intervals of this event that touch [window_start, window_end)."""
+        if self.rule is not None:
+            starts = _occurrences(self.start, self.rule, window_start, window_end, self.duration)
+        elif self.start < window_end and self.start + self.duration > window_start:
+            starts = iter([self.start])
+        else:
+            starts = iter(())
+        for occ in starts:
+            if occ not in self.exdates:
+                yield Interval(occ, occ + max(self.duration, timedelta(minutes=1)), self.title, self.kind)
+
+
+def _check_rule(rule: Dict[str, str]):
+    """Raise ValueError now for the RRULE parts _occurrences() would fail on later."""
+    int(rule.get("INTERVAL", "1"))
+    int(rule.get("COUNT", "0"))
+    if "UNTIL" in rule:
+        _parse_ics_datetime(rule["UNTIL"], "")
+
+
+def _parse_vevent(props: Dict[str, Tuple[str, str]], exdates: List[Tuple[str, str]]) -> Optional[_IcsEvent]:
+    """The event, or None if it has no start or is cancelled. Raises ValueError if malformed."""
+    if "DTSTART" not in props or props.get("STATUS", ("", ""))[0].upper() == "CANCELLED":
+        return None
+    start, all_day = _parse_ics_datetime(*props["DTSTART"])
+    if "DTEND" in props:
+        duration = _parse_ics_datetime(*props["DTEND"])[0] - start
+    elif "DURATION" in props:
+        duration = _parse_duration(props["DURATION"][0])
+    else:
+        duration = timedelta(days=1) if all_day else timedelta(0)
+    rule = None
+    if "RRULE" in props:
+        rule = dict(part.split("=", 1) for part in props["RRULE"][0].split(";") if "=" in part)
+        _check_rule(rule)
+    return _IcsEvent(
+        start=start,
+        duration=duration,
+        title=_unescape(props.get("SUMMARY", ("(no title)", ""))[0]),
+        kind="all_day" if all_day else "event",
+        rule=rule,
+        exdates=frozenset(_parse_ics_datetime(*exdate)[0] for exdate in exdates),
+    )
+
+
+def _ics_events(path: str, skipped: List[str]) -> Iterator[_IcsEvent]:
+    """Parsed events of an .ics file; malformed ones are left out and their titles added to `skipped`."""
+    for props, exdates in _vevents(path):
+        try:
+            event = _parse_vevent(props, exdates)
+        except (ValueError, IndexError):
+            skipped.append(_unescape(props.get("SUMMARY", ("(no title)", ""))[0]))
+            continue
+        if event is not None:
+            yield event
+
+
+def iter_ics_events(path: str, window_start: date, window_end: date,
+                    skipped: List[str] | None = None) -> Iterator[Interval]:
+    """
+    Stream events from an .ics file that fall in [window_start, window_end).
+    The file is read line by line and recurring events are expanded only
+    inside the window, so memory stays flat however large the file is.
+    Events with a malformed date are skipped (their titles are appended
+    to `skipped`). See _parse_ics_datetime for how time zones are handled.
+    """
+    start_dt = datetime.combine(window_start, time())
+    end_dt = datetime.combine(window_end, time())
+    for event in _ics_events(path, skipped if skipped is not None else []):
+        yield from event.occurrences(start_dt, end_dt)
+
+
+class IcsCalendar:
+    """
+    All events of one .ics file, parsed once and queried per window.
+    One-off events are kept in a CalendarIndex, so a window is answered by
+    looking at its days' buckets; recurring events are kept as rules and
+    expanded only inside the window asked for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.skipped: List[str] = []
+        self.index = CalendarIndex()
+        self._recurring: List[_IcsEvent] = []
+        for event in _ics_events(path, self.skipped):
+            if event.rule is not None:
+                self._recurring.append(event)
+            else:
+                # A one-off event's only occurrence, unless it is excluded
+                self.index.add_all(event.occurrences(datetime.min, datetime.max))
+        # Sorted up front, so threads can share the calendar
+        self.index.build()
+
+    def between(self, window_start: date, window_end: date) -> List[Interval]:
+        """Events touching [window_start, window_end), sorted by start."""
+        start_dt = datetime.combine(window_start, time())
+        end_dt = datetime.combine(window_end, time())
+        found = self.index.overlapping(start_dt, end_dt)
+        for event in self._recurring:
+            found.extend(event.occurrences(start_dt, end_dt))
+        return sorted(found, key=lambda iv: (iv.start, iv.end))
+
+
+# Parsed calendars by path, reused until the file changes
+ICS_CACHE_SIZE = 32
+_ics_cache: OrderedDict[str, Tuple[Tuple[int, int], IcsCalendar]] = OrderedDict()
+_ics_lock = threading.Lock()
+
+
+def load_ics(path: str) -> IcsCalendar:
+    """
+    The parsed calendar for `path`. It is parsed again only when the file's
+    modification time or size changes; the ICS_CACHE_SIZE most recently
+    used files are kept.
+    """
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _ics_lock:
+        cached = _ics_cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            _ics_cache.move_to_end(path)
+            return cached[1]
+
+    calendar = IcsCalendar(path)
+    with _ics_lock:
+        _ics_cache[path] = (stamp, calendar)
+        _ics_cache.move_to_end(path)
+        while len(_ics_cache) > ICS_CACHE_SIZE:
+            _ics_cache.popitem(last=False)
+    return calendar
@@ -10,6 +10,81 @@ except ImportError:
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# Upper bound on concurrent Gemini requests per process
+# (the adaptive limit moves between 1 and this)
+GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "8"))
+
+# Project quota for Gemini: requests and tokens per minute (0 = no client-side limit)
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+
+# Per-request timeout (seconds) and retries on 429/5xx/timeouts
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "120"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+
+# LLM response cache (set LLM_CACHE_DISABLED=1 to always call Gemini)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+# Latency budget (seconds) for one plan; LLM stages that would overrun it
+# fall back to the offline rule-based result (0 = no budget)
+PLAN_DEADLINE_SECONDS = float(os.getenv("PLAN_DEADLINE_SECONDS", "0"))
+
+# Skip the LLM for BREAKER_RESET_SECONDS after this many consecutive failures
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Timed-out LLM calls keep running in the background. At most
+# BREAKER_MAX_ABANDONED of them may be outstanding before the breaker opens,
+# and guarded calls share LLM_CALL_WORKERS threads (keep it above that cap)
+BREAKER_MAX_ABANDONED = int(os.getenv("BREAKER_MAX_ABANDONED", "8"))
+LLM_CALL_WORKERS = int(os.getenv("LLM_CALL_WORKERS", "32"))
+
+# Generate routine, meals and tasks with one structured Gemini call instead of three
+LLM_FUSED_MODE = os.getenv("LLM_FUSED_MODE", "").lower() in ("1", "true", "yes")
+
+# Check each LLM section (timed, non-overlapping routine blocks; all seven
+# days of meals; every task kept) and re-request only the sections that
+# fail, at most VALIDATION_MAX_REPAIRS times before using the offline result
+PLAN_VALIDATION = os.getenv("PLAN_VALIDATION", "1").lower() in ("1", "true", "yes")
+VALIDATION_MAX_REPAIRS = int(os.getenv("VALIDATION_MAX_REPAIRS", "2"))
+
+# Tracing: TRACE_PATH appends one JSON line per span; METRICS_PATH receives
+# Prometheus-style metrics at the end of a run. TRACE=1 enables tracing
+# without a span file.
+TRACE_PATH = os.getenv("TRACE_PATH") or None
+METRICS_PATH = os.getenv("METRICS_PATH") or None
+TRACE_ENABLED = bool(TRACE_PATH or METRICS_PATH) or os.getenv("TRACE", "").lower() in ("1", "true", "yes")
+
+# Serve routine, meals and tasks from per-archetype templates made by
+# `python templates.py warm`, instead of asking Gemini for every user.
+# Templates older than TEMPLATE_MAX_AGE seconds (0 = never) are stale and
+# only served with TEMPLATE_SERVE_STALE=1.
+LLM_TEMPLATES = os.getenv("LLM_TEMPLATES", "").lower() in ("1", "true", "yes")
+TEMPLATE_PATH = os.getenv("TEMPLATE_PATH", ".plan_templates.sqlite")
+TEMPLATE_MAX_AGE = float(os.getenv("TEMPLATE_MAX_AGE", str(30 * 24 * 3600)))
+TEMPLATE_SERVE_STALE = os.getenv("TEMPLATE_SERVE_STALE", "").lower() in ("1", "true", "yes")
+
+# Replace or add pipeline components without editing the code, e.g.
+# LIFENAVIGATOR_PLUGINS="meal_planner=my_meals:MealPlanner,routine_agent=my_pkg.routines:Designer"
+LIFENAVIGATOR_PLUGINS = os.getenv("LIFENAVIGATOR_PLUGINS", "")
+
+# HTTP service (server.py): pipelines that run at once, plans that may wait
+# for a slot before new ones are turned away with 503, and the largest
+# accepted request body and the number of open connections
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+SERVER_MAX_PIPELINES = int(os.getenv("SERVER_MAX_PIPELINES", "32"))
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "512"))
+SERVER_MAX_BODY_BYTES = int(os.getenv("SERVER_MAX_BODY_BYTES", "65536"))
+SERVER_MAX_CONNECTIONS = int(os.getenv("SERVER_MAX_CONNECTIONS", "1024"))
+
+# Content-addressed archive of generated plans (archive.py). With
+# PLAN_ARCHIVE=1, main.py also stores every plan it generates there.
+PLAN_ARCHIVE_PATH = os.getenv("PLAN_ARCHIVE_PATH", ".plan_archive")
+PLAN_ARCHIVE = os.getenv("PLAN_ARCHIVE", "").lower() in ("1", "true", "yes")
+
 
 def ensure_api_key():
     """
@@ -0,0 +1,173 @@
+# fake_gemini.py
+"""
+Local stand-in for the Gemini model, for benchmarks and offline runs of the
+LLM code path. It needs no API key or network, and its latency, jitter,
+error rate and streaming behaviour can all be configured.
+
+    with fake_gemini(latency=0.2, error_rate=0.05) as fake:
+        OrchestratorAgent(use_llm=True, ...).run_full_pipeline()
+        print(fake.calls)
+"""
+
+import contextlib
+import json
+import random
+import threading
+import time
+from typing import Iterator
+
+import gemini_agent
+import resilience
+from recipes import DAYS
+
+_ROUTINE = """- 07:00–07:30 Wake up, hydrate, skincare
+- 07:30–08:00 Breakfast
+- 09:00–12:30 Deep work
+- 12:30–13:15 Lunch break
+- 13:15–17:00 Meetings and shallow work
+- 18:00–19:00 Gym
+- 19:30–20:30 Learning
+- 22:30–23:00 Wind down"""
+
+_DAY_MEALS = {"Breakfast": "Oats with fruit", "Lunch": "Lentil bowl", "Dinner": "Vegetable stir-fry"}
+_MEALS = "\n\n".join(
+    f"{day}:\n" + "\n".join(f"- {meal}: {dish}" for meal, dish in _DAY_MEALS.items())
+    for day in DAYS
+)
+
+_TASKS = """- (1) Update resume
+- (1) Pay electricity bill
+- (2) Deep clean kitchen
+- (2) Call parents
+- (3) Read 20 pages of a book
+- (3) Plan next week's meals"""
+
+
+def _fused_answer() -> str:
+    routine = []
+    for line in _ROUTINE.splitlines():
+        times, activity = line[2:].split(" ", 1)
+        start, end = times.split("–")
+        routine.append({"start": start, "end": end, "activity": activity})
+    return json.dumps({
+        "routine": routine,
+        "meals": [{"day": day, **{m.lower(): dish for m, dish in _DAY_MEALS.items()}} for day in DAYS],
+        "shopping_list": ["Oats", "Fruit", "Lentils", "Mixed vegetables", "Rice"],
+        "tasks": [{"title": line[6:], "priority": int(line[3])} for line in _TASKS.splitlines()],
+    })
+
+
+_FUSED = _fused_answer()
+
+
+class FakeServerError(Exception):
+    """Raised for injected failures; carries an HTTP status like google.api_core errors."""
+
+    def __init__(self, code: int):
+        super().__init__(f"injected {code} from fake Gemini")
+        self.code = code
+
+
+class _Usage:
+    def __init__(self, prompt: str, text: str):
+        self.prompt_token_count = max(1, len(prompt) // 4)
+        self.candidates_token_count = max(1, len(text) // 4)
+
+
+class _Response:
+    def __init__(self, text: str, usage: _Usage | None = None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeGeminiModel:
+    """
+    Implements the part of genai.GenerativeModel the client uses.
+    Answers are canned per prompt type: routine, meals, tasks, or fused
+    JSON when a JSON response is requested.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_code: int = 503,
+        stream_chunks: int = 8,
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.stream_chunks = stream_chunks
+        self.model_name = "fake-gemini"
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt: str, generation_config: dict | None) -> str:
+        if generation_config and generation_config.get("response_mime_type") == "application/json":
+            return _FUSED
+        if "nutritionist" in prompt:
+            return _MEALS
+        if "productivity coach" in prompt:
+            return _TASKS
+        return _ROUTINE
+
+    def _delay(self) -> float:
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        if failed:
+            raise FakeServerError(self.error_code)
+        return delay
+
+    def generate_content(self, prompt: str, generation_config=None, stream: bool = False, request_options=None):
+        self._delay()
+        text = self._answer(prompt, generation_config)
+        usage = _Usage(prompt, text)
+        with self._lock:
+            self.prompt_tokens += usage.prompt_token_count
+            self.output_tokens += usage.candidates_token_count
+        if not stream:
+            return _Response(text, usage)
+        return self._stream(text, usage)
+
+    def _stream(self, text: str, usage: _Usage) -> Iterator[_Response]:
+        # Time to first chunk is `latency`; the rest arrive over another `latency`
+        size = max(1, -(-len(text) // self.stream_chunks))
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        gap = self.latency / max(1, len(pieces) - 1)
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(gap)
+            yield _Response(piece, usage if i == len(pieces) - 1 else None)
+
+
+@contextlib.contextmanager
+def fake_gemini(**options):
+    """
+    Route every llm() call in the process to a FakeGeminiModel for the
+    duration of the block. The response cache is bypassed and the client
+    gets no RPM/TPM limit, so every call reaches the fake. A fresh circuit
+    breaker is used.
+    """
+    fake = FakeGeminiModel(**options)
+    client = gemini_agent.GeminiClientManager(model_name=fake.model_name, rpm=0, tpm=0)
+    client._model = fake
+    saved = (gemini_agent._client, gemini_agent.LLM_CACHE_DISABLED, resilience._breaker)
+    gemini_agent._client = client
+    gemini_agent.LLM_CACHE_DISABLED = True
+    resilience._breaker = None
+    try:
+        yield fake
+    finally:
+        gemini_agent._client, gemini_agent.LLM_CACHE_DISABLED, resilience._breaker = saved
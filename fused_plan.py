@@ -0,0 +1,180 @@
+# fused_plan.py
+"""
+Fused planning mode: one Gemini call returns the routine, meal plan,
+shopping list and tasks together as JSON.
+
+The separate prompts each show their own stage's fields (see
+personality_engine.stage_context) as Python dicts; the fused prompt sends
+the fields of all three stages once, as compact JSON, and saves two round
+trips per plan. The response is parsed into the
+same types the rule-based tools produce, so MarkdownBuilder renders it
+unchanged.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+from rate_limit import estimate_tokens
+from recipes import MEAL_TYPES
+from task_engine import Task
+
+# Gemini response_schema (OpenAPI subset) for the fused answer
+FUSED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "routine": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "start": {"type": "string"},
+                    "end": {"type": "string"},
+                    "activity": {"type": "string"},
+                },
+                "required": ["start", "end", "activity"],
+            },
+        },
+        "meals": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "day": {"type": "string"},
+                    "breakfast": {"type": "string"},
+                    "lunch": {"type": "string"},
+                    "dinner": {"type": "string"},
+                },
+                "required": ["day", "breakfast", "lunch", "dinner"],
+            },
+        },
+        "shopping_list": {"type": "array", "items": {"type": "string"}},
+        "tasks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "priority": {"type": "integer"},
+                },
+                "required": ["title", "priority"],
+            },
+        },
+    },
+    "required": ["routine", "meals", "shopping_list", "tasks"],
+}
+
+FUSED_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": FUSED_SCHEMA,
+}
+
+# Sections whose share of the output tokens is reported
+SECTIONS = ("routine", "meals", "shopping_list", "tasks")
+
+
+@dataclass(slots=True)
+class RoutineBlock:
+    start: str
+    end: str
+    activity: str
+
+    def __str__(self) -> str:
+        return f"{self.start}–{self.end} {self.activity}"
+
+
+@dataclass
+class FusedPlan:
+    routine: List[RoutineBlock]
+    meals: Dict[str, Dict[str, str]]
+    shopping: List[str]
+    tasks: List[Task]
+    usage: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def routine_text(self) -> str:
+        """Routine as "HH:MM–HH:MM Activity" lines, the format CalendarIndex parses."""
+        return "\n".join(str(block) for block in self.routine)
+
+
+def build_fused_prompt(profile: dict, tasks: Sequence[Task]) -> str:
+    """One compact prompt; `profile` should hold only the fields the plan needs."""
+    context = json.dumps(profile, separators=(",", ":"), sort_keys=True)
+    task_list = json.dumps([t.title for t in tasks], separators=(",", ":"))
+    return f"""You are a lifestyle, nutrition and productivity coach.
+Profile: {context}
+Tasks: {task_list}
+Return JSON with:
+- routine: a realistic weekday routine as time blocks (start/end "HH:MM"), covering work, breaks, meals, and gym, learning and skincare where the profile asks for them, ending with wind-down; put demanding blocks at the user's high-energy times.
+- meals: 7 days (Monday..Sunday) of breakfast, lunch and dinner that respect diet_type, budget_level and restrictions.
+- shopping_list: ingredients for those meals.
+- tasks: the given tasks reordered with priority (1 = highest), plus up to 2 relevant extra tasks."""
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return text
+
+
+def section_token_counts(plan: FusedPlan, prompt: str, usage: Dict[str, int | None]) -> Dict[str, int]:
+    """
+    Split the call's output tokens across plan sections, in proportion to
+    each section's size in the answer. Counts Gemini did not report are
+    estimated; a cached response reports (and costs) 0.
+    """
+    compact = {"separators": (",", ":")}
+    sizes = {
+        "routine": len(json.dumps([[b.start, b.end, b.activity] for b in plan.routine], **compact)),
+        "meals": len(json.dumps(plan.meals, **compact)),
+        "shopping_list": len(json.dumps(plan.shopping, **compact)),
+        "tasks": len(json.dumps([[t.title, t.priority] for t in plan.tasks], **compact)),
+    }
+    total_size = sum(sizes.values()) or 1
+    output_tokens = usage.get("output_tokens")
+    if output_tokens is None:
+        output_tokens = max(1, total_size // 4)
+    prompt_tokens = usage.get("prompt_tokens")
+    counts = {"prompt": estimate_tokens(prompt) if prompt_tokens is None else prompt_tokens}
+    for name in SECTIONS:
+        counts[name] = round(output_tokens * sizes[name] / total_size)
+    counts["total"] = counts["prompt"] + output_tokens
+    return counts
+
+
+def parse_fused_response(text: str, known_tasks: Sequence[Task] = ()) -> FusedPlan:
+    """
+    Parse the fused JSON answer into typed plan parts.
+    Raises ValueError if the answer is not valid JSON or misses a section.
+    """
+    try:
+        data = json.loads(_strip_fences(text))
+    except json.JSONDecodeError as ex:
+        raise ValueError(f"Fused response is not valid JSON: {ex}") from ex
+    if not isinstance(data, dict):
+        raise ValueError("Fused response is not a JSON object")
+
+    try:
+        routine = [RoutineBlock(str(b["start"]), str(b["end"]), str(b["activity"])) for b in data["routine"]]
+        meals = {
+            str(day["day"]): {meal: str(day[meal.lower()]) for meal in MEAL_TYPES}
+            for day in data["meals"]
+        }
+        shopping = [str(item) for item in data["shopping_list"]]
+        by_title = {t.title.lower(): t for t in known_tasks}
+        tasks = []
+        for item in data["tasks"]:
+            title, priority = str(item["title"]).strip(), int(item["priority"])
+            base = by_title.get(title.lower())
+            if base:
+                tasks.append(Task(base.title, priority, base.deadline, base.duration, base.difficulty))
+            else:
+                tasks.append(Task(title, priority))
+    except (KeyError, TypeError, ValueError) as ex:
+        raise ValueError(f"Fused response is missing or has a malformed field: {ex}") from ex
+
+    if not routine or not meals:
+        raise ValueError("Fused response has an empty routine or meal plan")
+    return FusedPlan(routine, meals, shopping, tasks)
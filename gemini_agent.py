@@ -1,23 +1,316 @@
 # gemini_agent.py
-import google.generativeai as genai
-from config import GEMINI_API_KEY, ensure_api_key
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Iterator, Tuple
+
+from config import (
+    GEMINI_API_KEY,
+    GEMINI_MAX_IN_FLIGHT,
+    GEMINI_MAX_RETRIES,
+    GEMINI_RPM,
+    GEMINI_TIMEOUT,
+    GEMINI_TPM,
+    LLM_CACHE_DISABLED,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL,
+    ensure_api_key,
+)
+from llm_cache import LLMCache, cache_key
+import tracing
+from rate_limit import AdaptiveConcurrency, RateLimiter, estimate_tokens, is_throttled, retry_call
 
 # Using latest experimental Pro model
 GEMINI_MODEL_NAME = "gemini-2.0-pro-exp"
 
 
+class GeminiClientManager:
+    """
+    Long-lived Gemini client shared by every agent in the process.
+    The SDK is configured and the model built once. Every request passes
+    the shared rate limiter (RPM/TPM) and an adaptive concurrency limit,
+    and is retried with jittered backoff on throttling and server errors.
+    """
+
+    def __init__(
+        self,
+        model_name: str = GEMINI_MODEL_NAME,
+        max_in_flight: int = GEMINI_MAX_IN_FLIGHT,
+        rpm: int = GEMINI_RPM,
+        tpm: int = GEMINI_TPM,
+        timeout: float = GEMINI_TIMEOUT,
+        max_retries: int = GEMINI_MAX_RETRIES
+    ):
+        self.model_name = model_name
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter(rpm, tpm)
+        self.concurrency = AdaptiveConcurrency(initial=max(1, max_in_flight // 2), max_limit=max_in_flight)
+        self._model = None
+        self._init_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._init_lock:
+                if self._model is None:
+                    ensure_api_key()
+                    # The SDK pulls in protobuf and grpc; import it on the first real call only
+                    import google.generativeai as genai
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def _log_retry(self, attempt: int, ex: BaseException, delay: float):
+        tracing.annotate(retries=attempt)
+        print(f"[Gemini] {type(ex).__name__}: {ex} – retry {attempt}/{self.max_retries} in {delay:.1f}s")
+
+    def _send(self, prompt: str, generation_config: dict | None, estimated_tokens: int, stream: bool = False):
+        """
+        One attempt: wait for quota and a concurrency slot, then call Gemini.
+        A streamed call is opened up to its first chunk so errors surface here,
+        where they can be retried; the caller must release the slot afterwards.
+        Returns (response or (first_chunk, rest), start time).
+        """
+        self.rate_limiter.acquire(estimated_tokens)
+        self.concurrency.acquire()
+        start = time.monotonic()
+        try:
+            response = self.model.generate_content(
+                prompt,
+                generation_config=generation_config,
+                stream=stream,
+                request_options={"timeout": self.timeout}
+            )
+            if stream:
+                chunks = iter(response)
+                response = (next(chunks, None), chunks)
+        except Exception as ex:
+            self.concurrency.release(throttled=is_throttled(ex))
+            # A failed request does not count against the token quota
+            self.rate_limiter.settle(estimated_tokens, 0)
+            raise
+        return response, start
+
+    def _settle(self, estimated_tokens: int, meta) -> Dict[str, int | None]:
+        # Counts are None if the response carries no usage metadata
+        usage = {
+            "prompt_tokens": getattr(meta, "prompt_token_count", None),
+            "output_tokens": getattr(meta, "candidates_token_count", None),
+        }
+        if usage["prompt_tokens"] is not None:
+            self.rate_limiter.settle(estimated_tokens, usage["prompt_tokens"] + (usage["output_tokens"] or 0))
+        return usage
+
+    def generate(self, prompt: str, generation_config: dict | None = None) -> str:
+        return self.generate_with_usage(prompt, generation_config)[0]
+
+    def generate_with_usage(self, prompt: str, generation_config: dict | None = None) -> Tuple[str, Dict[str, int | None]]:
+        """Like generate(), but also return the token counts Gemini reports for the call."""
+        estimated = estimate_tokens(prompt)
+        response, start = retry_call(
+            lambda: self._send(prompt, generation_config, estimated),
+            retries=self.max_retries,
+            on_retry=self._log_retry
+        )
+        latency = time.monotonic() - start
+        self.concurrency.release(latency=latency)
+        usage = self._settle(estimated, getattr(response, "usage_metadata", None))
+        tracing.annotate(llm_latency_ms=round(latency * 1000, 3), **usage)
+        return response.text.strip(), usage
+
+    def generate_stream(
+        self,
+        prompt: str,
+        generation_config: dict | None = None,
+        usage: dict | None = None
+    ) -> Iterator[str]:
+        """
+        Yield raw text chunks as Gemini produces them. Holds one slot until
+        exhausted, closed or failed; the token reservation is settled then too,
+        from the last chunk seen. Only opening the stream is retried; an error
+        mid-stream is raised. If `usage` is given, it receives the time to
+        first chunk and the token counts.
+        """
+        estimated = estimate_tokens(prompt)
+        (first, rest), start = retry_call(
+            lambda: self._send(prompt, generation_config, estimated, stream=True),
+            retries=self.max_retries,
+            on_retry=self._log_retry
+        )
+        # Time to first chunk is what the concurrency limit adapts to
+        latency = time.monotonic() - start
+        if usage is not None:
+            usage["llm_latency_ms"] = round(latency * 1000, 3)
+        throttled = False
+        last = None
+        received = 0  # characters
+        try:
+            for chunk in itertools.chain([first] if first is not None else [], rest):
+                last = chunk
+                if chunk.text:
+                    received += len(chunk.text)
+                    yield chunk.text
+        except Exception as ex:
+            throttled = is_throttled(ex)
+            raise
+        finally:
+            self.concurrency.release(latency=None if throttled else latency, throttled=throttled)
+            # The last chunk carries the usage totals for the whole response. A stream
+            # closed early or cut off may have none: charge the prompt and the text received.
+            counts = self._settle(estimated, getattr(last, "usage_metadata", None))
+            if counts["prompt_tokens"] is None:
+                self.rate_limiter.settle(estimated, estimated + received // 4)
+            if usage is not None:
+                usage.update(counts)
+
+
+_client: GeminiClientManager | None = None
+_cache: LLMCache | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GeminiClientManager:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GeminiClientManager()
+    return _client
+
+
+def get_cache() -> LLMCache:
+    """Return the process-wide LLM response cache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        with _client_lock:
+            if _cache is None:
+                _cache = LLMCache(LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_disk_entries=LLM_CACHE_MAX_ENTRIES)
+    return _cache
+
+
 def init_gemini():
     """Configure and return a Gemini model client."""
-    ensure_api_key()
-    genai.configure(api_key=GEMINI_API_KEY)
-    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+    return get_client().model
+
 
+def _strip_stream(chunks: Iterator[str]) -> Iterator[str]:
+    """
+    Re-chunk a token stream so the concatenated output equals
+    "".join(chunks).strip(), matching what llm() returns.
+    Trailing whitespace is held back until more text arrives.
+    """
+    started = False
+    held = ""
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        body = chunk.rstrip()
+        if body:
+            yield held + body
+            held = chunk[len(body):]
+        else:
+            held += chunk
+
+
+def llm_stream(prompt: str, generation_config: dict | None = None, use_cache: bool = True) -> Iterator[str]:
+    """
+    Streaming variant of llm(): yields text as soon as Gemini produces it.
+    A cached response is yielded in one piece; a fresh one is cached once complete.
+    """
+    client = get_client()
+    caching = use_cache and not LLM_CACHE_DISABLED
+    # Not made current: the caller's code runs between yields
+    span = tracing.span("llm", model=client.model_name, streamed=True)
+    if caching:
+        cache = get_cache()
+        key = cache_key(client.model_name, prompt, generation_config)
+        cached = cache.get(key)
+        if cached is not None:
+            span.set(cache="hit")
+            span.finish()
+            yield cached
+            return
+
+    span.set(cache="miss" if caching else "off")
+    parts = []
+    usage = {}
+    try:
+        for piece in _strip_stream(client.generate_stream(prompt, generation_config, usage)):
+            parts.append(piece)
+            yield piece
+    except BaseException as ex:
+        span.finish(ex)
+        raise
+    span.set(**usage)
+    span.finish()
+
+    if caching:
+        cache.put(key, "".join(parts))
 
-def llm(prompt: str) -> str:
+
+def llm(
+    prompt: str,
+    generation_config: dict | None = None,
+    use_cache: bool = True,
+    on_chunk: Callable[[str], None] | None = None
+) -> str:
     """
     Generic wrapper for sending a prompt to Gemini 2.0 Pro Experimental.
-    Returns plain text.
+    Returns plain text. Responses are cached by (model, prompt, params);
+    pass use_cache=False (or set LLM_CACHE_DISABLED) to force a fresh call.
+    If on_chunk is given, the response is streamed and each piece is
+    passed to it as it arrives.
+    """
+    if on_chunk is not None:
+        parts = []
+        for piece in llm_stream(prompt, generation_config, use_cache):
+            on_chunk(piece)
+            parts.append(piece)
+        return "".join(parts)
+
+    return llm_with_usage(prompt, generation_config, use_cache)[0]
+
+
+def llm_with_usage(
+    prompt: str,
+    generation_config: dict | None = None,
+    use_cache: bool = True
+) -> Tuple[str, Dict[str, int | None]]:
+    """
+    Like llm(), but also return {"prompt_tokens", "output_tokens"} for the call.
+    A cached response costs no tokens, so both counts are 0.
+    """
+    client = get_client()
+    with tracing.span("llm", model=client.model_name) as span:
+        if not use_cache or LLM_CACHE_DISABLED:
+            span.set(cache="off")
+            return client.generate_with_usage(prompt, generation_config)
+
+        cache = get_cache()
+        key = cache_key(client.model_name, prompt, generation_config)
+        cached = cache.get(key)
+        if cached is not None:
+            span.set(cache="hit")
+            return cached, {"prompt_tokens": 0, "output_tokens": 0}
+
+        span.set(cache="miss")
+        text, usage = client.generate_with_usage(prompt, generation_config)
+        cache.put(key, text)
+        return text, usage
+
+
+async def allm(prompt: str, generation_config: dict | None = None, use_cache: bool = True) -> str:
+    """
+    Async variant of llm() for concurrent callers.
+    The blocking SDK call runs in a worker thread; the shared client's
+    rate and concurrency limits still apply.
     """
-    model = init_gemini()
-    response = model.generate_content(prompt)
-    return response.text.strip()
+    import asyncio
+    return await asyncio.to_thread(llm, prompt, generation_config, use_cache)
@@ -0,0 +1,93 @@
+# horizon.py
+"""
+Multi-week plans, one week at a time.
+
+OrchestratorAgent.iter_weeks() is a generator: each week is planned only
+when the caller asks for it, and only a small HorizonState is carried
+into the next one:
+- the dishes of the last HISTORY_WEEKS weeks, so meals keep varying;
+- tasks that found no free time (carried over until their deadline);
+- the start of the next calendar window.
+A quarter or a year therefore costs one week of memory, and the first
+week can be written out before the rest is planned.
+"""
+
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Deque, Dict, List
+
+from calendar_engine import parse_event
+from task_engine import Task
+from validation import parse_meal_text
+
+# Weeks of meal history that count against repeating a dish
+HISTORY_WEEKS = 4
+
+
+@dataclass
+class WeekPlan:
+    number: int
+    start: date
+    routine: str
+    meals: dict
+    shopping: List[str]
+    schedule: dict
+    calendar: dict
+    # Unscheduled tasks moved to the next week, and those whose deadline passed
+    carried: List[Task] = field(default_factory=list)
+    missed: List[Task] = field(default_factory=list)
+
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=6)
+
+    @property
+    def events(self) -> List[str]:
+        """Calendar events that fall inside this week."""
+        end = self.start + timedelta(days=7)
+        inside = []
+        for line in self.calendar["events"]:
+            event = parse_event(line)
+            if event is not None and self.start <= event.start.date() < end:
+                inside.append(line)
+        return inside
+
+
+def dishes(meals: dict) -> List[str]:
+    """Every dish of a week's meal plan, from {day: {meal: dish}} or LLM text blocks."""
+    names = []
+    for value in meals.values():
+        days = parse_meal_text(value).values() if isinstance(value, str) else [value]
+        for day in days:
+            names.extend(day.values())
+    return names
+
+
+class HorizonState:
+    """What one week of a horizon plan hands on to the next."""
+
+    def __init__(self, start: date | None = None, history_weeks: int = HISTORY_WEEKS):
+        # First day of the next week; None lets CalendarManager pick the first week
+        self.start = start
+        self.weeks = 0
+        self.carry_over: List[Task] = []
+        self._recent: Deque[Counter] = deque(maxlen=history_weeks)
+
+    def meal_history(self) -> Dict[str, int]:
+        """How often each dish was served in the remembered weeks."""
+        total: Counter = Counter()
+        for week in self._recent:
+            total.update(week)
+        return dict(total)
+
+    def advance(self, week: WeekPlan):
+        """Fold a finished week into the state."""
+        self.weeks = week.number
+        self.start = week.start + timedelta(days=7)
+        self._recent.append(Counter(dishes(week.meals)))
+        unscheduled = week.schedule["unscheduled"]
+        # A task past its deadline is reported once, in the week it was missed
+        week.missed = [t for t in unscheduled if t.deadline and t.deadline < self.start]
+        week.carried = [t for t in unscheduled if not (t.deadline and t.deadline < self.start)]
+        self.carry_over = week.carried
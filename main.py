@@ -1,11 +1,25 @@
 # main.py
+import tracing
 from agents import OrchestratorAgent
+from archive import get_archive
+from config import PLAN_ARCHIVE, PLAN_ARCHIVE_PATH
+from memory import user_key
 from user_input import load_user_profile, ask_user_interactively
 from personality_engine import personalize_profile
 
 # Toggle: True = use Gemini 2.0 Pro, False = offline rule-based
 USE_LLM = True
 
+# Toggle: True = write life_plan.md section by section as it is generated
+STREAM_OUTPUT = False
+
+# Weeks to plan: 1 = the usual weekly plan; more (e.g. 13 or 52) writes a
+# multi-week plan to life_plan.md one week at a time
+PLAN_WEEKS = 1
+
+# Toggle: True = also keep the plan in the plan archive (default: PLAN_ARCHIVE=1)
+ARCHIVE_PLAN = PLAN_ARCHIVE
+
 
 def main():
     print("\n=== Agent LifeNavigator ===")
@@ -31,11 +45,26 @@ def main():
     )
 
     print("\nRunning LifeNavigator pipeline...\n")
-    result_md = orchestrator.run_full_pipeline()
-
     output_file = "life_plan.md"
-    with open(output_file, "w") as f:
-        f.write(result_md)
+    if PLAN_WEEKS > 1:
+        with open(output_file, "w") as f:
+            orchestrator.stream_weeks(f, PLAN_WEEKS)
+    elif STREAM_OUTPUT:
+        with open(output_file, "w") as f:
+            orchestrator.stream_pipeline(f)
+    else:
+        result_md = orchestrator.run_full_pipeline()
+        with open(output_file, "w") as f:
+            f.write(result_md)
+
+    # Keep the generated plan; `python archive.py list USER_ID` shows them
+    if ARCHIVE_PLAN and PLAN_ARCHIVE_PATH:
+        with open(output_file) as f:
+            plan_id = get_archive().put(user_key(raw_prefs), f.read())
+        print(f"🗄  Archived as plan {plan_id} in {PLAN_ARCHIVE_PATH}")
+
+    # Prometheus-style metrics, if METRICS_PATH is set
+    tracing.write_metrics()
 
     print(f"\n✔ Life plan generated for {raw_prefs.get('name', 'User')}")
     print(f"📄 Saved to: {output_file}\n")
@@ -1,15 +1,136 @@
 # memory.py
 import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS preferences (
+    user_id TEXT PRIMARY KEY,
+    prefs TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    prefs TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_user ON history (user_id, id);
+CREATE TABLE IF NOT EXISTS stage_outputs (
+    user_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    output TEXT NOT NULL,
+    PRIMARY KEY (user_id, stage)
+);
+"""
+
+
+def user_key(prefs: dict) -> str:
+    """Stable key for a profile: explicit user_id, else name, else 'default'."""
+    return str(prefs.get("user_id") or prefs.get("name") or "default")
 
 
 class MemoryStore:
     """
-    Simple JSON-based memory to persist preferences between runs.
+    SQLite-backed memory that persists preferences, preference history and
+    last-run stage outputs per user between runs.
+    The database runs in WAL mode, so many pipeline workers (threads or
+    processes) can read and write concurrently; every update is a single
+    transaction, so a crash never leaves a half-written record.
     """
 
-    def save_preferences(self, prefs: dict, path: str = "preferences.json"):
+    def __init__(self, path: str = "memory.db", history_limit: int = 20):
+        self.path = path
+        self.history_limit = history_limit
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and per process (connections must not cross a fork).
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, statements: Iterable[Tuple[str, tuple]]):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _preference_statements(self, user_id: str, prefs: dict, now: float) -> List[Tuple[str, tuple]]:
+        blob = json.dumps(prefs)
+        return [
+            ("INSERT INTO preferences (user_id, prefs, updated_at) VALUES (?, ?, ?) "
+             "ON CONFLICT(user_id) DO UPDATE SET prefs = excluded.prefs, updated_at = excluded.updated_at",
+             (user_id, blob, now)),
+            ("INSERT INTO history (user_id, prefs, created_at) VALUES (?, ?, ?)", (user_id, blob, now)),
+            ("DELETE FROM history WHERE user_id = ? AND id NOT IN "
+             "(SELECT id FROM history WHERE user_id = ? ORDER BY id DESC LIMIT ?)",
+             (user_id, user_id, self.history_limit)),
+        ]
+
+    def save_preferences(self, prefs: dict, user_id: str | None = None):
+        try:
+            self._write(self._preference_statements(user_id or user_key(prefs), prefs, time.time()))
+        except Exception as ex:
+            print(f"[MemoryStore] Failed to save preferences: {ex}")
+
+    def save_many(self, profiles: Iterable[dict]):
+        """Save many users' preferences in one transaction."""
+        now = time.time()
         try:
-            with open(path, "w") as f:
-                json.dump(prefs, f, indent=4)
+            statements = []
+            for prefs in profiles:
+                statements.extend(self._preference_statements(user_key(prefs), prefs, now))
+            self._write(statements)
         except Exception as ex:
             print(f"[MemoryStore] Failed to save preferences: {ex}")
+
+    def load_preferences(self, user_id: str) -> dict | None:
+        row = self._conn().execute("SELECT prefs FROM preferences WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def history(self, user_id: str, limit: int = 10) -> List[dict]:
+        """Most recent saved preference versions for a user, newest first."""
+        rows = self._conn().execute(
+            "SELECT prefs FROM history WHERE user_id = ? ORDER BY id DESC LIMIT ?", (user_id, limit)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save_stage_outputs(self, outputs: dict, user_id: str = "default"):
+        """
+        Persist {stage: {"fingerprint": ..., "output": ...}} from the last run
+        so the next run can reuse stages whose inputs did not change.
+        """
+        try:
+            self._write([
+                ("INSERT OR REPLACE INTO stage_outputs (user_id, stage, fingerprint, output) VALUES (?, ?, ?, ?)",
+                 (user_id, stage, record["fingerprint"], json.dumps(record["output"])))
+                for stage, record in outputs.items()
+            ])
+        except Exception as ex:
+            print(f"[MemoryStore] Failed to save stage outputs: {ex}")
+
+    def load_stage_outputs(self, user_id: str = "default") -> dict:
+        try:
+            rows = self._conn().execute(
+                "SELECT stage, fingerprint, output FROM stage_outputs WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        except Exception as ex:
+            print(f"[MemoryStore] Failed to load stage outputs: {ex}")
+            return {}
+        return {stage: {"fingerprint": fp, "output": json.loads(output)} for stage, fp, output in rows}
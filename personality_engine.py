@@ -1,4 +1,9 @@
 # personality_engine.py
+import operator
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Mapping, Sequence
+
 
 def personalize_profile(prefs: dict) -> dict:
     """
@@ -44,3 +49,314 @@ def personalize_profile(prefs: dict) -> dict:
     profile["restrictions"] = prefs.get("avoid_ingredients", [])
 
     return profile
+
+
+# Fixed vocabularies of the derived fields, in code order (see personalize_batch)
+SLEEP_TYPES = ("early_riser", "regular_riser", "late_riser")
+WORK_STYLES = ("light_worker", "balanced_worker", "heavy_worker")
+FITNESS_LEVELS = ("low_activity", "active")
+LEARNING_MODES = ("minimal_learning", "growth_oriented")
+SKINCARE_LEVELS = ("low", "high")
+
+_CODED_FIELDS = {
+    "sleep_type": SLEEP_TYPES,
+    "work_style": WORK_STYLES,
+    "fitness_level": FITNESS_LEVELS,
+    "learning_mode": LEARNING_MODES,
+    "skincare_importance": SKINCARE_LEVELS,
+}
+PROFILE_FIELDS = tuple(_CODED_FIELDS) + ("diet_type", "budget_level", "restrictions")
+
+
+class PersonalityRecord:
+    """One personalize_profile() result without a per-profile dict."""
+
+    __slots__ = PROFILE_FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(PROFILE_FIELDS, values):
+            setattr(self, field, value)
+
+    def to_dict(self) -> dict:
+        """The dict personalize_profile() returns for the same preferences."""
+        return {field: getattr(self, field) for field in PROFILE_FIELDS}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PersonalityRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"PersonalityRecord({self.to_dict()!r})"
+
+
+class PersonalityBatch:
+    """
+    personalize_batch() results, one column per field. The five derived
+    fields are 1-byte codes into their vocabularies, diet and budget are
+    dictionary-encoded, and restrictions reference the input column.
+    Profiles are decoded only when asked for: batch[i], column(), to_dicts().
+    """
+
+    def __init__(
+        self,
+        size: int,
+        codes: Dict[str, Sequence[int]],
+        categories: Dict[str, List[Any]],
+        restrictions: Sequence | None
+    ):
+        self.size = size
+        self.codes = codes
+        self.categories = categories
+        # None: no avoid_ingredients column, so every profile gets a fresh []
+        self.restrictions = restrictions
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _restrictions(self, i: int) -> list:
+        return [] if self.restrictions is None else self.restrictions[i]
+
+    def vocabulary(self, field: str) -> Sequence:
+        return _CODED_FIELDS.get(field) or self.categories[field]
+
+    def column(self, field: str) -> list:
+        """Decoded values of one field."""
+        if field == "restrictions":
+            return [self._restrictions(i) for i in range(self.size)]
+        vocabulary = self.vocabulary(field)
+        return [vocabulary[code] for code in self.codes[field]]
+
+    def __getitem__(self, i: int) -> PersonalityRecord:
+        return PersonalityRecord(
+            *(self.vocabulary(field)[self.codes[field][i]] for field in PROFILE_FIELDS[:-1]),
+            self._restrictions(i)
+        )
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def to_dicts(self) -> List[dict]:
+        columns = [self.column(field) for field in PROFILE_FIELDS]
+        return [dict(zip(PROFILE_FIELDS, row)) for row in zip(*columns)]
+
+
+def profile_columns(profiles: Iterable[dict]) -> Dict[str, list]:
+    """
+    Turn row dicts into the columns personalize_batch() reads. Missing
+    optional fields get the value personalize_profile() would use.
+    """
+    columns: Dict[str, list] = {
+        "wake_time": [], "work_start": [], "work_end": [], "wants_gym": [], "wants_learning": [],
+        "wants_skincare": [], "diet_type": [], "budget_level": [], "avoid_ingredients": [],
+    }
+    for prefs in profiles:
+        for field in ("wake_time", "work_start", "work_end"):
+            columns[field].append(prefs[field])
+        for field in ("wants_gym", "wants_learning", "wants_skincare"):
+            columns[field].append(prefs.get(field))
+        columns["diet_type"].append(prefs.get("diet_type", "balanced"))
+        columns["budget_level"].append(prefs.get("budget_level", "medium"))
+        columns["avoid_ingredients"].append(prefs.get("avoid_ingredients", []))
+    return columns
+
+
+def _hour(value: str) -> int:
+    return int(value.split(":")[0])
+
+
+def _as_column(values):
+    """Arrow arrays and pandas series become NumPy arrays; lists stay lists."""
+    to_numpy = getattr(values, "to_numpy", None)
+    if to_numpy is None:
+        return values
+    try:
+        return to_numpy(zero_copy_only=False)  # pyarrow
+    except TypeError:
+        return to_numpy()  # pandas
+
+
+def _is_ndarray(values) -> bool:
+    # NumPy is only used when the caller already hands us arrays
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(values, np.ndarray)
+
+
+def _hours_numpy(np, values):
+    """
+    Hour of each "H:MM"/"HH:MM" string, parsed from the characters' code
+    points in bulk. Anything else (spaces, signs, None) goes through
+    _hour() once per distinct value, so errors and edge cases match
+    personalize_profile().
+    """
+    original = values
+    if values.dtype.kind == "O":
+        try:
+            values = values.astype("U")
+        except (TypeError, ValueError):
+            pass
+    # Up to 18 digits fit an int64; longer strings take the exact path below
+    if values.dtype.kind == "U" and 0 < values.dtype.itemsize <= 4 * 18:
+        width = values.dtype.itemsize // 4
+        chars = np.ascontiguousarray(values).view(np.uint32).reshape(len(values), width)
+        colon = np.argmax(chars == ord(":"), axis=1)
+        if width >= 3 and (colon == 2).all():
+            # The usual "HH:MM": two digits before the colon
+            digits = chars[:, :2].astype(np.int64) - ord("0")
+            if ((digits >= 0) & (digits <= 9)).all():
+                return digits[:, 0] * 10 + digits[:, 1]
+        elif (colon > 0).all():
+            digits = chars.astype(np.int64) - ord("0")
+            before = np.arange(width) < colon[:, None]
+            if ((digits >= 0) & (digits <= 9) | ~before).all():
+                hours = np.zeros(len(values), dtype=np.int64)
+                for j in range(width):
+                    hours = np.where(before[:, j], hours * 10 + digits[:, j], hours)
+                return hours
+    parsed = _Memo(_hour)
+    return np.fromiter(map(parsed.__getitem__, original.tolist()), dtype=np.int64, count=len(values))
+
+
+class _Memo(dict):
+    """dict that computes a missing value once from its key; lookups through map() stay in C."""
+
+    def __init__(self, func):
+        super().__init__()
+        self.func = func
+
+    def __missing__(self, key):
+        value = self[key] = self.func(key)
+        return value
+
+
+def _sleep_code(hour: int) -> int:
+    return (hour >= 6) + (hour > 9)
+
+
+def _work_code(hours: int) -> int:
+    return (hours > 5) + (hours >= 9)
+
+
+def _flags(values, n: int):
+    if values is None:
+        return bytes(n)  # all False
+    if _is_ndarray(values) and values.dtype.kind in "biuf":
+        return values != 0
+    return map(bool, values)
+
+
+def _encode(values, n: int, default: str):
+    """Dictionary-encode a column: (codes, categories)."""
+    if values is None:
+        return array("i", bytes(4 * n)), [default]
+    if _is_ndarray(values) and values.dtype.kind in "US":
+        distinct, inverse = sys.modules["numpy"].unique(values, return_inverse=True)
+        return inverse.astype("int32"), distinct.tolist()
+    index = _Memo(lambda value: len(index))
+    codes = array("i", list(map(index.__getitem__, values)))
+    return codes, list(index)
+
+
+def personalize_batch(columns: Mapping[str, Sequence]) -> PersonalityBatch:
+    """
+    personalize_profile() for many profiles at once, column by column.
+    `columns` maps preference fields to equal-length columns: lists, NumPy
+    arrays, or Arrow arrays / pandas series (see profile_columns() for row
+    dicts). wake_time, work_start and work_end are required; the other
+    columns may be left out.
+    With NumPy columns the arithmetic runs vectorised; with lists each
+    distinct time string is parsed once. batch[i].to_dict() equals
+    personalize_profile() of the i-th profile.
+    """
+    wake = _as_column(columns["wake_time"])
+    start = _as_column(columns["work_start"])
+    end = _as_column(columns["work_end"])
+    n = len(wake)
+    restrictions = columns.get("avoid_ingredients")
+    if hasattr(restrictions, "to_pylist"):
+        restrictions = restrictions.to_pylist()  # Arrow list arrays
+
+    codes: Dict[str, Sequence[int]] = {}
+    if _is_ndarray(wake) or _is_ndarray(start) or _is_ndarray(end):
+        np = sys.modules["numpy"]
+        wake_h = _hours_numpy(np, np.asarray(wake))
+        work_hours = (_hours_numpy(np, np.asarray(end)) - _hours_numpy(np, np.asarray(start))) % 24
+        codes["sleep_type"] = (wake_h >= 6).astype(np.int8) + (wake_h > 9)
+        codes["work_style"] = (work_hours > 5).astype(np.int8) + (work_hours >= 9)
+        for field, source in (("fitness_level", "wants_gym"), ("learning_mode", "wants_learning"),
+                              ("skincare_importance", "wants_skincare")):
+            flags = _flags(_as_column(columns.get(source)), n)
+            codes[field] = flags.astype(np.int8) if _is_ndarray(flags) else np.frombuffer(bytes(flags), np.int8)
+    else:
+        # Few distinct time strings recur across millions of rows: parse each once
+        # and keep the per-row loops in C (map over dict lookups and operator.sub)
+        hours = _Memo(_hour)
+        sleep = _Memo(lambda value: _sleep_code(hours[value]))
+        work = _Memo(lambda diff: _work_code(diff % 24))
+        # bytes() builds from an iterator of small ints faster than array() does
+        codes["sleep_type"] = array("b", bytes(map(sleep.__getitem__, wake)))
+        codes["work_style"] = array("b", bytes(map(work.__getitem__, map(
+            operator.sub, map(hours.__getitem__, end), map(hours.__getitem__, start)
+        ))))
+        for field, source in (("fitness_level", "wants_gym"), ("learning_mode", "wants_learning"),
+                              ("skincare_importance", "wants_skincare")):
+            codes[field] = array("b", bytes(_flags(columns.get(source), n)))
+
+    categories = {}
+    for field, source, default in (("diet_type", "diet_type", "balanced"), ("budget_level", "budget_level", "medium")):
+        codes[field], categories[field] = _encode(_as_column(columns.get(source)), n, default)
+    return PersonalityBatch(n, codes, categories, restrictions)
+
+
+# Which personalize_profile() outputs each raw preference field feeds into.
+# Used for incremental re-planning: an edit only invalidates stages that
+# read one of the affected fields.
+FIELD_DEPENDENCIES = {
+    "wake_time": ["sleep_type"],
+    "work_start": ["work_style"],
+    "work_end": ["work_style"],
+    "wants_gym": ["fitness_level"],
+    "wants_learning": ["learning_mode"],
+    "wants_skincare": ["skincare_importance"],
+    "diet_type": ["diet_type"],
+    "budget_level": ["budget_level"],
+    "avoid_ingredients": ["restrictions"],
+}
+
+
+def source_fields(profile_fields) -> set:
+    """Return the raw preference fields that feed any of the given profile fields."""
+    wanted = set(profile_fields)
+    return {field for field, outputs in FIELD_DEPENDENCIES.items() if wanted.intersection(outputs)}
+
+
+# Inputs each generation stage reads: raw preference fields used directly,
+# plus personalize_profile() fields (whose own sources are added via
+# FIELD_DEPENDENCIES). A profile edit re-runs only stages whose inputs changed.
+STAGE_DEPENDENCIES = {
+    "routine": {
+        "prefs": ["wake_time", "sleep_time", "work_start", "work_end", "wants_gym", "wants_learning"],
+        "personality": ["sleep_type", "work_style", "fitness_level", "learning_mode", "skincare_importance"],
+    },
+    "meals": {
+        "prefs": [],
+        "personality": ["diet_type", "budget_level", "restrictions"],
+    },
+    "tasks": {
+        "prefs": ["tasks"],
+        "personality": ["sleep_type", "work_style", "fitness_level", "learning_mode"],
+    },
+}
+
+
+def stage_context(stage: str, prefs: dict, personality: dict) -> Dict[str, dict]:
+    """
+    The part of the profile a generation stage may use: its preference
+    fields and their sources, and its personality fields. The stage's LLM
+    prompt shows exactly this and its fingerprint hashes it, so an edit
+    outside it cannot change the stage's output.
+    """
+    deps = STAGE_DEPENDENCIES[stage]
+    pref_fields = sorted(set(deps["prefs"]) | source_fields(deps["personality"]))
+    return {
+        "prefs": {f: prefs[f] for f in pref_fields if f in prefs},
+        "personality": {f: personality[f] for f in sorted(deps["personality"]) if f in personality},
+    }
@@ -0,0 +1,129 @@
+# pipeline.py
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import IO, Any, Callable, Dict, List, Sequence
+
+import tracing
+
+
+class Stage:
+    """
+    One step of the planning pipeline.
+    `inputs` names the stages whose results are passed to `func` as keyword arguments.
+    """
+
+    def __init__(self, name: str, func: Callable[..., Any], inputs: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+
+
+class StageGraph:
+    """
+    Runs stages as soon as their inputs are ready, so independent stages
+    (e.g. routine, meals and tasks) overlap instead of running back to back.
+    LLM calls are blocking, so a thread pool is used as the backend.
+    """
+
+    def __init__(self, stages: List[Stage], max_workers: int | None = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers or len(stages) or 1
+        self.timings: Dict[str, float] = {}
+        self._check_graph()
+
+    def _check_graph(self):
+        for stage in self.stages.values():
+            for dep in stage.inputs:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+        # Reject cycles up front instead of deadlocking at run time.
+        visiting, done = set(), set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle detected at stage '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].inputs:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _timed(self, stage: Stage, kwargs: dict):
+        start = time.perf_counter()
+        with tracing.span(f"stage.{stage.name}", stage=stage.name):
+            result = stage.func(**kwargs)
+        return result, time.perf_counter() - start
+
+    def run(self, precomputed: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        """
+        Execute every stage and return a {stage_name: result} dict.
+        Stages found in `precomputed` are not run; their given result is used.
+        Per-stage wall-clock durations are stored in `self.timings` (seconds).
+        """
+        results: Dict[str, Any] = dict(precomputed or {})
+        pending = {name: stage for name, stage in self.stages.items() if name not in results}
+        running = {}
+        self.timings = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(dep in results for dep in stage.inputs):
+                        kwargs = {dep: results[dep] for dep in stage.inputs}
+                        # Run in a copy of this context so stage spans nest under the caller's span
+                        running[pool.submit(tracing.run_in_context(self._timed, stage, kwargs))] = name
+                        del pending[name]
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    results[name], self.timings[name] = future.result()
+
+        return results
+
+
+class OrderedStreamWriter:
+    """
+    Writes sections to a sink in a fixed order while they are produced concurrently.
+    Text for the section currently at the head of the order goes straight
+    through; text for later sections is buffered until every section before
+    them has been closed.
+    """
+
+    def __init__(self, sink: IO[str], order: Sequence[str]):
+        self.sink = sink
+        self.order = list(order)
+        self._head = 0
+        self._buffers: Dict[str, List[str]] = {name: [] for name in self.order}
+        self._closed = set()
+        self._lock = threading.Lock()
+
+    def write(self, section: str, text: str):
+        if not text:
+            return
+        with self._lock:
+            if self._head < len(self.order) and self.order[self._head] == section:
+                self.sink.write(text)
+                self.sink.flush()
+            else:
+                self._buffers[section].append(text)
+
+    def close(self, section: str):
+        with self._lock:
+            self._closed.add(section)
+            # Flush every consecutive finished section, then open up the next one.
+            while self._head < len(self.order):
+                name = self.order[self._head]
+                for text in self._buffers.pop(name, []):
+                    self.sink.write(text)
+                if name not in self._closed:
+                    break
+                self._head += 1
+            self.sink.flush()
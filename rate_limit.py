@@ -0,0 +1,192 @@
+# rate_limit.py
+"""
+Client-side flow control for Gemini calls, shared by every caller in the process.
+
+- TokenBucket / RateLimiter: keep requests per minute and tokens per minute
+  under the project's quota, so bursts queue locally instead of coming back as 429s.
+- AdaptiveConcurrency: AIMD limit on requests in flight. It grows by about one
+  slot per window of healthy calls, and halves on a throttling error or when
+  latency climbs well above its recent average (a sign of server-side queueing).
+- retry_call: exponential backoff with full jitter on retryable errors.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+# HTTP status codes worth retrying: throttled, server error, unavailable, timeout
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+_RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), for quotas and when Gemini reports none."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class TokenBucket:
+    """Refills at `rate` units per second up to `capacity`; acquire() blocks until enough are available."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Take `amount` units, sleeping as needed. Returns the seconds waited."""
+        # A request larger than the bucket could never fit; let it through once the bucket is full.
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def charge(self, amount: float):
+        """Take (or with a negative amount, give back) units without waiting; the balance may go negative."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits (0 disables either).
+    Token use is reserved from an estimate before the call and corrected
+    with the real count afterwards via settle().
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.requests = TokenBucket(rpm / 60.0, rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm / 60.0, tpm) if tpm > 0 else None
+
+    def acquire(self, estimated_tokens: int = 0) -> float:
+        waited = 0.0
+        if self.requests:
+            waited += self.requests.acquire(1)
+        if self.tokens and estimated_tokens:
+            waited += self.tokens.acquire(estimated_tokens)
+        return waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: int | None):
+        if self.tokens and actual_tokens is not None:
+            self.tokens.charge(actual_tokens - estimated_tokens)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on in-flight requests, between `min_limit` and `max_limit`.
+    Successful calls add 1/limit (about +1 per window of calls); a throttling
+    error, or latency above `latency_tolerance` x the moving average,
+    halves the limit, at most once per average round trip (or `cooldown`
+    seconds before any latency has been seen).
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 8,
+        latency_tolerance: float = 3.0,
+        cooldown: float = 1.0
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._avg_latency: float | None = None
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float | None = None, throttled: bool = False):
+        """Give the slot back and adjust the limit from the call's outcome."""
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self._decrease()
+            elif latency is not None:
+                avg = self._avg_latency
+                self._avg_latency = latency if avg is None else 0.9 * avg + 0.1 * latency
+                if avg is not None and latency > avg * self.latency_tolerance:
+                    self._decrease()
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _decrease(self):
+        # One cut per round trip: errors from calls already in flight at the last cut don't count again
+        now = time.monotonic()
+        window = self._avg_latency if self._avg_latency is not None else self.cooldown
+        if now - self._last_decrease >= window:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self._last_decrease = now
+
+
+def status_code(ex: BaseException) -> int | None:
+    """HTTP status of an SDK error (google.api_core errors carry it as .code)."""
+    code = getattr(ex, "code", None)
+    return int(code) if isinstance(code, int) else None
+
+
+def is_throttled(ex: BaseException) -> bool:
+    return status_code(ex) == 429 or type(ex).__name__ in ("ResourceExhausted", "TooManyRequests")
+
+
+def is_retryable(ex: BaseException) -> bool:
+    if isinstance(ex, (TimeoutError, ConnectionError)):
+        return True
+    return status_code(ex) in RETRYABLE_CODES or type(ex).__name__ in _RETRYABLE_NAMES
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_call(
+    func: Callable[[], T],
+    retries: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+    retryable: Callable[[BaseException], bool] = is_retryable,
+    on_retry: Callable[[int, BaseException, float], None] | None = None
+) -> T:
+    """Call func(), retrying retryable errors up to `retries` times with jittered backoff."""
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as ex:
+            if attempt >= retries or not retryable(ex):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if on_retry is not None:
+                on_retry(attempt + 1, ex, delay)
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,332 @@
+# recipes.py
+"""
+Offline recipe catalog used by MealPlanner when the LLM is off.
+
+Recipes are indexed by ingredient, ingredient group (dairy, gluten, ...)
+and diet tag, so restrictions and diet types are resolved with set
+operations instead of scanning every recipe. Candidates for each meal slot
+are scored on budget, nutrition targets and weekly variety. The parts of
+the score that do not change during a week are computed for the whole
+catalog at once, with NumPy when it is installed (pure Python otherwise),
+so each meal slot only adds the variety penalty and takes the minimum.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+_np = False  # False = not imported yet, None = not installed
+
+
+def _numpy():
+    """NumPy, imported on first use, or None when it is not installed."""
+    global _np
+    if _np is False:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            # Pure-Python scoring is used when NumPy is not installed
+            _np = None
+    return _np
+
+
+# The week and the meal slots every plan section uses
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+MEAL_TYPES = ("Breakfast", "Lunch", "Dinner")
+
+BUDGET_LEVELS = {"low": 1, "medium": 2, "high": 3}
+CALORIE_TARGETS = {"Breakfast": 420, "Lunch": 620, "Dinner": 650}
+PROTEIN_TARGETS = {"balanced": 20, "vegetarian": 18, "vegan": 18, "high-protein": 35}
+
+# Ingredient -> group, so a restriction like "dairy" or "meat" covers every member
+INGREDIENT_GROUPS = {
+    "milk": "dairy", "yogurt": "dairy", "paneer": "dairy", "cheese": "dairy",
+    "cream cheese": "dairy", "feta": "dairy", "mozzarella": "dairy",
+    "parmesan": "dairy", "butter": "dairy", "ghee": "dairy",
+    "bread": "gluten", "bagel": "gluten", "pasta": "gluten", "noodles": "gluten",
+    "wheat tortilla": "gluten", "couscous": "gluten", "whole wheat flour": "gluten", "granola": "gluten",
+    "peanut butter": "nuts", "peanuts": "nuts", "almonds": "nuts",
+    "eggs": "eggs",
+    "chicken breast": "meat", "chicken thigh": "meat", "turkey": "meat", "beef": "meat",
+    "salmon": "fish", "tuna": "fish",
+    "tofu": "soy", "soy milk": "soy", "soy sauce": "soy",
+}
+_GROUPS = set(INGREDIENT_GROUPS.values())
+# Restrictions that stand for a whole group: avoiding milk means avoiding dairy
+RESTRICTION_ALIASES = {
+    "milk": "dairy", "lactose": "dairy", "wheat": "gluten", "nut": "nuts",
+    "egg": "eggs", "seafood": "fish", "soya": "soy",
+}
+_NOT_VEGETARIAN = {"meat", "fish"}
+_NOT_VEGAN = _NOT_VEGETARIAN | {"dairy", "eggs"}
+
+# (name, meal type, cost level 1-3, kcal, protein g, {ingredient: (quantity, unit)})
+DEFAULT_RECIPES = [
+    ("Oatmeal with milk and banana", "Breakfast", 1, 400, 14,
+     {"oats": (60, "g"), "milk": (200, "ml"), "banana": (1, "pcs")}),
+    ("Oatmeal with plant-based milk and fruits", "Breakfast", 1, 380, 10,
+     {"oats": (60, "g"), "oat milk": (200, "ml"), "banana": (1, "pcs")}),
+    ("Greek yogurt with berries and granola", "Breakfast", 2, 420, 22,
+     {"yogurt": (200, "g"), "berries": (100, "g"), "granola": (40, "g")}),
+    ("Scrambled eggs on toast", "Breakfast", 1, 450, 24,
+     {"eggs": (3, "pcs"), "bread": (2, "slices"), "butter": (10, "g")}),
+    ("Tofu scramble with spinach", "Breakfast", 2, 400, 24,
+     {"tofu": (150, "g"), "spinach": (60, "g"), "bread": (2, "slices")}),
+    ("Peanut butter banana toast", "Breakfast", 1, 430, 14,
+     {"bread": (2, "slices"), "peanut butter": (30, "g"), "banana": (1, "pcs")}),
+    ("Vegetable poha", "Breakfast", 1, 380, 9,
+     {"flattened rice": (80, "g"), "peas": (50, "g"), "onion": (1, "pcs"), "peanuts": (15, "g")}),
+    ("Smoked salmon bagel", "Breakfast", 3, 480, 28,
+     {"bagel": (1, "pcs"), "salmon": (80, "g"), "cream cheese": (30, "g")}),
+    ("Chia pudding with mango", "Breakfast", 2, 390, 9,
+     {"chia seeds": (30, "g"), "oat milk": (200, "ml"), "mango": (1, "pcs")}),
+    ("Spinach and feta omelette", "Breakfast", 2, 380, 26,
+     {"eggs": (3, "pcs"), "spinach": (50, "g"), "feta": (30, "g")}),
+    ("Soy protein smoothie bowl", "Breakfast", 2, 420, 22,
+     {"soy milk": (250, "ml"), "berries": (100, "g"), "banana": (1, "pcs"), "oats": (30, "g")}),
+    ("Besan chilla with tomato", "Breakfast", 1, 360, 16,
+     {"chickpea flour": (80, "g"), "onion": (1, "pcs"), "tomato": (1, "pcs")}),
+
+    ("Grilled chicken with veggies", "Lunch", 2, 550, 45,
+     {"chicken breast": (150, "g"), "mixed vegetables": (200, "g"), "olive oil": (10, "ml")}),
+    ("Paneer tikka with veggies", "Lunch", 2, 600, 28,
+     {"paneer": (120, "g"), "mixed vegetables": (200, "g"), "yogurt": (50, "g")}),
+    ("Tofu stir-fry with veggies", "Lunch", 2, 560, 26,
+     {"tofu": (150, "g"), "mixed vegetables": (200, "g"), "soy sauce": (15, "ml"), "rice": (70, "g")}),
+    ("Chickpea salad wrap", "Lunch", 1, 550, 20,
+     {"chickpeas": (150, "g"), "wheat tortilla": (1, "pcs"), "cucumber": (1, "pcs"), "tomato": (1, "pcs")}),
+    ("Lentil soup with bread", "Lunch", 1, 520, 24,
+     {"lentils": (80, "g"), "carrot": (1, "pcs"), "onion": (1, "pcs"), "bread": (2, "slices")}),
+    ("Quinoa black bean bowl", "Lunch", 2, 640, 24,
+     {"quinoa": (80, "g"), "black beans": (150, "g"), "corn": (80, "g"), "avocado": (0.5, "pcs")}),
+    ("Tuna pasta salad", "Lunch", 2, 650, 38,
+     {"pasta": (90, "g"), "tuna": (120, "g"), "corn": (50, "g"), "olive oil": (10, "ml")}),
+    ("Turkey and cheese sandwich", "Lunch", 2, 560, 38,
+     {"bread": (2, "slices"), "turkey": (100, "g"), "cheese": (30, "g"), "lettuce": (30, "g")}),
+    ("Rajma chawal", "Lunch", 1, 620, 22,
+     {"kidney beans": (150, "g"), "rice": (80, "g"), "onion": (1, "pcs"), "tomato": (1, "pcs")}),
+    ("Falafel bowl with tahini", "Lunch", 2, 650, 22,
+     {"chickpeas": (120, "g"), "tahini": (20, "g"), "couscous": (70, "g"), "cucumber": (1, "pcs")}),
+    ("Egg fried rice", "Lunch", 1, 600, 22,
+     {"rice": (80, "g"), "eggs": (2, "pcs"), "peas": (60, "g"), "soy sauce": (10, "ml")}),
+    ("Teriyaki salmon rice bowl", "Lunch", 3, 680, 40,
+     {"salmon": (150, "g"), "rice": (80, "g"), "broccoli": (100, "g"), "soy sauce": (15, "ml")}),
+
+    ("Rice, lentils, and salad", "Dinner", 1, 600, 24,
+     {"rice": (80, "g"), "lentils": (70, "g"), "cucumber": (1, "pcs"), "tomato": (1, "pcs")}),
+    ("Baked salmon with sweet potato", "Dinner", 3, 650, 38,
+     {"salmon": (150, "g"), "sweet potato": (250, "g"), "broccoli": (100, "g")}),
+    ("Chicken curry with rice", "Dinner", 2, 700, 42,
+     {"chicken thigh": (150, "g"), "rice": (80, "g"), "onion": (1, "pcs"), "tomato": (1, "pcs"), "yogurt": (50, "g")}),
+    ("Tofu and vegetable noodles", "Dinner", 2, 620, 28,
+     {"tofu": (150, "g"), "noodles": (80, "g"), "mixed vegetables": (200, "g"), "soy sauce": (15, "ml")}),
+    ("Chickpea and spinach curry", "Dinner", 1, 650, 22,
+     {"chickpeas": (200, "g"), "spinach": (100, "g"), "rice": (80, "g"), "coconut milk": (100, "ml")}),
+    ("Beef and broccoli with rice", "Dinner", 3, 700, 42,
+     {"beef": (150, "g"), "broccoli": (150, "g"), "rice": (80, "g"), "soy sauce": (15, "ml")}),
+    ("Mushroom risotto", "Dinner", 2, 640, 18,
+     {"rice": (90, "g"), "mushrooms": (150, "g"), "parmesan": (20, "g"), "butter": (10, "g")}),
+    ("Black bean tacos", "Dinner", 1, 600, 22,
+     {"black beans": (150, "g"), "corn tortillas": (3, "pcs"), "avocado": (0.5, "pcs"), "tomato": (1, "pcs")}),
+    ("Dal tadka with roti", "Dinner", 1, 610, 24,
+     {"lentils": (80, "g"), "whole wheat flour": (80, "g"), "ghee": (10, "g"), "onion": (1, "pcs")}),
+    ("Turkey meatballs with pasta", "Dinner", 2, 720, 44,
+     {"turkey": (150, "g"), "pasta": (90, "g"), "tomato sauce": (150, "g")}),
+    ("Palak paneer with rice", "Dinner", 2, 680, 30,
+     {"paneer": (120, "g"), "spinach": (150, "g"), "rice": (70, "g")}),
+    ("Lentil bolognese", "Dinner", 1, 640, 28,
+     {"lentils": (80, "g"), "pasta": (90, "g"), "tomato sauce": (150, "g"), "carrot": (1, "pcs")}),
+]
+
+
+def restricted_terms(restrictions: Iterable[str]) -> Set[str]:
+    """
+    Everything a list of restrictions rules out: each term with its plural
+    and singular, the group it names or stands for (RESTRICTION_ALIASES),
+    and every ingredient of those groups. Used by RecipeCatalog and by the
+    template path (templates.filter_meals), so both filter alike.
+    """
+    terms: Set[str] = set()
+    for term in (r.strip().lower() for r in restrictions if r and r.strip()):
+        variants = {term, term + "s", term.rstrip("s")}
+        groups = (variants & _GROUPS) | {RESTRICTION_ALIASES[v] for v in variants if v in RESTRICTION_ALIASES}
+        terms |= variants | groups
+        terms |= {ingredient for ingredient, group in INGREDIENT_GROUPS.items() if group in groups}
+    terms.discard("")
+    return terms
+
+
+class Recipe:
+    __slots__ = ("id", "name", "meal", "cost", "kcal", "protein", "ingredients", "tags")
+
+    def __init__(self, rid: int, name: str, meal: str, cost: int, kcal: int, protein: int,
+                 ingredients: Dict[str, Tuple[float, str]]):
+        self.id = rid
+        self.name = name
+        self.meal = meal
+        self.cost = cost
+        self.kcal = kcal
+        self.protein = protein
+        self.ingredients = ingredients
+        groups = {INGREDIENT_GROUPS[i] for i in ingredients if i in INGREDIENT_GROUPS}
+        self.tags = set(groups)
+        if not groups & _NOT_VEGETARIAN:
+            self.tags.add("vegetarian")
+        if not groups & _NOT_VEGAN:
+            self.tags.add("vegan")
+        if protein >= 30:
+            self.tags.add("high-protein")
+
+
+class RecipeCatalog:
+    """
+    Recipes plus an inverted index from ingredient / group / tag to recipe ids.
+    Attribute columns cover the whole catalog and are kept as NumPy arrays
+    for vectorised scoring when NumPy is installed.
+    """
+
+    def __init__(self, recipes: Iterable[Sequence] = DEFAULT_RECIPES):
+        self.recipes = [Recipe(i, *spec) for i, spec in enumerate(recipes)]
+        self.index: Dict[str, Set[int]] = defaultdict(set)
+        for recipe in self.recipes:
+            for term in list(recipe.ingredients) + list(recipe.tags):
+                self.index[term].add(recipe.id)
+
+        self._by_meal: Dict[str, List[int]] = {
+            meal: [r.id for r in self.recipes if r.meal == meal] for meal in MEAL_TYPES
+        }
+        self._columns = {
+            "cost": [r.cost for r in self.recipes],
+            "kcal": [r.kcal for r in self.recipes],
+            "protein": [r.protein for r in self.recipes],
+            "kcal_target": [CALORIE_TARGETS[r.meal] for r in self.recipes],
+        }
+        self._np = _numpy()
+        if self._np is not None:
+            np = self._np
+            self._columns = {k: np.asarray(v, dtype=float) for k, v in self._columns.items()}
+            self._by_meal_rows = {meal: np.asarray(ids, dtype=np.intp) for meal, ids in self._by_meal.items()}
+
+    def excluded(self, restrictions: Iterable[str]) -> Set[int]:
+        """Ids of recipes with a restricted ingredient (see restricted_terms)."""
+        banned: Set[int] = set()
+        for term in restricted_terms(restrictions):
+            banned |= self.index.get(term, set())
+        return banned
+
+    def allowed(self, diet_type: str, restrictions: Iterable[str]) -> Set[int]:
+        """Recipe ids compatible with the diet type and free of restricted ingredients."""
+        base = self.index.get(diet_type, set()) if diet_type in ("vegetarian", "vegan") else set(range(len(self.recipes)))
+        return base - self.excluded(restrictions)
+
+    def _base_scores(self, allowed: Set[int], budget: int, diet_type: str):
+        """
+        Budget and nutrition part of every recipe's score (inf if not allowed).
+        It is the same for every slot of the week, so it is computed once.
+        """
+        cols = self._columns
+        protein_target = PROTEIN_TARGETS.get(diet_type, 20)
+        protein_weight = 2.0 if diet_type == "high-protein" else 1.0
+
+        np = self._np
+        if np is not None:
+            over = np.maximum(cols["cost"] - budget, 0)
+            under = np.maximum(budget - cols["cost"], 0)
+            score = 0.6 * over + 0.15 * under
+            score += np.abs(cols["kcal"] - cols["kcal_target"]) / cols["kcal_target"]
+            score += protein_weight * np.maximum(protein_target - cols["protein"], 0) / protein_target
+            blocked = np.ones(len(self.recipes), dtype=bool)
+            blocked[np.fromiter(allowed, dtype=np.intp, count=len(allowed))] = False
+            score[blocked] = np.inf
+            return score
+
+        scores = []
+        for rid in range(len(self.recipes)):
+            if rid not in allowed:
+                scores.append(float("inf"))
+                continue
+            cost = cols["cost"][rid]
+            kcal_target = cols["kcal_target"][rid]
+            s = 0.6 * max(cost - budget, 0) + 0.15 * max(budget - cost, 0)
+            s += abs(cols["kcal"][rid] - kcal_target) / kcal_target
+            s += protein_weight * max(protein_target - cols["protein"][rid], 0) / protein_target
+            scores.append(s)
+        return scores
+
+    def _pick(self, base, usage) -> int | None:
+        """Position of the lowest base + usage score, or None if no candidate is allowed."""
+        if not len(base):
+            return None
+        if self._np is not None:
+            scores = base + usage
+            pos = int(scores.argmin())
+        else:
+            scores = [b + u for b, u in zip(base, usage)]
+            pos = min(range(len(scores)), key=scores.__getitem__)
+        return pos if scores[pos] != float("inf") else None
+
+    def plan_week(
+        self,
+        diet_type: str = "balanced",
+        budget_level: str = "medium",
+        restrictions: Iterable[str] = (),
+        history: Dict[str, int] | None = None,
+        days: Sequence[str] = DAYS
+    ) -> Tuple[Dict[str, Dict[str, str]], List[str]]:
+        """
+        Pick breakfast, lunch and dinner for each day and build the shopping list.
+        `history` maps recipe names to how often they were used in earlier
+        weeks; repeats within the week are penalised more than across weeks.
+        """
+        allowed = self.allowed(diet_type, restrictions)
+        base = self._base_scores(allowed, BUDGET_LEVELS.get(budget_level, 2), diet_type)
+        usage = [0.3 * (history or {}).get(r.name, 0) for r in self.recipes]
+        if self._np is not None:
+            usage = self._np.asarray(usage, dtype=float)
+        # Per meal type: candidate ids with their fixed and variety scores
+        slots = {}
+        for meal, ids in self._by_meal.items():
+            if self._np is not None:
+                rows = self._by_meal_rows[meal]
+                slots[meal] = (ids, base[rows], usage[rows])
+            else:
+                slots[meal] = (ids, [base[i] for i in ids], [usage[i] for i in ids])
+
+        meals: Dict[str, Dict[str, str]] = {}
+        chosen: List[Recipe] = []
+        for day in days:
+            meals[day] = {}
+            for meal in MEAL_TYPES:
+                ids, meal_base, meal_usage = slots[meal]
+                pos = self._pick(meal_base, meal_usage)
+                if pos is None:
+                    meals[day][meal] = "Chef's choice (no catalog recipe fits your restrictions)"
+                    continue
+                recipe = self.recipes[ids[pos]]
+                meal_usage[pos] += 1.0
+                chosen.append(recipe)
+                meals[day][meal] = recipe.name
+
+        return meals, self.shopping_list(chosen)
+
+    @staticmethod
+    def shopping_list(recipes: Iterable[Recipe]) -> List[str]:
+        """Sum ingredient quantities across the chosen meals."""
+        totals: Dict[Tuple[str, str], float] = defaultdict(float)
+        for recipe in recipes:
+            for ingredient, (qty, unit) in recipe.ingredients.items():
+                totals[(ingredient, unit)] += qty
+        return [f"{name.capitalize()} ({qty:g} {unit})" for (name, unit), qty in sorted(totals.items())]
+
+
+_default_catalog: RecipeCatalog | None = None
+
+
+def default_catalog() -> RecipeCatalog:
+    """The built-in catalog, indexed once per process."""
+    global _default_catalog
+    if _default_catalog is None:
+        _default_catalog = RecipeCatalog()
+    return _default_catalog
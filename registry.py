@@ -0,0 +1,97 @@
+# registry.py
+"""
+Lazy registry of the agents and tools OrchestratorAgent is assembled from.
+
+Each role ("meal_planner", "task_optimizer", ...) maps to a "module:Class"
+spec and the name the component logs under. Nothing is imported or built
+until a role is first used, so an offline run only loads the modules it
+touches and never the Gemini SDK.
+
+Components are swapped or added with register(), or from the environment:
+
+    LIFENAVIGATOR_PLUGINS="meal_planner=my_meals:MealPlanner"
+
+The class is called with the component name: cls(name).
+"""
+
+import importlib
+import threading
+from typing import Dict, List, Tuple
+
+from config import LIFENAVIGATOR_PLUGINS
+
+_components: Dict[str, Tuple[str, str]] = {
+    "routine_agent": ("agents:RoutineDesignerAgent", "RoutineDesigner"),
+    "fused_planner": ("agents:FusedPlannerAgent", "FusedPlanner"),
+    "meal_planner": ("tools:MealPlanner", "MealPlanner"),
+    "task_optimizer": ("tools:TaskOptimizer", "TaskOptimizer"),
+    "calendar_manager": ("tools:CalendarManager", "CalendarSync"),
+    "markdown_builder": ("tools:MarkdownBuilder", "MarkdownBuilder"),
+}
+_classes: Dict[str, type] = {}
+_lock = threading.Lock()
+
+
+def register(role: str, spec: str, name: str | None = None):
+    """Use the class at `spec` ("module:Class") for `role`, named `name` (default: the class name)."""
+    module, sep, attr = spec.partition(":")
+    if not sep or not module or not attr:
+        raise ValueError(f"Component spec must look like 'module:Class', got {spec!r}")
+    with _lock:
+        _components[role] = (spec, name or attr)
+        _classes.pop(role, None)
+
+
+def roles() -> List[str]:
+    return sorted(_components)
+
+
+def resolve(role: str) -> type:
+    """The class registered for `role`; its module is imported on the first call."""
+    cls = _classes.get(role)
+    if cls is None:
+        if role not in _components:
+            raise KeyError(f"No component registered for {role!r} (known: {', '.join(roles())})")
+        module, _, attr = _components[role][0].partition(":")
+        cls = getattr(importlib.import_module(module), attr)
+        _classes[role] = cls
+    return cls
+
+
+def create(role: str):
+    """A new instance of the component registered for `role`."""
+    return resolve(role)(_components[role][1])
+
+
+class component:
+    """
+    Class attribute that creates the component for a role on first access
+    and caches it on the instance:
+
+        class OrchestratorAgent(BaseAgent):
+            meal_planner = registry.component("meal_planner")
+    """
+
+    def __init__(self, role: str):
+        self.role = role
+
+    def __set_name__(self, owner, attr: str):
+        self.attr = attr
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        # Two stages racing here both build a component; either one is fine to keep
+        value = obj.__dict__[self.attr] = create(self.role)
+        return value
+
+
+def _load_plugins(text: str):
+    for entry in filter(None, (part.strip() for part in text.split(","))):
+        role, sep, spec = entry.partition("=")
+        if not sep:
+            raise ValueError(f"LIFENAVIGATOR_PLUGINS entries must look like 'role=module:Class', got {entry!r}")
+        register(role.strip(), spec.strip())
+
+
+_load_plugins(LIFENAVIGATOR_PLUGINS)
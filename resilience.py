@@ -0,0 +1,226 @@
+# resilience.py
+"""
+Keeps a plan inside its latency budget when Gemini is slow or failing.
+
+- Deadline: the per-run budget that OrchestratorAgent hands down to its stages.
+- CircuitBreaker: after repeated LLM failures, skip the LLM for a while and
+  use the offline path straight away, then let one trial call through.
+- with_fallback: run a stage's LLM branch under its share of the budget and
+  fall back to the stage's deterministic offline branch on timeout or error.
+  The LLM branches run on one shared, bounded set of worker threads.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Tuple, TypeVar
+
+import tracing
+from config import BREAKER_FAILURE_THRESHOLD, BREAKER_MAX_ABANDONED, BREAKER_RESET_SECONDS, LLM_CALL_WORKERS
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """A latency budget in seconds, measured from construction."""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.start = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def remaining(self, reserve: float = 0.0) -> float:
+        """Seconds left, keeping `reserve` back for the work that follows."""
+        return max(0.0, self.budget - self.elapsed() - reserve)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. After `failure_threshold` consecutive failures
+    it opens and allow() returns False for `reset_timeout` seconds. Then
+    one trial call is let through (half-open); its outcome closes the
+    breaker or opens it again. Calls abandoned on timeout still hold a
+    worker thread, so while `max_abandoned` of them are outstanding the
+    breaker is open as well.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, max_abandoned: int = 8):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_abandoned = max_abandoned
+        self.state = self.CLOSED
+        self.failures = 0
+        # Abandoned calls that have not finished yet
+        self.abandoned = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.abandoned >= self.max_abandoned:
+                # A new call would only queue behind the stuck ones
+                return False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            # Open, or half-open with the trial call still running
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def abandon(self):
+        """
+        A call that was let through will not report back in time. If it was
+        the half-open trial, open again (without counting a failure) so the
+        next trial follows after `reset_timeout` instead of never. Reaching
+        `max_abandoned` outstanding calls opens the breaker too.
+        """
+        with self._lock:
+            self.abandoned += 1
+            if self.state == self.HALF_OPEN or self.abandoned >= self.max_abandoned:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def settle(self, succeeded: bool):
+        """An abandoned call finished; count its outcome like any other."""
+        with self._lock:
+            self.abandoned -= 1
+        if succeeded:
+            self.record_success()
+        else:
+            self.record_failure()
+
+
+_breaker: CircuitBreaker | None = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker() -> CircuitBreaker:
+    """Return the process-wide breaker for Gemini calls."""
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, BREAKER_MAX_ABANDONED)
+    return _breaker
+
+
+class CallPool:
+    """
+    At most `workers` daemon threads that run guarded LLM calls; further
+    calls wait in a queue. Threads are started as calls need them and then
+    kept. Daemon threads rather than a ThreadPoolExecutor, whose workers
+    are joined at exit: an abandoned LLM call must not keep the process
+    alive. Its result still lands in the LLM cache.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._idle = threading.Semaphore(0)
+        self._threads = 0
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[[], T]) -> Future:
+        future: Future = Future()
+        self._queue.put((future, tracing.run_in_context(func)))
+        if self._idle.acquire(timeout=0):
+            return future
+        with self._lock:
+            if self._threads < self.workers:
+                self._threads += 1
+                threading.Thread(target=self._work, daemon=True).start()
+        return future
+
+    def _work(self):
+        while True:
+            future, func = self._queue.get()
+            try:
+                future.set_result(func())
+            except BaseException as ex:
+                future.set_exception(ex)
+            del future, func
+            self._idle.release()
+
+
+_pool: CallPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> CallPool:
+    """Return the process-wide pool for guarded Gemini calls."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Abandoned calls must never take every worker
+                _pool = CallPool(max(LLM_CALL_WORKERS, BREAKER_MAX_ABANDONED + 1))
+    return _pool
+
+
+def _record_outcome(breaker: CircuitBreaker, future: Future):
+    breaker.settle(future.exception() is None)
+
+
+def with_fallback(
+    llm_func: Callable[[], T],
+    offline_func: Callable[[], T],
+    timeout: float | None,
+    breaker: CircuitBreaker | None = None,
+    on_abandon: Callable[[], None] | None = None,
+    pool: CallPool | None = None
+) -> Tuple[T, str | None]:
+    """
+    Return (result, None) from llm_func if it finishes within `timeout`
+    seconds (None = no limit), else (offline_func(), reason).
+    The blocking SDK call cannot be interrupted, so on timeout it is
+    abandoned and left to finish in the background; on_abandon is called
+    before offline_func so the caller can stop listening to it (e.g. drop
+    its streamed chunks). Running out of the plan's budget says nothing
+    about Gemini's health, so a timeout is not a breaker failure; the
+    abandoned call reports its own outcome when it finishes, and too many
+    unfinished ones open the breaker. The calls share `pool` (by default
+    get_pool()).
+    """
+    breaker = breaker or get_breaker()
+    # Checked first: a call that never starts must not take the half-open trial
+    if timeout is not None and timeout <= 0:
+        return offline_func(), "no budget left"
+    if not breaker.allow():
+        return offline_func(), "circuit open"
+
+    future = (pool or get_pool()).submit(llm_func)
+    try:
+        result = future.result(timeout=timeout)
+    except FutureTimeout:
+        breaker.abandon()
+        future.add_done_callback(lambda done: _record_outcome(breaker, done))
+        if on_abandon is not None:
+            on_abandon()
+        return offline_func(), f"timed out after {timeout:.1f}s"
+    except Exception as ex:
+        breaker.record_failure()
+        return offline_func(), f"{type(ex).__name__}: {ex}"
+    breaker.record_success()
+    return result, None
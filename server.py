@@ -0,0 +1,492 @@
+# server.py
+"""
+Long-running HTTP service: plans profiles posted as JSON, with the agents,
+the Gemini client, the recipe index and the LLM cache kept warm between
+requests.
+
+    python server.py --port 8080 --llm
+
+    curl -X POST localhost:8080/plan -d @profile.json            # whole plan
+    curl -N -X POST 'localhost:8080/plan?stream=1' -d @profile.json  # streamed
+    curl localhost:8080/plans/42                                   # archived plan (--archive)
+    curl localhost:8080/health
+    curl localhost:8080/metrics
+
+Missing profile fields take DEFAULT_PROFILE's values. Identical requests
+(same normalised profile, mode and streaming) that arrive while a plan
+for them is running share that one pipeline execution. Memory is bounded:
+at most SERVER_MAX_PIPELINES plans run at once, at most SERVER_MAX_QUEUE
+more wait for a slot (beyond that, 503), request bodies are capped at
+SERVER_MAX_BODY_BYTES and open connections at SERVER_MAX_CONNECTIONS.
+With --archive, finished plans are stored in a PlanArchive: responses
+carry an X-Plan-Id header (a chunked trailer when streamed), GET /plans?user_id=... lists a user's plans and
+GET /plans/<id> serves a stored plan straight from the archive's memory
+map, without planning anything.
+Uses only the standard library (asyncio streams, HTTP/1.1, one request
+per connection).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import tracing
+from agents import OrchestratorAgent
+from archive import PlanArchive
+from config import (
+    PLAN_DEADLINE_SECONDS,
+    SERVER_HOST,
+    SERVER_MAX_BODY_BYTES,
+    SERVER_MAX_CONNECTIONS,
+    SERVER_MAX_PIPELINES,
+    SERVER_MAX_QUEUE,
+    SERVER_PORT,
+)
+from memory import MemoryStore, user_key
+from personality_engine import personalize_profile
+from user_input import DEFAULT_PROFILE
+
+# Seconds a client gets to send its request line, headers and body
+READ_TIMEOUT = 10.0
+
+# Profile fields that the agents parse as "H:MM"/"HH:MM"
+CLOCK_FIELDS = ("wake_time", "sleep_time", "work_start", "work_end")
+_CLOCK = re.compile(r"^([01]?\d|2[0-3]):[0-5]\d$")
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 411: "Length Required", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def normalize_profile(raw) -> dict:
+    """
+    The profile a request describes: DEFAULT_PROFILE overlaid with the
+    request's fields. Profiles from the network may not point at server-side
+    files, so "calendar_ics" is dropped. Clock fields must be "HH:MM".
+    """
+    if not isinstance(raw, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    profile = dict(DEFAULT_PROFILE)
+    profile.update(raw)
+    profile.pop("calendar_ics", None)
+    for field in CLOCK_FIELDS:
+        value = profile[field]
+        if not isinstance(value, str) or not _CLOCK.match(value):
+            raise HTTPError(400, f"{field} must be a time as HH:MM, got {json.dumps(value)}")
+    return profile
+
+
+def profile_key(profile: dict, use_llm: bool, stream: bool) -> str:
+    """Requests with equal keys produce byte-identical responses and can share one run."""
+    blob = json.dumps([profile, use_llm, stream], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class Flight:
+    """
+    One pipeline execution and its output, shared by every request that
+    joins it. Chunks are kept until the flight is over so late joiners get
+    the whole plan; each reader paces itself, so a slow client never
+    holds up the pipeline or the other readers.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.readers = 0
+        # Where the finished plan was archived, if the server keeps an archive
+        self.plan_id: int | None = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def append(self, chunk: bytes):
+        if chunk:
+            self.chunks.append(chunk)
+            self._notify()
+
+    def finish(self, error: BaseException | None = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def wait_started(self):
+        """Until there is output, or the run is over."""
+        while not self.chunks and not self.done:
+            await self._changed.wait()
+
+    async def read(self) -> AsyncIterator[bytes]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                return
+            await changed.wait()
+
+
+class _FlightSink:
+    """File-like sink for stream_pipeline: hands text from the worker thread to the event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, flight: Flight):
+        self.loop = loop
+        self.flight = flight
+
+    def write(self, text: str):
+        self.loop.call_soon_threadsafe(self.flight.append, text.encode("utf-8"))
+
+    def flush(self):
+        pass
+
+
+class PlanServer:
+    """
+    Serves plans over HTTP from one process.
+    Pipelines run on a bounded thread pool; the event loop only parses
+    requests, coalesces them and writes responses.
+    """
+
+    def __init__(
+        self,
+        use_llm: bool = False,
+        max_pipelines: int = SERVER_MAX_PIPELINES,
+        max_queue: int = SERVER_MAX_QUEUE,
+        max_body: int = SERVER_MAX_BODY_BYTES,
+        max_connections: int = SERVER_MAX_CONNECTIONS,
+        deadline: float | None = PLAN_DEADLINE_SECONDS or None,
+        save_memory: bool = False,
+        archive: PlanArchive | None = None
+    ):
+        self.name = "PlanServer"
+        self.use_llm = use_llm
+        self.max_pipelines = max_pipelines
+        self.max_queue = max_queue
+        self.max_body = max_body
+        self.max_connections = max_connections
+        self.deadline = deadline
+        self.save_memory = save_memory
+        self.memory = MemoryStore() if save_memory else None
+        self.archive = archive
+        self.flights: Dict[str, Flight] = {}
+        self.connections = 0
+        self.stats = {"requests": 0, "coalesced": 0, "rejected": 0, "errors": 0, "plans": 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_pipelines, thread_name_prefix="plan")
+        self._slots = asyncio.Semaphore(max_pipelines)
+
+    def log(self, message: str):
+        print(f"[{self.name}] {message}", file=sys.stderr)
+
+    # ---- planning ----
+
+    def _plan(self, profile: dict, use_llm: bool, sink: _FlightSink | None) -> str | None:
+        orchestrator = OrchestratorAgent(
+            use_llm=use_llm,
+            user_prefs=profile,
+            personality=personalize_profile(profile),
+            persist_memory=self.save_memory,
+            deadline=self.deadline,
+            memory=self.memory
+        )
+        if sink is not None:
+            orchestrator.stream_pipeline(sink)
+            return None
+        return orchestrator.run_full_pipeline()
+
+    async def _run_flight(self, key: str, flight: Flight, profile: dict, use_llm: bool, stream: bool):
+        loop = asyncio.get_running_loop()
+        error = None
+        try:
+            async with self._slots:
+                sink = _FlightSink(loop, flight) if stream else None
+                markdown = await loop.run_in_executor(
+                    self._executor, tracing.run_in_context(self._plan, profile, use_llm, sink)
+                )
+            if markdown is not None:
+                flight.append(markdown.encode("utf-8"))
+            self.stats["plans"] += 1
+            if self.archive is not None:
+                try:
+                    flight.plan_id = await loop.run_in_executor(
+                        self._executor, self.archive.put, user_key(profile), b"".join(flight.chunks).decode("utf-8")
+                    )
+                except OSError as ex:
+                    # The plan itself is fine; serve it without an id
+                    self.log(f"Archiving failed: {ex}")
+        except Exception as ex:
+            error = ex
+            self.stats["errors"] += 1
+            self.log(f"Plan failed: {type(ex).__name__}: {ex}")
+        finally:
+            # New requests start a fresh run from here on; current readers keep this one.
+            # Queued callbacks from the sink run before this, so no chunk is lost.
+            del self.flights[key]
+            flight.finish(error)
+
+    def join(self, profile: dict, use_llm: bool, stream: bool) -> Tuple[Flight, bool]:
+        """The running flight for this request, or a new one. Returns (flight, coalesced)."""
+        key = profile_key(profile, use_llm, stream)
+        flight = self.flights.get(key)
+        if flight is not None:
+            self.stats["coalesced"] += 1
+            return flight, True
+        if len(self.flights) >= self.max_pipelines + self.max_queue:
+            self.stats["rejected"] += 1
+            raise HTTPError(503, "Too many plans in progress, retry shortly")
+        flight = self.flights[key] = Flight()
+        asyncio.get_running_loop().create_task(self._run_flight(key, flight, profile, use_llm, stream))
+        return flight, False
+
+    # ---- HTTP ----
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        body = b""
+        if method == "POST":
+            if "chunked" in headers.get("transfer-encoding", "").lower():
+                raise HTTPError(411, "Send the profile with a Content-Length")
+            try:
+                length = int(headers.get("content-length", "0"))
+            except ValueError:
+                raise HTTPError(400, "Invalid Content-Length")
+            if length > self.max_body:
+                raise HTTPError(413, f"Profile larger than {self.max_body} bytes")
+            body = await reader.readexactly(length)
+        return method, target, headers, body
+
+    @staticmethod
+    def _head(status: int, content_type: str, extra: Dict[str, str]) -> bytes:
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in extra.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, body: bytes,
+                       content_type: str = "application/json", extra: Dict[str, str] | None = None):
+        extra = dict(extra or {}, **{"Content-Length": str(len(body))})
+        writer.write(self._head(status, content_type, extra) + body)
+        await writer.drain()
+
+    async def _error(self, writer: asyncio.StreamWriter, status: int, message: str):
+        extra = {"Retry-After": "1"} if status == 503 else None
+        await self._respond(writer, status, json.dumps({"error": message}).encode("utf-8"), extra=extra)
+
+    async def _serve_plan(self, writer: asyncio.StreamWriter, query: Dict[str, List[str]], body: bytes):
+        try:
+            raw = json.loads(body or b"{}")
+        except ValueError as ex:
+            raise HTTPError(400, f"Invalid JSON: {ex}")
+        profile = normalize_profile(raw)
+
+        def flag(name: str, default: bool) -> bool:
+            return query.get(name, [str(int(default))])[-1].lower() in ("1", "true", "yes")
+
+        use_llm = flag("llm", self.use_llm)
+        stream = flag("stream", False)
+
+        flight, coalesced = self.join(profile, use_llm, stream)
+        flight.readers += 1
+        try:
+            await flight.wait_started()
+            if flight.error is not None and not flight.chunks:
+                raise HTTPError(500, f"Planning failed: {type(flight.error).__name__}")
+            extra = {"X-Coalesced": "1" if coalesced else "0"}
+            content_type = "text/markdown; charset=utf-8"
+
+            if not stream:
+                async for _ in flight.read():
+                    pass
+                if flight.error is not None:
+                    raise HTTPError(500, f"Planning failed: {type(flight.error).__name__}")
+                if flight.plan_id is not None:
+                    extra["X-Plan-Id"] = str(flight.plan_id)
+                await self._respond(writer, 200, b"".join(flight.chunks), content_type, extra)
+                return
+
+            extra["Transfer-Encoding"] = "chunked"
+            if self.archive is not None:
+                # The plan is archived once it is complete, so its id follows the body
+                extra["Trailer"] = "X-Plan-Id"
+            writer.write(self._head(200, content_type, extra))
+            async for chunk in flight.read():
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+            if flight.error is None:
+                # A stream cut short by an error ends without the final chunk, so clients see it as truncated
+                trailer = b"X-Plan-Id: %d\r\n" % flight.plan_id if flight.plan_id is not None else b""
+                writer.write(b"0\r\n" + trailer + b"\r\n")
+                await writer.drain()
+        finally:
+            flight.readers -= 1
+
+    async def _serve_archived(self, writer: asyncio.StreamWriter, path: str, query: Dict[str, List[str]]):
+        if self.archive is None:
+            raise HTTPError(404, "This server keeps no plan archive")
+        if path == "/plans":
+            user_id = query.get("user_id", [""])[-1]
+            if not user_id:
+                raise HTTPError(400, "Pass ?user_id=...")
+            plans = [self.archive.info(plan_id) for plan_id in self.archive.plan_ids(user_id)]
+            await self._respond(writer, 200, json.dumps(plans).encode("utf-8"))
+            return
+        try:
+            plan_id = int(path[len("/plans/"):])
+            views = list(self.archive.sections(plan_id))
+        except (ValueError, KeyError):
+            raise HTTPError(404, f"No archived plan {path[len('/plans/'):]}")
+        # Sections go to the socket straight from the archive's memory map
+        extra = {"Content-Length": str(sum(len(view) for view in views)), "X-Plan-Id": str(plan_id)}
+        writer.write(self._head(200, "text/markdown; charset=utf-8", extra))
+        for view in views:
+            writer.write(view)
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            if self.connections > self.max_connections:
+                self.stats["rejected"] += 1
+                await self._error(writer, 503, "Too many connections")
+                return
+            try:
+                method, target, _, body = await asyncio.wait_for(self._read_request(reader), READ_TIMEOUT)
+            except asyncio.TimeoutError:
+                await self._error(writer, 408, "Request not received in time")
+                return
+            except asyncio.IncompleteReadError:
+                return
+            self.stats["requests"] += 1
+            url = urlsplit(target)
+            if url.path == "/plan":
+                if method != "POST":
+                    raise HTTPError(405, "Use POST")
+                await self._serve_plan(writer, parse_qs(url.query), body)
+            elif url.path == "/plans" or url.path.startswith("/plans/"):
+                if method != "GET":
+                    raise HTTPError(405, "Use GET")
+                await self._serve_archived(writer, url.path, parse_qs(url.query))
+            elif url.path == "/health" and method == "GET":
+                await self._respond(writer, 200, json.dumps({
+                    "status": "ok",
+                    "llm": self.use_llm,
+                    "running": len(self.flights),
+                    "connections": self.connections,
+                    **self.stats,
+                }).encode("utf-8"))
+            elif url.path == "/metrics" and method == "GET":
+                await self._respond(writer, 200, self.metrics_text().encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                raise HTTPError(404, f"No route for {method} {url.path}")
+        except HTTPError as ex:
+            with contextlib.suppress(ConnectionError):
+                await self._error(writer, ex.status, str(ex))
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    def metrics_text(self) -> str:
+        """tracing's metrics plus the server's own counters and gauges."""
+        lines = [tracing.prometheus_text().rstrip("\n")]
+        for stat, value in sorted(self.stats.items()):
+            lines += [f"# TYPE lifenavigator_server_{stat}_total counter", f"lifenavigator_server_{stat}_total {value}"]
+        lines += [
+            "# TYPE lifenavigator_server_running_plans gauge", f"lifenavigator_server_running_plans {len(self.flights)}",
+            "# TYPE lifenavigator_server_connections gauge", f"lifenavigator_server_connections {self.connections}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    # ---- lifecycle ----
+
+    def warm_up(self):
+        """Import every module, build the recipe index and, in LLM mode, the Gemini client."""
+        self._plan(dict(DEFAULT_PROFILE), False, None)
+        if self.use_llm:
+            import gemini_agent
+            try:
+                gemini_agent.init_gemini()
+            except Exception as ex:
+                self.log(f"Gemini client not ready yet ({ex}); it will be built on the first request")
+
+    async def serve(self, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.warm_up)
+        server = await asyncio.start_server(self.handle, host, port, backlog=self.max_connections)
+        addresses = ", ".join(f"{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+        self.log(f"Listening on {addresses} (LLM mode = {self.use_llm}, {self.max_pipelines} pipelines)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve life plans over HTTP.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--llm", action="store_true", help="Plan with Gemini by default (requests may pass ?llm=0/1)")
+    parser.add_argument("--max-pipelines", type=int, default=SERVER_MAX_PIPELINES, help="Plans run at once")
+    parser.add_argument("--max-queue", type=int, default=SERVER_MAX_QUEUE, help="Plans waiting for a slot before 503")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Per-plan latency budget in seconds (default: PLAN_DEADLINE_SECONDS)")
+    parser.add_argument("--save-memory", action="store_true",
+                        help="Store preferences and stage outputs in memory.db and reuse unchanged stages")
+    parser.add_argument("--archive", metavar="DIR",
+                        help="Store finished plans in this plan archive and serve them at /plans/<id>")
+    parser.add_argument("--verbose", action="store_true", help="Show per-agent log lines")
+    args = parser.parse_args(argv)
+
+    server = PlanServer(
+        use_llm=args.llm,
+        max_pipelines=args.max_pipelines,
+        max_queue=args.max_queue,
+        deadline=args.deadline or PLAN_DEADLINE_SECONDS or None,
+        save_memory=args.save_memory,
+        archive=PlanArchive(args.archive) if args.archive else None
+    )
+    # Agent log lines go to stdout from many threads at once; server messages use stderr
+    with open(os.devnull, "w") as devnull:
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+        with quiet, contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(server.serve(args.host, args.port))
+    tracing.write_metrics()
+
+
+if __name__ == "__main__":
+    main()
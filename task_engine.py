@@ -0,0 +1,254 @@
+# task_engine.py
+"""
+Deadline- and priority-aware task scheduling for TaskOptimizer.
+
+Tasks are ordered with a binary heap (earliest deadline, then priority,
+then harder tasks first) and greedily packed into the free time left by
+the routine and calendar events. Slots are ranked by how well the energy
+level at their (remaining) start, derived from the user's sleep_type,
+suits the task's difficulty. work_style caps how much task time is
+planned per day. A task that fits no single slot or day is split into
+sessions on separate days; whatever still does not fit in the window is
+returned as a task with the remaining duration, to be carried over.
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from calendar_engine import CalendarIndex
+
+DIFFICULTY = {"low": 1, "medium": 2, "high": 3}
+
+# Minutes of task work planned per day, by work_style
+DAILY_TASK_MINUTES = {"heavy_worker": 60, "balanced_worker": 120, "light_worker": 180}
+
+# Energy (0-1) by hour of day for each sleep_type
+_PEAKS = {
+    "early_riser": (range(6, 11), range(11, 16)),
+    "regular_riser": (range(9, 12), range(15, 19)),
+    "late_riser": (range(17, 22), range(12, 17)),
+}
+
+DEFAULT_TASKS = [
+    {"title": "Pay electricity bill", "priority": 1, "duration": 15, "difficulty": "low"},
+    {"title": "Update resume", "priority": 1, "duration": 90, "difficulty": "high"},
+    {"title": "Deep clean kitchen", "priority": 2, "duration": 60, "difficulty": "medium"},
+    {"title": "Call parents", "priority": 2, "duration": 30, "difficulty": "low"},
+    {"title": "Read 20 pages of a book", "priority": 3, "duration": 30, "difficulty": "low"},
+]
+
+_TASK_LINE = re.compile(r"^\s*(?:[-*•]|\d+[.)])?\s*\(\s*(?:P|priority\s*)?(\d)\s*\)\s*[:.-]?\s*(.+?)\s*$", re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class Task:
+    title: str
+    priority: int = 2
+    deadline: Optional[date] = None
+    duration: int = 30  # minutes
+    difficulty: int = 2  # 1 = low, 3 = high
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Task":
+        deadline = data.get("deadline")
+        difficulty = data.get("difficulty", 2)
+        return cls(
+            title=data["title"],
+            priority=int(data.get("priority", 2)),
+            deadline=date.fromisoformat(deadline) if isinstance(deadline, str) else deadline,
+            duration=int(data.get("duration", 30)),
+            difficulty=DIFFICULTY.get(difficulty, 2) if isinstance(difficulty, str) else int(difficulty),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "title": self.title,
+            "priority": self.priority,
+            "deadline": self.deadline.isoformat() if self.deadline else None,
+            "duration": self.duration,
+            "difficulty": self.difficulty,
+        }
+
+    def __str__(self) -> str:
+        due = f" (due {self.deadline:%a %d %b})" if self.deadline else ""
+        return f"({self.priority}) {self.title}{due}"
+
+
+@dataclass(slots=True)
+class ScheduledTask:
+    task: Task
+    start: datetime
+    end: datetime
+    # Session number and count for a task split over several days (0 = not split)
+    part: int = 0
+    parts: int = 0
+
+    def __str__(self) -> str:
+        session = f" [session {self.part}/{self.parts}]" if self.part else ""
+        return f"{self.start:%a %H:%M}–{self.end:%H:%M} {self.task}{session}"
+
+
+def load_tasks(raw: Iterable | None) -> List[Task]:
+    """Tasks from a profile's "tasks" field (titles or dicts), else the defaults."""
+    items = DEFAULT_TASKS if raw is None else raw
+    return [Task(title=item) if isinstance(item, str) else Task.from_dict(item) for item in items]
+
+
+def prioritize(tasks: Iterable[Task]) -> List[Task]:
+    """Earliest deadline first, then priority, then harder tasks first; stable for ties."""
+    heap = [
+        (t.deadline or date.max, t.priority, -t.difficulty, seq, t)
+        for seq, t in enumerate(tasks)
+    ]
+    heapq.heapify(heap)
+    return [heapq.heappop(heap)[-1] for _ in range(len(heap))]
+
+
+def parse_task_lines(text: str, known: Sequence[Task] = ()) -> List[Task]:
+    """
+    Turn LLM bullet output like '- (1) Update resume' into Tasks.
+    Titles that match a known task keep its duration, deadline and difficulty.
+    """
+    by_title = {t.title.lower(): t for t in known}
+    tasks = []
+    for line in text.splitlines():
+        match = _TASK_LINE.match(line)
+        if not match:
+            continue
+        priority, title = int(match.group(1)), match.group(2).strip("*_ ")
+        base = by_title.get(title.lower())
+        if base:
+            tasks.append(Task(base.title, priority, base.deadline, base.duration, base.difficulty))
+        else:
+            tasks.append(Task(title, priority))
+    return tasks
+
+
+def energy_at(hour: int, sleep_type: str) -> float:
+    peak, good = _PEAKS.get(sleep_type, _PEAKS["regular_riser"])
+    if hour in peak:
+        return 1.0
+    if hour in good:
+        return 0.6
+    return 0.3
+
+
+def _parse_clock(value: str | None, default: time) -> time:
+    try:
+        h, m = value.split(":")
+        return time(int(h) % 24, int(m))
+    except (AttributeError, ValueError):
+        return default
+
+
+def _usable(slot: list, task: Task, budget: List[int]) -> int:
+    """Minutes of `slot` the task may use: its length, capped by the day's budget (0 if past the deadline)."""
+    begin, end, offset = slot
+    if task.deadline and begin.date() > task.deadline:
+        return 0
+    return min(int((end - begin).total_seconds() // 60), budget[offset])
+
+
+def _fit(task: Task, slots: List[list], budget: List[int], sleep_type: str) -> list | None:
+    """The best slot that takes the whole task, or None."""
+    best = None
+    best_key = None
+    for slot in slots:
+        if _usable(slot, task, budget) < task.duration:
+            continue
+        # Earliest day first; within a day, match hard tasks to high energy and vice versa
+        key = (slot[2], abs(energy_at(slot[0].hour, sleep_type) - task.difficulty / 3), slot[0])
+        if best_key is None or key < best_key:
+            best, best_key = slot, key
+    return best
+
+
+def _split(task: Task, slots: List[list], budget: List[int], sleep_type: str,
+           min_slot: int) -> List[Tuple[list, int]]:
+    """
+    Sessions (slot, minutes) for a task that fits no single slot: at most
+    one per day, earliest days first, each in the longest usable slot of
+    its day. May cover less than the whole task.
+    """
+    by_day = {}
+    for slot in slots:
+        usable = _usable(slot, task, budget)
+        if usable < min_slot:
+            continue
+        key = (-usable, abs(energy_at(slot[0].hour, sleep_type) - task.difficulty / 3), slot[0])
+        if slot[2] not in by_day or key < by_day[slot[2]][0]:
+            by_day[slot[2]] = (key, slot, usable)
+    sessions = []
+    remaining = task.duration
+    for offset in sorted(by_day):
+        if remaining <= 0:
+            break
+        _, slot, usable = by_day[offset]
+        minutes = min(remaining, usable)
+        sessions.append((slot, minutes))
+        remaining -= minutes
+    return sessions
+
+
+def schedule_tasks(
+    tasks: Sequence[Task],
+    index: CalendarIndex,
+    start_date: date,
+    days: int,
+    personality: dict,
+    prefs: dict,
+    min_slot: int = 15
+) -> Tuple[List[ScheduledTask], List[Task]]:
+    """
+    Place tasks into free slots of the calendar window.
+    Returns (scheduled tasks in time order, tasks or remainders that did not fit).
+    """
+    day_start = _parse_clock(prefs.get("wake_time"), time(7, 0))
+    day_end = _parse_clock(prefs.get("sleep_time"), time(22, 0))
+    if day_end <= day_start:
+        day_end = time(23, 59)
+    sleep_type = personality.get("sleep_type", "regular_riser")
+    daily_budget = DAILY_TASK_MINUTES.get(personality.get("work_style"), 120)
+
+    # slot = [start, end, day_index]; the start moves forward as the slot fills up
+    slots = []
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        for begin, end in index.free_slots(day, timedelta(minutes=min_slot), day_start, day_end):
+            slots.append([begin, end, offset])
+    budget = [daily_budget] * days
+
+    scheduled: List[ScheduledTask] = []
+    unscheduled: List[Task] = []
+    ordered = prioritize(tasks)
+    for i, task in enumerate(ordered):
+        if not slots:
+            # No free time left this window: everything else carries over
+            unscheduled.extend(ordered[i:])
+            break
+        best = _fit(task, slots, budget, sleep_type)
+        sessions = [(best, task.duration)] if best is not None else _split(task, slots, budget, sleep_type, min_slot)
+        if not sessions:
+            unscheduled.append(task)
+            continue
+
+        placed = 0
+        for n, (slot, minutes) in enumerate(sessions, start=1):
+            begin = slot[0]
+            part = n if len(sessions) > 1 else 0
+            scheduled.append(ScheduledTask(task, begin, begin + timedelta(minutes=minutes), part, len(sessions) if part else 0))
+            slot[0] = begin + timedelta(minutes=minutes)
+            budget[slot[2]] -= minutes
+            placed += minutes
+        if placed < task.duration:
+            # The rest is carried over as a shorter task
+            unscheduled.append(Task(task.title, task.priority, task.deadline, task.duration - placed, task.difficulty))
+        slots = [s for s in slots if budget[s[2]] >= min_slot and s[1] - s[0] >= timedelta(minutes=min_slot)]
+
+    scheduled.sort(key=lambda s: s.start)
+    return scheduled, unscheduled
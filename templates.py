@@ -0,0 +1,456 @@
+# templates.py
+"""
+Precomputed LLM sections for every personality archetype.
+
+personalize_profile() reduces a user to a few categorical fields, and the
+routine, meal and task prompts mostly depend on those. A warm-up job asks
+Gemini once per archetype and stores the answers. At request time a user
+is then served from their archetype's template with cheap local edits:
+
+- routine: times are moved from the template's wake / work / sleep times
+  onto the user's own (piecewise-linear between those anchors);
+- meals: dishes that contain one of the user's restricted ingredients are
+  swapped for the offline catalog's choice for that day and meal;
+- tasks: used only when the user kept the default task list;
+- the placeholder name is replaced with the user's name.
+
+Each section is keyed on only the fields its prompt reads (see
+STAGE_DEPENDENCIES in personality_engine.py), e.g. 3 x 3 x 2 x 2 x 2 = 72 routines.
+
+    python templates.py warm [--sections routine,meals] [--force] [--workers 4]
+    python templates.py status
+    python templates.py purge [--stale]
+
+A template is stale when it is older than TEMPLATE_MAX_AGE, or was made
+by another model or TEMPLATE_VERSION. Stale templates are not served
+unless TEMPLATE_SERVE_STALE is set; `warm` regenerates missing and stale
+ones, `warm --force` all of them.
+"""
+
+import argparse
+import itertools
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import registry
+import validation
+from config import TEMPLATE_MAX_AGE, TEMPLATE_PATH, TEMPLATE_SERVE_STALE
+from personality_engine import (
+    FITNESS_LEVELS,
+    LEARNING_MODES,
+    SKINCARE_LEVELS,
+    SLEEP_TYPES,
+    WORK_STYLES,
+    personalize_profile,
+)
+from recipes import BUDGET_LEVELS, DAYS, MEAL_TYPES, PROTEIN_TARGETS, default_catalog, restricted_terms
+from task_engine import Task, prioritize
+
+# Bump when a section prompt changes, so templates made from the old prompt go stale
+TEMPLATE_VERSION = 1
+
+SECTIONS = ("routine", "meals", "tasks")
+SECTION_FIELDS = {
+    "routine": ("sleep_type", "work_style", "fitness_level", "learning_mode", "skincare_importance"),
+    "meals": ("diet_type", "budget_level"),
+    "tasks": ("sleep_type", "work_style", "fitness_level", "learning_mode"),
+}
+FIELD_VALUES = {
+    "sleep_type": SLEEP_TYPES,
+    "work_style": WORK_STYLES,
+    "fitness_level": FITNESS_LEVELS,
+    "learning_mode": LEARNING_MODES,
+    "skincare_importance": SKINCARE_LEVELS,
+    "diet_type": tuple(PROTEIN_TARGETS),
+    "budget_level": tuple(BUDGET_LEVELS),
+}
+
+# Name used in the warm-up profiles, replaced with the user's at request time
+NAME_PLACEHOLDER = "Alex"
+
+# Representative times per archetype: (wake, sleep) by sleep type, and
+# work hours by work style. Work starts two hours after waking.
+_SLEEP_TIMES = {"early_riser": (330, 1290), "regular_riser": (420, 1380), "late_riser": (600, 60)}
+_WORK_HOURS = {"light_worker": 4, "balanced_worker": 8, "heavy_worker": 10}
+
+# A long-running process re-reads the store this often, to pick up a warm-up run
+RELOAD_SECONDS = 60.0
+
+_TIME = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)\b")
+_DAY_LINE = re.compile(r"^\W*(" + "|".join(DAYS) + r")\b", re.IGNORECASE)
+_MEAL_LINE = re.compile(r"^(\s*(?:[-*•]\s*)?\**(" + "|".join(MEAL_TYPES) + r")\**\s*:\s*\**\s*)(.+)$", re.IGNORECASE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    section TEXT NOT NULL,
+    archetype TEXT NOT NULL,
+    content TEXT NOT NULL,
+    model TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (section, archetype)
+);
+"""
+
+
+def _hhmm(minutes: int) -> str:
+    minutes %= 1440
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _minutes(hhmm: str) -> int:
+    hours, _, mins = str(hhmm).partition(":")
+    return int(hours) * 60 + int(mins or 0)
+
+
+def archetype(section: str, personality: dict) -> Tuple:
+    """The values of the fields `section` depends on."""
+    return tuple(personality.get(field) for field in SECTION_FIELDS[section])
+
+
+def archetypes(section: str) -> Iterator[Tuple]:
+    """Every archetype a section has a template for."""
+    return itertools.product(*(FIELD_VALUES[field] for field in SECTION_FIELDS[section]))
+
+
+def representative_profile(section: str, values: Sequence) -> dict:
+    """Preferences whose personalize_profile() lands on this archetype; used to generate its template."""
+    fields = dict(zip(SECTION_FIELDS[section], values))
+    wake, sleep = _SLEEP_TIMES[fields.get("sleep_type", "regular_riser")]
+    work_start = wake + 120
+    work_end = work_start + _WORK_HOURS[fields.get("work_style", "balanced_worker")] * 60
+    return {
+        "name": NAME_PLACEHOLDER,
+        "wake_time": _hhmm(wake),
+        "sleep_time": _hhmm(sleep),
+        "work_start": _hhmm(work_start),
+        "work_end": _hhmm(work_end),
+        "wants_gym": fields.get("fitness_level", "active") == "active",
+        "wants_learning": fields.get("learning_mode", "growth_oriented") == "growth_oriented",
+        "wants_skincare": fields.get("skincare_importance", "high") == "high",
+        "diet_type": fields.get("diet_type", "balanced"),
+        "budget_level": fields.get("budget_level", "medium"),
+        "avoid_ingredients": [],
+    }
+
+
+# ---- request-time substitution ----
+
+def _anchors(prefs: dict) -> List[int] | None:
+    """Wake, work start, work end and sleep as minutes after waking; None unless in that order."""
+    try:
+        times = [_minutes(prefs[field]) for field in ("wake_time", "work_start", "work_end", "sleep_time")]
+    except (KeyError, ValueError):
+        return None
+    relative = [(t - times[0]) % 1440 for t in times]
+    if not all(a < b for a, b in zip(relative, relative[1:])):
+        return None
+    return relative
+
+
+def shift_times(text: str, source: dict, target: dict) -> str | None:
+    """
+    Move every HH:MM in `text` from `source`'s day onto `target`'s: the
+    wake, work and sleep times map exactly, times between them are
+    interpolated (to 5 minutes), and times after sleep keep their offset.
+    None if either profile's times are not in wake < work < sleep order.
+    """
+    src, dst = _anchors(source), _anchors(target)
+    if src is None or dst is None:
+        return None
+    src_wake, dst_wake = _minutes(source["wake_time"]), _minutes(target["wake_time"])
+
+    def move(match: re.Match) -> str:
+        rel = (int(match.group(1)) * 60 + int(match.group(2)) - src_wake) % 1440
+        if rel in src:
+            return _hhmm(dst_wake + dst[src.index(rel)])
+        if rel > src[-1]:
+            return _hhmm(dst_wake + dst[-1] + rel - src[-1])
+        i = max(j for j, anchor in enumerate(src) if anchor < rel)
+        frac = (rel - src[i]) / (src[i + 1] - src[i])
+        return _hhmm(5 * round((dst_wake + dst[i] + frac * (dst[i + 1] - dst[i])) / 5))
+
+    return _TIME.sub(move, text)
+
+
+def _restriction_pattern(restrictions: Sequence[str]) -> re.Pattern | None:
+    """Matches anything the restrictions rule out, as the recipe catalog sees it (restricted_terms)."""
+    terms = restricted_terms(restrictions)
+    if not terms:
+        return None
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, sorted(terms, key=len, reverse=True))) + r")\b", re.IGNORECASE)
+
+
+def filter_meals(text: str, personality: dict) -> str | None:
+    """
+    Swap dishes that mention a restricted ingredient for the offline
+    catalog's pick for that day and meal. None if a restricted dish is
+    outside any day heading, so the caller asks the LLM instead.
+    """
+    pattern = _restriction_pattern(personality.get("restrictions", []))
+    if pattern is None or not pattern.search(text):
+        return text
+    catalog_week = None
+    day = None
+    lines = []
+    for line in text.splitlines():
+        day_match = _DAY_LINE.match(line)
+        meal_match = _MEAL_LINE.match(line)
+        if day_match and not meal_match:
+            day = day_match.group(1).capitalize()
+        elif meal_match and pattern.search(meal_match.group(3)):
+            if day is None:
+                return None
+            if catalog_week is None:
+                catalog_week, _ = default_catalog().plan_week(
+                    diet_type=personality.get("diet_type", "balanced"),
+                    budget_level=personality.get("budget_level", "medium"),
+                    restrictions=personality.get("restrictions", [])
+                )
+            line = meal_match.group(1) + catalog_week[day][meal_match.group(2).capitalize()]
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _rename(text: str, name: str) -> str:
+    return re.sub(rf"\b{NAME_PLACEHOLDER}\b", name, text)
+
+
+# ---- generation ----
+
+def _generate(section: str, prefs: dict, use_cache: bool = True) -> Any:
+    """
+    Ask the LLM for one section of a representative profile; returns
+    JSON-ready content. use_cache=False skips the LLM response cache.
+    """
+    personality = personalize_profile(prefs)
+    if section == "routine":
+        result = registry.create("routine_agent").generate(prefs, personality, True, use_cache=use_cache)
+    elif section == "meals":
+        result = registry.create("meal_planner").generate_meal_plan(prefs, personality, True, use_cache=use_cache)
+    else:
+        result = registry.create("task_optimizer").optimize_tasks(prefs, personality, True, use_cache=use_cache)
+    # A malformed answer would be served to every user of the archetype
+    problems = validation.section_problems(section, result, prefs)
+    if problems:
+        raise ValueError(f"answer failed validation: {'; '.join(problems)}")
+    if section == "meals":
+        return {"meals": result[0], "shopping": result[1]}
+    if section == "tasks":
+        return [task.to_dict() for task in result]
+    return result
+
+
+def _model_name() -> str:
+    import gemini_agent
+    return gemini_agent.get_client().model_name
+
+
+class TemplateStore:
+    """
+    SQLite-backed templates, read into memory on first use (there are only
+    a few hundred) and re-read every RELOAD_SECONDS.
+    """
+
+    def __init__(self, path: str = TEMPLATE_PATH, max_age: float = TEMPLATE_MAX_AGE,
+                 serve_stale: bool = TEMPLATE_SERVE_STALE):
+        self.path = path
+        self.max_age = max_age
+        self.serve_stale = serve_stale
+        self._rows: Dict[Tuple[str, Tuple], Tuple[Any, str, int, float]] | None = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _load(self) -> Dict[Tuple[str, Tuple], Tuple[Any, str, int, float]]:
+        now = time.monotonic()
+        with self._lock:
+            if self._rows is None or now - self._loaded_at > RELOAD_SECONDS:
+                with self._connect() as conn:
+                    rows = conn.execute(
+                        "SELECT section, archetype, content, model, version, created_at FROM templates"
+                    ).fetchall()
+                self._rows = {
+                    (section, tuple(json.loads(key))): (json.loads(content), model, version, created_at)
+                    for section, key, content, model, version, created_at in rows
+                }
+                self._loaded_at = now
+            return self._rows
+
+    def is_stale(self, model: str, version: int, created_at: float) -> bool:
+        return (
+            version != TEMPLATE_VERSION
+            or model != _model_name()
+            or (self.max_age > 0 and time.time() - created_at > self.max_age)
+        )
+
+    def get(self, section: str, key: Tuple) -> Any | None:
+        """The template content for an archetype, or None if missing (or stale and not served)."""
+        row = self._load().get((section, tuple(key)))
+        if row is None:
+            return None
+        content, model, version, created_at = row
+        if self.is_stale(model, version, created_at) and not self.serve_stale:
+            return None
+        return content
+
+    def put(self, section: str, key: Tuple, content: Any):
+        row = (json.dumps(content), _model_name(), TEMPLATE_VERSION, time.time())
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO templates (section, archetype, content, model, version, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (section, json.dumps(list(key)), *row)
+            )
+        with self._lock:
+            if self._rows is not None:
+                self._rows[(section, tuple(key))] = (content, *row[1:])
+
+    def status(self) -> Dict[str, Dict[str, int]]:
+        """Per section: how many archetypes have a fresh, stale or no template."""
+        rows = self._load()
+        report = {}
+        for section in SECTIONS:
+            counts = {"fresh": 0, "stale": 0, "missing": 0}
+            for key in archetypes(section):
+                row = rows.get((section, key))
+                state = "missing" if row is None else "stale" if self.is_stale(*row[1:]) else "fresh"
+                counts[state] += 1
+            report[section] = counts
+        return report
+
+    def purge(self, stale_only: bool = False) -> int:
+        """Delete templates (only stale ones with stale_only); returns how many."""
+        doomed = [
+            (section, json.dumps(list(key)))
+            for (section, key), row in self._load().items()
+            if not stale_only or self.is_stale(*row[1:])
+        ]
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM templates WHERE section = ? AND archetype = ?", doomed)
+        with self._lock:
+            self._rows = None
+        return len(doomed)
+
+    # ---- request time ----
+
+    def render(self, section: str, prefs: dict, personality: dict) -> Any | None:
+        """
+        The user's section built from their archetype's template, in the
+        same form the section's agent returns, or None when there is no
+        usable template and the LLM has to be asked.
+        """
+        if section == "tasks" and prefs.get("tasks") is not None:
+            return None
+        key = archetype(section, personality)
+        content = self.get(section, key)
+        if content is None:
+            return None
+        name = str(prefs.get("name") or "User")
+
+        if section == "routine":
+            routine = shift_times(content, representative_profile(section, key), prefs)
+            return None if routine is None else _rename(routine, name)
+        if section == "meals":
+            meals = {}
+            for label, text in content["meals"].items():
+                text = filter_meals(text, personality) if isinstance(text, str) else text
+                if text is None:
+                    return None
+                meals[label] = _rename(text, name) if isinstance(text, str) else text
+            return meals, list(content["shopping"])
+        return prioritize(Task.from_dict(data) for data in content)
+
+    # ---- warm-up ----
+
+    def warm(self, sections: Sequence[str] = SECTIONS, force: bool = False, workers: int = 4) -> Dict[str, int]:
+        """
+        Generate templates for every archetype of `sections` that is
+        missing or stale (all of them with force). With force the LLM
+        response cache is bypassed so answers are really regenerated.
+        Returns counts of generated, skipped and failed templates.
+        """
+        rows = self._load()
+        jobs = []
+        for section in sections:
+            for key in archetypes(section):
+                row = rows.get((section, key))
+                if force or row is None or self.is_stale(*row[1:]):
+                    jobs.append((section, key))
+        counts = {"generated": 0, "skipped": sum(1 for s in sections for _ in archetypes(s)) - len(jobs), "failed": 0}
+
+        def build(job):
+            section, key = job
+            prefs = representative_profile(section, key)
+            if archetype(section, personalize_profile(prefs)) != key:
+                raise ValueError(f"representative profile for {section} {key} lands on another archetype")
+            self.put(section, key, _generate(section, prefs, use_cache=not force))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for job, future in [(job, pool.submit(build, job)) for job in jobs]:
+                try:
+                    future.result()
+                    counts["generated"] += 1
+                except Exception as ex:
+                    counts["failed"] += 1
+                    print(f"[Templates] {job[0]} {'/'.join(job[1])} failed: {type(ex).__name__}: {ex}")
+        return counts
+
+
+_store: TemplateStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> TemplateStore:
+    """Return the process-wide template store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TemplateStore()
+    return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage precomputed plan templates.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    warm = sub.add_parser("warm", help="Generate missing and stale templates with Gemini")
+    warm.add_argument("--sections", default=",".join(SECTIONS), help="Comma-separated: routine,meals,tasks")
+    warm.add_argument("--force", action="store_true", help="Regenerate every template")
+    warm.add_argument("--workers", type=int, default=4, help="Concurrent LLM calls")
+    sub.add_parser("status", help="Show fresh / stale / missing templates per section")
+    purge = sub.add_parser("purge", help="Delete templates")
+    purge.add_argument("--stale", action="store_true", help="Only delete stale templates")
+    args = parser.parse_args(argv)
+
+    store = get_store()
+    if args.command == "warm":
+        sections = [s.strip() for s in args.sections.split(",") if s.strip()]
+        unknown = set(sections) - set(SECTIONS)
+        if unknown:
+            parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+        start = time.perf_counter()
+        counts = store.warm(sections, force=args.force, workers=args.workers)
+        print(f"✔ {counts['generated']} generated, {counts['skipped']} up to date, "
+              f"{counts['failed']} failed in {time.perf_counter() - start:.1f}s")
+        return 1 if counts["failed"] else 0
+    if args.command == "status":
+        for section, counts in store.status().items():
+            print(f"{section:<8} " + ", ".join(f"{state} {n}" for state, n in counts.items()))
+        return 0
+    print(f"✔ Deleted {store.purge(stale_only=args.stale)} templates")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+# tests/conftest.py
+"""
+Shared pytest setup. The modules live at the repository root, so it goes
+on sys.path. Every test runs in its own temporary directory, so caches,
+memory.db and archives never touch the working tree, and Gemini calls are
+answered by fake_gemini instead of the network.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import pytest  # noqa: E402
+
+from user_input import DEFAULT_PROFILE  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def profile():
+    """A fresh copy of the default profile."""
+    return dict(DEFAULT_PROFILE)
+
+
+@pytest.fixture
+def orchestrator_factory():
+    """Build an OrchestratorAgent that keeps nothing between runs."""
+    from agents import OrchestratorAgent
+    from personality_engine import personalize_profile
+
+    def build(prefs=None, use_llm=False, **options):
+        prefs = dict(prefs or DEFAULT_PROFILE)
+        options.setdefault("persist_memory", False)
+        options.setdefault("deadline", None)
+        return OrchestratorAgent(
+            use_llm=use_llm,
+            user_prefs=prefs,
+            personality=personalize_profile(prefs),
+            **options
+        )
+    return build
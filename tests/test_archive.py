@@ -0,0 +1,27 @@
+# tests/test_archive.py
+from archive import PlanArchive
+
+PLAN = "# Plan for {name}\n\n## 1. Routine\n07:00 Wake up\n\n## 2. Meals\nOats\n"
+
+
+def test_plans_are_listed_per_user_and_share_sections(tmp_path):
+    archive = PlanArchive(str(tmp_path / "archive"))
+    ids = [archive.put(name, PLAN.format(name=name)) for name in ("Sam", "Ada", "Sam")]
+    assert archive.plan_ids("Sam") == [ids[0], ids[2]]
+    assert archive.plan_ids("Ada") == [ids[1]]
+    assert archive.plan_ids("Nobody") == []
+    assert archive.latest("Sam") == ids[2]
+    assert archive.get(ids[1]) == PLAN.format(name="Ada")
+    # The routine and meal sections are stored once for all three plans
+    assert archive.stats()["sections"] == 4
+
+
+def test_user_index_picks_up_plans_from_other_writers(tmp_path):
+    path = str(tmp_path / "archive")
+    reader, writer = PlanArchive(path), PlanArchive(path)
+    assert reader.plan_ids("Sam") == []
+    first = writer.put("Sam", PLAN.format(name="Sam"))
+    second = writer.put("Sam", PLAN.format(name="Sam") + "\n## 3. Tasks\n- Call parents\n")
+    assert reader.plan_ids("Sam") == [first, second]
+    assert reader.put("Sam", PLAN.format(name="Sam")) == second + 1
+    assert PlanArchive(path).plan_ids("Sam") == [first, second, second + 1]
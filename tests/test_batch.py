@@ -0,0 +1,63 @@
+# tests/test_batch.py
+import json
+
+import pytest
+
+import batch
+from user_input import DEFAULT_PROFILE
+
+
+def _write_profiles(path, lines):
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _profiles(count, broken=()):
+    lines = []
+    for i in range(count):
+        profile = dict(DEFAULT_PROFILE, user_id=f"u{i}")
+        if i in broken:
+            del profile["wake_time"]
+        lines.append(json.dumps(profile))
+    return lines
+
+
+def test_writes_one_plan_per_profile(tmp_path):
+    _write_profiles("p.jsonl", _profiles(3))
+    batch.main(["p.jsonl", "--out-dir", "plans", "--workers", "1"])
+    assert sorted(p.name for p in (tmp_path / "plans").iterdir()) == ["u0.md", "u1.md", "u2.md"]
+    assert sorted((tmp_path / "p.jsonl.checkpoint").read_text().split()) == ["u0", "u1", "u2"]
+
+
+def test_bad_records_are_logged_and_skipped(tmp_path):
+    lines = _profiles(5, broken={2})
+    lines.insert(3, "{not json")
+    _write_profiles("p.jsonl", lines)
+
+    batch.main(["p.jsonl", "--out-dir", "plans", "--workers", "2"])
+
+    written = sorted(p.name for p in (tmp_path / "plans").iterdir())
+    assert written == ["u0.md", "u1.md", "u3.md", "u4.md"]
+    errors = [json.loads(line) for line in (tmp_path / "p.jsonl.errors").read_text().splitlines()]
+    assert sorted(e["user_id"] for e in errors) == ["line-4", "u2"]
+    assert any("wake_time" in e["error"] for e in errors)
+    checkpoint = set((tmp_path / "p.jsonl.checkpoint").read_text().split())
+    assert checkpoint == {"u0", "u1", "u2", "u3", "u4", "line-4"}
+
+
+def test_resume_skips_failed_records(tmp_path, capsys):
+    lines = _profiles(2, broken={1})
+    _write_profiles("p.jsonl", lines + ["[1, 2]"])
+    batch.main(["p.jsonl", "--out-dir", "plans", "--workers", "1"])
+    capsys.readouterr()
+
+    batch.main(["p.jsonl", "--out-dir", "plans", "--workers", "1"])
+    out = capsys.readouterr().out
+    assert "Planned 0 profiles" in out
+    assert len((tmp_path / "p.jsonl.errors").read_text().splitlines()) == 2
+
+
+def test_iter_profiles_without_error_log_raises(tmp_path):
+    _write_profiles("p.jsonl", ["{broken"])
+    with pytest.raises(ValueError, match="p.jsonl:1"):
+        list(batch.iter_profiles("p.jsonl"))
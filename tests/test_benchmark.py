@@ -0,0 +1,21 @@
+# tests/test_benchmark.py
+from benchmark import ABSOLUTE_SLACK_MS, ABSOLUTE_SLACK_US, compare
+
+
+def test_microsecond_timings_get_absolute_slack():
+    baselines = {"archive.get_us": 21.43, "validation.tasks_us": 14.6}
+    assert compare({"archive.get_us": 34.15, "validation.tasks_us": 14.6 * 1.25 + ABSOLUTE_SLACK_US - 0.1}, baselines, 0.25) == []
+    regressions = compare({"archive.get_us": 21.43 * 1.25 + ABSOLUTE_SLACK_US + 1}, baselines, 0.25)
+    assert [line.split(":")[0] for line in regressions] == ["archive.get_us"]
+
+
+def test_other_metrics_keep_their_rules():
+    baselines = {"pipeline.total_ms": 10.0, "batch.plans_per_s": 100.0, "pipeline.llm_calls_per_plan": 3, "horizon.peak_kib": 100.0}
+    metrics = {
+        "pipeline.total_ms": 10.0 * 1.25 + ABSOLUTE_SLACK_MS + 0.1,
+        "batch.plans_per_s": 74.0,
+        "pipeline.llm_calls_per_plan": 4,
+        "horizon.peak_kib": 126.0,
+    }
+    assert len(compare(metrics, baselines, 0.25)) == 4
+    assert compare({"horizon.peak_kib": 124.0, "batch.plans_per_s": 76.0}, baselines, 0.25) == []
@@ -0,0 +1,64 @@
+# tests/test_calendar.py
+import random
+from datetime import date, datetime, time, timedelta
+
+from calendar_engine import CalendarIndex, Interval, parse_event, parse_routine
+
+MONDAY = date(2025, 11, 24)
+
+
+def _at(hour, minute=0, day=MONDAY):
+    return datetime.combine(day, time(hour, minute))
+
+
+def test_routine_and_event_parsing():
+    assert parse_routine("- 07:00–07:30 Wake up\n23:30 - 00:30: Read\nno time here\n21:00 Wind down") == [
+        (time(7, 0), timedelta(minutes=30), "Wake up"),
+        (time(23, 30), timedelta(hours=1), "Read"),
+        (time(21, 0), timedelta(minutes=30), "Wind down"),
+    ]
+    event = parse_event("2025-11-28 10:00 Team standup (Online)")
+    assert (event.start, event.end, event.kind) == (datetime(2025, 11, 28, 10), datetime(2025, 11, 28, 11), "event")
+    assert parse_event("2025-11-28 23:00–01:00 Night shift").end == datetime(2025, 11, 29, 1)
+    assert parse_event("tomorrow at ten") is None
+
+
+def test_conflicts_match_a_brute_force_check():
+    rng = random.Random(7)
+    intervals = []
+    for n in range(300):
+        start = _at(0) + timedelta(minutes=rng.randrange(0, 3 * 24 * 60, 15))
+        intervals.append(Interval(start, start + timedelta(minutes=rng.choice([15, 30, 60, 240])), f"e{n}"))
+    index = CalendarIndex()
+    index.add_all(intervals)
+    expected = {
+        frozenset((a.title, b.title)) for i, a in enumerate(intervals) for b in intervals[i + 1:]
+        if a.overlaps(b.start, b.end)
+    }
+    found = [frozenset((a.title, b.title)) for a, b in index.conflicts()]
+    assert len(found) == len(set(found))
+    assert set(found) == expected
+    assert len(index) == len(intervals)
+
+
+def test_overlapping_spans_midnight():
+    index = CalendarIndex()
+    night = Interval(_at(23), _at(23) + timedelta(hours=2), "Night shift")
+    index.add(night)
+    assert index.overlapping(_at(0, 30, MONDAY + timedelta(days=1)), _at(1, 30, MONDAY + timedelta(days=1))) == [night]
+    assert index.day(MONDAY + timedelta(days=1)) == [night]
+
+
+def test_free_slots_are_the_gaps_between_busy_blocks():
+    index = CalendarIndex()
+    index.add_routine("07:00–08:00 Breakfast\n09:00–17:00 Work", MONDAY, days=7)
+    index.add(Interval(_at(16), _at(18), "Dentist"))
+    assert index.free_slots(MONDAY, timedelta(minutes=30), time(7, 0), time(22, 0)) == [
+        (_at(8), _at(9)),
+        (_at(18), _at(22)),
+    ]
+    # Weekends get no routine blocks
+    saturday = MONDAY + timedelta(days=5)
+    assert index.free_slots(saturday, timedelta(minutes=30)) == [(_at(7, day=saturday), _at(22, day=saturday))]
+    # The index reports every overlap; CalendarManager decides which ones matter
+    assert [(a.title, b.title) for a, b in index.conflicts(MONDAY, MONDAY + timedelta(days=1))] == [("Work", "Dentist")]
@@ -0,0 +1,50 @@
+# tests/test_fused_plan.py
+import json
+
+import pytest
+
+from fake_gemini import _FUSED, fake_gemini
+from fused_plan import parse_fused_response, section_token_counts
+from task_engine import Task
+
+
+def test_fused_answer_parses_into_plan_parts():
+    known = [Task("Update resume", duration=90, difficulty=3)]
+    plan = parse_fused_response("```json\n" + _FUSED + "\n```", known)
+    assert plan.routine_text.splitlines()[0] == "07:00–07:30 Wake up, hydrate, skincare"
+    assert set(plan.meals) == {"Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"}
+    assert plan.meals["Monday"]["Lunch"] == "Lentil bowl"
+    assert "Rice" in plan.shopping
+    resume = next(t for t in plan.tasks if t.title == "Update resume")
+    # Known tasks keep their duration and difficulty, with the model's priority
+    assert (resume.priority, resume.duration, resume.difficulty) == (1, 90, 3)
+
+
+@pytest.mark.parametrize("answer", [
+    "not json",
+    "[]",
+    json.dumps({"routine": [], "meals": [], "shopping_list": [], "tasks": []}),
+    json.dumps({**json.loads(_FUSED), "tasks": [{"title": "No priority"}]}),
+])
+def test_malformed_answers_are_rejected(answer):
+    with pytest.raises(ValueError):
+        parse_fused_response(answer)
+
+
+def test_section_token_counts_add_up():
+    plan = parse_fused_response(_FUSED)
+    counts = section_token_counts(plan, "prompt", {"prompt_tokens": 120, "output_tokens": 400})
+    assert counts["total"] == 520
+    assert abs(sum(counts[s] for s in ("routine", "meals", "shopping_list", "tasks")) - 400) <= 2
+    assert section_token_counts(plan, "prompt", {"prompt_tokens": 0, "output_tokens": 0})["total"] == 0
+
+
+def test_fused_mode_makes_one_llm_call(orchestrator_factory):
+    with fake_gemini(latency=0.0) as fake:
+        orchestrator_factory(use_llm=True).run_full_pipeline()
+        calls = fake.calls
+        fused = orchestrator_factory(use_llm=True, fused=True)
+        markdown = fused.run_full_pipeline()
+        assert calls == 3 and fake.calls == calls + 1
+    assert fused.fallbacks == {}
+    assert "Lentil bowl" in markdown and "Wake up, hydrate, skincare" in markdown
@@ -0,0 +1,119 @@
+# tests/test_gemini_client.py
+import asyncio
+import threading
+
+import pytest
+
+import gemini_agent
+from fake_gemini import FakeGeminiModel, FakeServerError, fake_gemini
+from rate_limit import AdaptiveConcurrency, TokenBucket, estimate_tokens, retry_call
+
+PROMPT = "You are a productivity coach. " * 20
+
+
+def _client(tpm=0, **fake_options):
+    fake = FakeGeminiModel(latency=0.0, **fake_options)
+    client = gemini_agent.GeminiClientManager(model_name=fake.model_name, rpm=0, tpm=tpm, max_retries=2)
+    client._model = fake
+    return client, fake
+
+
+def test_one_latency_feeds_the_limiter_and_the_trace(monkeypatch):
+    client, _ = _client()
+    traced = {}
+    monkeypatch.setattr(gemini_agent.tracing, "annotate", lambda **fields: traced.update(fields))
+    text, usage = client.generate_with_usage(PROMPT)
+    assert text.startswith("- (1)")
+    assert usage["prompt_tokens"] and usage["output_tokens"]
+    # The limiter's first sample is exactly the traced latency
+    assert round(client.concurrency._avg_latency * 1000, 3) == traced["llm_latency_ms"]
+
+
+def test_stream_closed_early_releases_its_slot_and_settles_tokens():
+    client, _ = _client(tpm=6000)
+    bucket = client.rate_limiter.tokens
+    estimated = estimate_tokens(PROMPT)
+    chunks = client.generate_stream(PROMPT)
+    first = next(chunks)
+    assert client.concurrency.in_flight == 1
+    before = bucket._tokens
+    chunks.close()
+    assert client.concurrency.in_flight == 0
+    # The reservation is settled to prompt + text received (no usage on a partial stream)
+    assert bucket._tokens == pytest.approx(before - len(first) // 4, abs=2.0)
+    assert bucket._tokens < bucket.capacity - estimated
+
+
+def test_exhausted_stream_reports_usage():
+    client, _ = _client()
+    usage = {}
+    text = "".join(client.generate_stream(PROMPT, usage=usage))
+    assert text.startswith("- (1)")
+    assert usage["output_tokens"] == max(1, len(text) // 4)
+    assert "llm_latency_ms" in usage
+    assert client.concurrency.in_flight == 0
+
+
+def test_server_errors_are_retried(monkeypatch):
+    monkeypatch.setattr("rate_limit.time.sleep", lambda seconds: None)
+    client, fake = _client(error_rate=1.0)
+    with pytest.raises(FakeServerError):
+        client.generate(PROMPT)
+    assert fake.calls == 3
+    assert client.concurrency.in_flight == 0
+
+
+def test_retry_call_stops_on_non_retryable_errors(monkeypatch):
+    monkeypatch.setattr("rate_limit.time.sleep", lambda seconds: None)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        retry_call(fail, retries=5)
+    assert len(calls) == 1
+
+
+def test_token_bucket_charge_can_go_negative():
+    bucket = TokenBucket(rate=1.0, capacity=10)
+    bucket.acquire(8)
+    bucket.charge(5)
+    assert bucket._tokens < 0
+
+
+def test_adaptive_concurrency_halves_on_throttling_and_grows_on_success():
+    limiter = AdaptiveConcurrency(initial=4, max_limit=8, cooldown=0.0)
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 2
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(latency=0.1)
+    assert 2 < limiter.limit <= 8
+
+
+def test_one_client_per_process(monkeypatch):
+    monkeypatch.setattr(gemini_agent, "_client", None)
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(gemini_agent.get_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(clients) == 8
+    assert all(client is clients[0] for client in clients)
+    # The SDK model is built on the first real call, not with the client
+    assert clients[0]._model is None
+
+
+def test_concurrent_allm_calls_share_the_client():
+    with fake_gemini(latency=0.01) as fake:
+        async def plan():
+            return await asyncio.gather(*(gemini_agent.allm(f"{PROMPT} {i}") for i in range(6)))
+
+        answers = asyncio.run(plan())
+        assert len(answers) == 6 and all(answer.startswith("- (1)") for answer in answers)
+        assert fake.calls == 6
+        assert gemini_agent.get_client()._model is fake
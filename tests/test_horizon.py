@@ -0,0 +1,69 @@
+# tests/test_horizon.py
+import io
+import os
+from datetime import date, timedelta
+
+import calendar_engine
+from fake_gemini import fake_gemini
+from horizon import HorizonState, WeekPlan, dishes
+from task_engine import Task
+
+MONDAY = date(2025, 12, 1)
+
+
+def test_weeks_are_planned_only_when_asked_for(orchestrator_factory):
+    with fake_gemini(latency=0.0) as fake:
+        weeks = orchestrator_factory(use_llm=True).iter_weeks(52, start_date=MONDAY)
+        assert fake.calls == 0
+        first = next(weeks)
+        # Week 1 makes the routine, meals and tasks; later weeks only new meals
+        assert fake.calls == 3
+        second = next(weeks)
+        assert fake.calls == 4
+    assert (first.number, first.start) == (1, MONDAY)
+    assert second.start == MONDAY + timedelta(days=7)
+    assert second.routine is first.routine
+
+
+def test_meals_vary_from_week_to_week(orchestrator_factory):
+    weeks = list(orchestrator_factory().iter_weeks(3, start_date=MONDAY))
+    assert dishes(weeks[0].meals) != dishes(weeks[1].meals)
+
+
+def test_calendar_file_is_indexed_once_for_all_weeks(orchestrator_factory, profile, tmp_path, monkeypatch):
+    path = tmp_path / "cal.ics"
+    path.write_text(
+        "BEGIN:VCALENDAR\nBEGIN:VEVENT\nDTSTART:20251201T120000\nDTEND:20251201T130000\n"
+        "RRULE:FREQ=WEEKLY\nSUMMARY:Team lunch\nEND:VEVENT\nEND:VCALENDAR\n"
+    )
+    parsed = []
+    real = calendar_engine._vevents
+    monkeypatch.setattr(calendar_engine, "_vevents", lambda p: parsed.append(p) or real(p))
+
+    weeks = orchestrator_factory(dict(profile, calendar_ics=str(path))).iter_weeks(4, start_date=MONDAY)
+    first = next(weeks)
+    # An edit mid-plan does not mix two versions of the calendar into one plan
+    path.write_text("BEGIN:VCALENDAR\nEND:VCALENDAR\n")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    for week in [first, *weeks]:
+        lunches = [e for e in week.calendar["events"] if "Team lunch" in e]
+        assert len(lunches) == 1 and str(week.start) in lunches[0]
+    assert parsed == [str(path)]
+
+
+def test_missed_deadlines_are_reported_once():
+    state = HorizonState(MONDAY)
+    late = {"title": "Renew passport", "deadline": MONDAY + timedelta(days=2)}
+    carried, missed = Task("Call parents"), Task.from_dict(late)
+    week = WeekPlan(1, MONDAY, "", {}, [], {"scheduled": [], "unscheduled": [carried, missed]}, {"events": []})
+    state.advance(week)
+    assert (week.carried, week.missed) == ([carried], [missed])
+    assert state.carry_over == [carried] and state.start == MONDAY + timedelta(days=7)
+
+
+def test_stream_weeks_writes_the_routine_once(orchestrator_factory):
+    sink = io.StringIO()
+    orchestrator_factory().stream_weeks(sink, 3, start_date=MONDAY)
+    text = sink.getvalue()
+    assert text.count("## 2. Daily Routine") == 1
+    assert text.endswith("Generated by Agent LifeNavigator.\n")
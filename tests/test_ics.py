@@ -0,0 +1,153 @@
+# tests/test_ics.py
+import os
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import calendar_engine
+from calendar_engine import iter_ics_events, load_ics
+from tools import CalendarManager
+
+ICS = """BEGIN:VCALENDAR
+BEGIN:VEVENT
+DTSTART:20251201T090000
+DTEND:20251201T100000
+SUMMARY:Dentist\\, downtown
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:20251202T180000
+DTEND:20251202T190000
+RRULE:FREQ=DAILY;COUNT=10
+EXDATE:20251204T180000
+SUMMARY:Evening run
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:20251203T120000
+DURATION:PT30M
+STATUS:CANCELLED
+SUMMARY:Cancelled lunch
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:20240101T080000
+DTEND:20240101T090000
+SUMMARY:Long
+  ago
+END:VEVENT
+END:VCALENDAR
+"""
+
+ROUTINE = "07:00–07:30 Wake up\n09:00–17:00 Work\n22:30 Sleep"
+
+
+def _write_ics(tmp_path):
+    path = tmp_path / "cal.ics"
+    path.write_text(ICS)
+    return str(path)
+
+
+def test_only_events_inside_the_window_are_read(tmp_path):
+    events = list(iter_ics_events(_write_ics(tmp_path), date(2025, 12, 1), date(2025, 12, 8)))
+    titles = [(iv.start, iv.title) for iv in events]
+    assert (datetime(2025, 12, 1, 9), "Dentist, downtown") in titles
+    runs = [iv.start.day for iv in events if iv.title == "Evening run"]
+    assert runs == [2, 3, 5, 6, 7]
+    assert not any(iv.title == "Cancelled lunch" for iv in events)
+    assert not any(iv.start.year == 2024 for iv in events)
+
+
+def test_ics_feed_replaces_the_demo_events(tmp_path):
+    merged = CalendarManager("CalendarSync").merge_with_events(
+        ROUTINE, start_date=date(2025, 12, 1), ics_path=_write_ics(tmp_path)
+    )
+    assert merged["events"]
+    assert not set(CalendarManager.DEFAULT_EVENTS) & set(merged["events"])
+    assert any("Dentist" in event for event in merged["events"])
+    assert merged["window"] == ("2025-12-01", "2025-12-08")
+
+
+def test_demo_events_are_used_without_a_calendar():
+    merged = CalendarManager("CalendarSync").merge_with_events(ROUTINE)
+    assert merged["events"] == CalendarManager.DEFAULT_EVENTS
+
+
+def test_explicit_events_are_kept_next_to_the_feed(tmp_path):
+    merged = CalendarManager("CalendarSync").merge_with_events(
+        ROUTINE, events=["2025-12-02 12:00 Lunch with Sam"], start_date=date(2025, 12, 1),
+        ics_path=_write_ics(tmp_path)
+    )
+    assert merged["events"][0] == "2025-12-02 12:00 Lunch with Sam"
+    assert any("Evening run" in event for event in merged["events"])
+
+
+def test_malformed_dates_skip_only_their_event(tmp_path):
+    path = tmp_path / "cal.ics"
+    path.write_text(ICS.replace("END:VCALENDAR", """BEGIN:VEVENT
+DTSTART:2025-12-03 09:00
+SUMMARY:Typed by hand
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:20251203T090000
+RRULE:FREQ=DAILY;UNTIL=soon
+SUMMARY:Bad rule
+END:VEVENT
+END:VCALENDAR"""))
+    skipped = []
+    events = list(iter_ics_events(str(path), date(2025, 12, 1), date(2025, 12, 8), skipped))
+    assert skipped == ["Typed by hand", "Bad rule"]
+    assert any(iv.title == "Dentist, downtown" for iv in events)
+
+    merged = CalendarManager("CalendarSync").merge_with_events(ROUTINE, start_date=date(2025, 12, 1), ics_path=str(path))
+    assert any("Evening run" in event for event in merged["events"])
+    assert load_ics(str(path)).skipped == ["Typed by hand", "Bad rule"]
+
+
+def test_calendar_is_parsed_once_per_file_version(tmp_path, monkeypatch):
+    path = _write_ics(tmp_path)
+    weeks = [date(2025, 11, 24) + timedelta(weeks=week) for week in range(4)]
+    expected = [list(iter_ics_events(path, start, start + timedelta(days=7))) for start in weeks]
+    parsed = []
+    real = calendar_engine._vevents
+    monkeypatch.setattr(calendar_engine, "_vevents", lambda p: parsed.append(p) or real(p))
+
+    calendar = load_ics(path)
+    assert [calendar.between(start, start + timedelta(days=7)) for start in weeks] == expected
+    manager = CalendarManager("CalendarSync")
+    for start in weeks:
+        manager.merge_with_events(ROUTINE, start_date=start, ics_path=path)
+    assert load_ics(path) is calendar
+    assert parsed == [path]
+
+    with open(path, "a") as f:
+        f.write("\n")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert load_ics(path) is not calendar
+
+
+def test_tzid_and_utc_times_are_converted_to_local_time(tmp_path):
+    path = tmp_path / "cal.ics"
+    path.write_text("""BEGIN:VCALENDAR
+BEGIN:VEVENT
+DTSTART;TZID=Asia/Tokyo:20251203T090000
+DTEND;TZID=Asia/Tokyo:20251203T100000
+SUMMARY:Tokyo call
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:20251204T090000Z
+DURATION:PT1H
+SUMMARY:UTC call
+END:VEVENT
+BEGIN:VEVENT
+DTSTART;TZID=Nowhere Standard Time:20251205T090000
+DURATION:PT1H
+SUMMARY:Floating call
+END:VEVENT
+END:VCALENDAR
+""")
+    events = {iv.title: iv for iv in iter_ics_events(str(path), date(2025, 12, 1), date(2025, 12, 8))}
+
+    def local(dt):
+        return dt.astimezone().replace(tzinfo=None)
+
+    assert events["Tokyo call"].start == local(datetime(2025, 12, 3, 9, tzinfo=ZoneInfo("Asia/Tokyo")))
+    assert events["Tokyo call"].end - events["Tokyo call"].start == timedelta(hours=1)
+    assert events["UTC call"].start == local(datetime(2025, 12, 4, 9, tzinfo=timezone.utc))
+    assert events["Floating call"].start == datetime(2025, 12, 5, 9)
@@ -0,0 +1,87 @@
+# tests/test_incremental.py
+import pytest
+
+import registry
+from agents import stage_fingerprint
+from fake_gemini import fake_gemini
+from memory import MemoryStore, user_key
+from personality_engine import personalize_profile
+
+
+def _run(orchestrator_factory, prefs, store):
+    orchestrator = orchestrator_factory(prefs, use_llm=True, persist_memory=True, memory=store)
+    markdown = orchestrator.run_full_pipeline()
+    return orchestrator, markdown
+
+
+def test_fingerprints_follow_stage_dependencies(profile):
+    personality = personalize_profile(profile)
+    edited = dict(profile, avoid_ingredients=["milk", "nuts"])
+    edited_personality = personalize_profile(edited)
+    assert stage_fingerprint("routine", profile, personality, True) == stage_fingerprint("routine", edited, edited_personality, True)
+    assert stage_fingerprint("meals", profile, personality, True) != stage_fingerprint("meals", edited, edited_personality, True)
+    assert stage_fingerprint("meals", profile, personality, True) != stage_fingerprint("meals", profile, personality, False)
+
+
+EDITS = {
+    "name": "Ada", "wake_time": "05:30", "sleep_time": "21:30", "work_start": "07:00", "work_end": "19:00",
+    "wants_gym": False, "wants_learning": False, "wants_skincare": False, "diet_type": "vegan",
+    "budget_level": "low", "avoid_ingredients": ["nuts"], "tasks": [{"title": "Renew passport"}],
+}
+
+
+@pytest.mark.parametrize("stage", ["routine", "meals", "tasks"])
+def test_fingerprint_changes_whenever_the_prompt_does(stage, profile, monkeypatch):
+    prompts = []
+
+    def llm(prompt, **options):
+        prompts.append(prompt)
+        return ""
+
+    monkeypatch.setattr("agents.llm", llm)
+    monkeypatch.setattr("tools.llm", llm)
+    generate = {
+        "routine": lambda prefs, personality: registry.create("routine_agent").generate(prefs, personality, True),
+        "meals": lambda prefs, personality: registry.create("meal_planner").generate_meal_plan(prefs, personality, True),
+        "tasks": lambda prefs, personality: registry.create("task_optimizer").optimize_tasks(prefs, personality, True),
+    }[stage]
+
+    def prompt_and_fingerprint(prefs):
+        personality = personalize_profile(prefs)
+        generate(prefs, personality)
+        return prompts[-1], stage_fingerprint(stage, prefs, personality, True)
+
+    prompt, fingerprint = prompt_and_fingerprint(profile)
+    for field, value in EDITS.items():
+        edited_prompt, edited_fingerprint = prompt_and_fingerprint(dict(profile, **{field: value}))
+        if edited_prompt != prompt:
+            assert edited_fingerprint != fingerprint, field
+    # A field no stage reads reaches no prompt
+    assert prompt_and_fingerprint(dict(profile, notes="likes tea")) == (prompt, fingerprint)
+
+
+def test_profile_edit_reruns_only_the_affected_stage(orchestrator_factory, profile):
+    store = MemoryStore("memory.db")
+    with fake_gemini(latency=0.0) as fake:
+        _, first = _run(orchestrator_factory, profile, store)
+        calls = fake.calls
+        assert calls == 3
+
+        orchestrator, again = _run(orchestrator_factory, profile, store)
+        assert again == first
+        assert fake.calls == calls
+        assert not {"routine", "meals", "tasks"} & set(orchestrator.stage_timings)
+
+        orchestrator, _ = _run(orchestrator_factory, dict(profile, diet_type="vegan"), store)
+        assert fake.calls == calls + 1
+        assert "meals" in orchestrator.stage_timings
+        assert not {"routine", "tasks"} & set(orchestrator.stage_timings)
+
+
+def test_offline_stand_ins_are_not_reused(orchestrator_factory, profile, monkeypatch):
+    monkeypatch.setattr("rate_limit.time.sleep", lambda seconds: None)
+    store = MemoryStore("memory.db")
+    with fake_gemini(latency=0.0, error_rate=1.0):
+        orchestrator, _ = _run(orchestrator_factory, profile, store)
+        assert set(orchestrator.fallbacks) == {"routine", "meals", "tasks"}
+    assert store.load_stage_outputs(user_key(profile)) == {}
@@ -0,0 +1,47 @@
+# tests/test_llm_cache.py
+import time
+
+import gemini_agent
+from fake_gemini import fake_gemini
+from llm_cache import LLMCache, cache_key
+
+
+def test_key_ignores_whitespace_but_not_model_or_params():
+    key = cache_key("gemini", "Plan my week\n   please ")
+    assert key == cache_key("gemini", "Plan my week please")
+    assert key != cache_key("other", "Plan my week please")
+    assert key != cache_key("gemini", "Plan my week please", {"temperature": 0.2})
+
+
+def test_responses_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    LLMCache(path).put("k", "answer")
+    cache = LLMCache(path)
+    assert cache.get("k") == "answer"
+    assert cache.stats()["hits"] == 1
+
+
+def test_expired_and_evicted_entries_are_misses(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), ttl=60, max_memory_entries=2, max_disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+    assert cache.stats()["memory_entries"] == 2
+    assert LLMCache(str(tmp_path / "cache.sqlite")).get("a") is None
+
+    now = time.time()
+    monkeypatch.setattr("llm_cache.time.time", lambda: now + 120)
+    assert cache.get("c") is None
+
+
+def test_llm_answers_repeated_prompts_from_the_cache(tmp_path, monkeypatch):
+    with fake_gemini(latency=0.0) as fake:
+        monkeypatch.setattr(gemini_agent, "LLM_CACHE_DISABLED", False)
+        monkeypatch.setattr(gemini_agent, "_cache", LLMCache(str(tmp_path / "cache.sqlite")))
+        first = gemini_agent.llm("You are a productivity coach.")
+        text, usage = gemini_agent.llm_with_usage("You are a   productivity coach. ")
+        assert text == first
+        assert usage == {"prompt_tokens": 0, "output_tokens": 0}
+        assert "".join(gemini_agent.llm_stream("You are a productivity coach.")) == first
+        assert fake.calls == 1
+        gemini_agent.llm("You are a productivity coach.", use_cache=False)
+        assert fake.calls == 2
@@ -0,0 +1,87 @@
+# tests/test_markdown.py
+from personality_engine import personalize_profile
+from tools import MarkdownBuilder
+from user_input import DEFAULT_PROFILE
+
+
+def _plan():
+    return dict(
+        prefs=dict(DEFAULT_PROFILE),
+        personality=personalize_profile(DEFAULT_PROFILE),
+        routine="07:00–07:30 Wake up\n08:00–09:00 Breakfast",
+        meals={"Monday": {"Breakfast": "Oats", "Lunch": "Dal", "Dinner": "Soup"}},
+        shopping=["Oats", "Lentils"],
+        tasks=["(1) Write report", "(2) Call bank"],
+        calendar={"events": ["2025-11-28 10:00 Standup"]},
+    )
+
+
+def test_sections_are_rendered_in_order():
+    md = MarkdownBuilder("MarkdownBuilder").build_markdown(**_plan())
+    headings = [line for line in md.splitlines() if line.startswith("## ")]
+    assert headings == [
+        "## 1. Personalized Profile Summary", "## 2. Daily Routine", "## 3. Weekly Meal Plan",
+        "## 4. Shopping List", "## 5. Optimized Tasks", "## 6. Calendar Schedule",
+    ]
+    assert "- **Breakfast**: Oats" in md and "- (2) Call bank" in md
+
+
+def test_only_sections_with_new_inputs_are_rerendered():
+    builder = MarkdownBuilder("MarkdownBuilder")
+    plan = _plan()
+    first = builder.build_markdown(**plan)
+    assert builder.rerendered == ["header", "meals", "shopping", "tasks", "calendar"]
+
+    assert builder.build_markdown(**plan) == first
+    assert builder.rerendered == []
+
+    plan["tasks"] = plan["tasks"] + ["(3) Book dentist"]
+    second = builder.build_markdown(**plan)
+    assert builder.rerendered == ["tasks"]
+    assert second == MarkdownBuilder("MarkdownBuilder").build_markdown(**plan)
+
+
+def test_equal_copies_are_reused():
+    builder = MarkdownBuilder("MarkdownBuilder")
+    plan = _plan()
+    builder.build_markdown(**plan)
+    plan["shopping"] = list(plan["shopping"])
+    plan["meals"] = {day: dict(meals) for day, meals in plan["meals"].items()}
+    builder.build_markdown(**plan)
+    assert builder.rerendered == []
+
+
+def test_inputs_edited_in_place_are_rerendered():
+    builder = MarkdownBuilder("MarkdownBuilder")
+    plan = _plan()
+    builder.build_markdown(**plan)
+    plan["tasks"].append("(3) Book dentist")
+    plan["meals"]["Monday"]["Dinner"] = "Stew"
+    plan["calendar"]["events"][0] = "2025-11-28 11:00 Standup"
+    md = builder.build_markdown(**plan)
+    assert builder.rerendered == ["meals", "tasks", "calendar"]
+    assert md == MarkdownBuilder("MarkdownBuilder").build_markdown(**plan)
+    assert "- (3) Book dentist" in md and "- **Dinner**: Stew" in md and "11:00 Standup" in md
+
+
+def test_version_stamps_decide_when_given():
+    builder = MarkdownBuilder("MarkdownBuilder")
+    plan = _plan()
+    builder.build_markdown(**plan, versions={"meals": 1})
+    plan["meals"] = dict(plan["meals"])
+    builder.build_markdown(**plan, versions={"meals": 1})
+    assert builder.rerendered == []
+    plan["meals"]["Tuesday"] = {"Breakfast": "Eggs", "Lunch": "Rice", "Dinner": "Stew"}
+    md = builder.build_markdown(**plan, versions={"meals": 2})
+    assert builder.rerendered == ["meals"]
+    assert "### Tuesday" in md
+
+
+def test_header_follows_profile_edits():
+    builder = MarkdownBuilder("MarkdownBuilder")
+    plan = _plan()
+    builder.build_markdown(**plan)
+    plan["prefs"]["name"] = "Robin"
+    md = builder.build_markdown(**plan)
+    assert builder.rerendered == ["header"]
+    assert md.startswith("# Agent LifeNavigator – Weekly Plan for Robin")
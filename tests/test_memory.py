@@ -0,0 +1,53 @@
+# tests/test_memory.py
+import multiprocessing
+import threading
+
+from memory import MemoryStore, user_key
+
+
+def _save_in_process(path, name):
+    MemoryStore(path).save_preferences({"name": name})
+
+
+def test_users_are_kept_apart_with_bounded_history():
+    store = MemoryStore("memory.db", history_limit=3)
+    for wake in range(5):
+        store.save_preferences({"name": "Sam", "wake_time": f"0{wake}:00"})
+    store.save_preferences({"user_id": "ada-1", "name": "Ada"})
+    assert store.load_preferences("Sam")["wake_time"] == "04:00"
+    assert [p["wake_time"] for p in store.history("Sam")] == ["04:00", "03:00", "02:00"]
+    assert store.load_preferences("ada-1") == {"user_id": "ada-1", "name": "Ada"}
+    assert store.load_preferences("nobody") is None
+    assert user_key({}) == "default"
+
+
+def test_concurrent_writers_lose_nothing():
+    store = MemoryStore("memory.db", history_limit=1000)
+    threads = [
+        threading.Thread(target=lambda i=i: [store.save_preferences({"name": f"user{i}", "n": n}) for n in range(10)])
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    processes = [multiprocessing.get_context("spawn").Process(target=_save_in_process, args=("memory.db", f"proc{i}")) for i in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(len(store.history(f"user{i}", limit=100)) == 10 for i in range(8))
+    assert all(store.load_preferences(f"proc{i}") == {"name": f"proc{i}"} for i in range(2))
+
+
+def test_failed_batch_leaves_nothing_behind():
+    store = MemoryStore("memory.db")
+    store.save_many([{"name": "Sam"}, {"name": "Ada", "bad": {1, 2}}])
+    assert store.load_preferences("Sam") is None
+
+
+def test_stage_outputs_round_trip():
+    store = MemoryStore("memory.db")
+    store.save_stage_outputs({"routine": {"fingerprint": "abc", "output": "07:00 Wake up"}}, "Sam")
+    assert store.load_stage_outputs("Sam") == {"routine": {"fingerprint": "abc", "output": "07:00 Wake up"}}
+    assert store.load_stage_outputs("Ada") == {}
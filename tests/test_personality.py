@@ -0,0 +1,51 @@
+# tests/test_personality.py
+import random
+
+import pytest
+
+from personality_engine import personalize_batch, personalize_profile, profile_columns
+
+
+def _profiles(count, seed=3):
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(count):
+        start = rng.randrange(0, 24)
+        profile = {
+            "wake_time": f"{rng.randrange(0, 24)}:{rng.choice(['00', '30'])}",
+            "work_start": f"{start:02d}:00",
+            "work_end": f"{(start + rng.randrange(0, 14)) % 24:02d}:30",
+            "wants_gym": rng.random() < 0.5,
+            "wants_learning": rng.random() < 0.5,
+            "wants_skincare": rng.random() < 0.5,
+            "avoid_ingredients": rng.choice([[], ["milk"], ["nuts", "soy"]]),
+        }
+        # Optional fields are left out of some profiles
+        if rng.random() < 0.8:
+            profile["diet_type"] = rng.choice(["balanced", "vegan", "vegetarian", "high-protein"])
+        if rng.random() < 0.8:
+            profile["budget_level"] = rng.choice(["low", "medium", "high"])
+        profiles.append(profile)
+    return profiles
+
+
+def test_batch_matches_row_by_row():
+    profiles = _profiles(500)
+    batch = personalize_batch(profile_columns(profiles))
+    assert len(batch) == len(profiles)
+    assert batch.to_dicts() == [personalize_profile(p) for p in profiles]
+    assert batch[7].to_dict() == personalize_profile(profiles[7])
+
+
+def test_numpy_columns_match_row_by_row():
+    np = pytest.importorskip("numpy")
+    profiles = _profiles(300, seed=11)
+    columns = {field: np.asarray(values) if field in ("wake_time", "work_start", "work_end", "wants_gym") else values
+               for field, values in profile_columns(profiles).items()}
+    assert personalize_batch(columns).to_dicts() == [personalize_profile(p) for p in profiles]
+
+
+def test_missing_optional_columns_take_defaults(profile):
+    batch = personalize_batch({field: [profile[field]] for field in ("wake_time", "work_start", "work_end")})
+    record = batch[0].to_dict()
+    assert (record["diet_type"], record["budget_level"], record["fitness_level"]) == ("balanced", "medium", "low_activity")
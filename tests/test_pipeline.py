@@ -0,0 +1,57 @@
+# tests/test_pipeline.py
+import threading
+
+import pytest
+
+from pipeline import Stage, StageGraph
+
+
+def test_independent_stages_run_concurrently():
+    # Each of the three stages waits for the other two; run back to back they would time out
+    barrier = threading.Barrier(3, timeout=5)
+
+    def stage(name):
+        barrier.wait()
+        return name
+
+    graph = StageGraph([
+        Stage("routine", lambda: stage("routine")),
+        Stage("meals", lambda: stage("meals")),
+        Stage("tasks", lambda: stage("tasks")),
+        Stage("markdown", lambda routine, meals, tasks: f"{routine}+{meals}+{tasks}", inputs=["routine", "meals", "tasks"]),
+    ])
+    results = graph.run()
+    assert results["markdown"] == "routine+meals+tasks"
+    assert set(graph.timings) == {"routine", "meals", "tasks", "markdown"}
+
+
+def test_precomputed_stages_are_not_run():
+    calls = []
+    graph = StageGraph([
+        Stage("routine", lambda: calls.append("routine") or "fresh"),
+        Stage("calendar", lambda routine: routine.upper(), inputs=["routine"]),
+    ])
+    assert graph.run(precomputed={"routine": "stored"})["calendar"] == "STORED"
+    assert calls == [] and "routine" not in graph.timings
+
+
+def test_bad_graphs_are_rejected_up_front():
+    with pytest.raises(ValueError, match="unknown stage"):
+        StageGraph([Stage("calendar", lambda routine: routine, inputs=["routine"])])
+    with pytest.raises(ValueError, match="Cycle"):
+        StageGraph([Stage("a", lambda b: b, inputs=["b"]), Stage("b", lambda a: a, inputs=["a"])])
+
+
+def test_stage_errors_reach_the_caller():
+    def broken():
+        raise RuntimeError("no routine")
+
+    with pytest.raises(RuntimeError, match="no routine"):
+        StageGraph([Stage("routine", broken)]).run()
+
+
+def test_offline_pipeline_runs_every_stage(orchestrator_factory):
+    orchestrator = orchestrator_factory()
+    markdown = orchestrator.run_full_pipeline()
+    assert markdown.startswith("#")
+    assert {"routine", "meals", "tasks", "calendar", "schedule", "markdown"} <= set(orchestrator.stage_timings)
@@ -0,0 +1,85 @@
+# tests/test_recipes.py
+import pytest
+
+import recipes
+from recipes import INGREDIENT_GROUPS, RecipeCatalog, default_catalog, restricted_terms
+from templates import _restriction_pattern, filter_meals
+
+DAIRY = {i for i, group in INGREDIENT_GROUPS.items() if group == "dairy"}
+# Restricting all of these leaves no breakfast in the catalog
+BREAKFAST_INGREDIENTS = sorted(set().union(*(r.ingredients for r in default_catalog().recipes if r.meal == "Breakfast")))
+
+
+def _ingredients(catalog, recipe_ids):
+    return set().union(*(catalog.recipes[i].ingredients for i in recipe_ids)) if recipe_ids else set()
+
+
+def test_milk_restriction_rules_out_all_dairy():
+    assert DAIRY <= restricted_terms(["milk"])
+    catalog = default_catalog()
+    allowed = catalog.allowed("balanced", ["Milk"])
+    assert not _ingredients(catalog, allowed) & DAIRY
+    # Plant milks are not dairy
+    assert "oat milk" in _ingredients(catalog, allowed)
+
+
+@pytest.mark.parametrize("restrictions", [["milk"], ["dairy"], ["peanut"], ["egg"], ["nuts"], ["gluten", "fish"]])
+def test_catalog_and_template_paths_filter_alike(restrictions):
+    catalog = default_catalog()
+    pattern = _restriction_pattern(restrictions)
+    excluded = catalog.excluded(restrictions)
+    for recipe in catalog.recipes:
+        mentions = any(pattern.fullmatch(ingredient) for ingredient in recipe.ingredients)
+        assert (recipe.id in excluded) == mentions, recipe.name
+
+
+def test_plural_and_group_terms():
+    assert {"egg", "eggs"} <= restricted_terms(["egg"])
+    assert {"peanuts", "almonds", "peanut butter"} <= restricted_terms(["nut"])
+    assert restricted_terms(["", "  "]) == set()
+
+
+def test_week_plan_respects_diet_and_restrictions():
+    catalog = default_catalog()
+    meals, shopping = catalog.plan_week("vegan", "low", ["soy"])
+    assert set(meals) == {"Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"}
+    chosen = {r.name: r for r in catalog.recipes}
+    for day in meals.values():
+        for dish in day.values():
+            recipe = chosen[dish]
+            assert "vegan" in recipe.tags and "soy" not in recipe.tags
+    assert shopping == sorted(shopping)
+
+
+def test_history_steers_away_from_recent_dishes():
+    catalog = RecipeCatalog()
+    first, _ = catalog.plan_week()
+    used = {dish: 3 for day in first.values() for dish in day.values()}
+    second, _ = catalog.plan_week(history=used)
+    assert {d for day in second.values() for d in day.values()} != set(used)
+
+
+@pytest.mark.parametrize("diet_type, budget_level, restrictions", [
+    ("balanced", "medium", []),
+    ("vegan", "low", ["soy"]),
+    ("high-protein", "high", ["dairy"]),
+    ("vegetarian", "low", ["eggs", "gluten"]),
+    ("balanced", "medium", BREAKFAST_INGREDIENTS),
+])
+def test_numpy_and_pure_python_scoring_pick_the_same_recipes(monkeypatch, diet_type, budget_level, restrictions):
+    history = {"Vegetable poha": 2, "Lentil soup with bread": 1}
+    vectorised = RecipeCatalog()
+    assert vectorised._np is not None
+    monkeypatch.setattr(recipes, "_np", None)
+    scalar = RecipeCatalog()
+    assert scalar._np is None
+    for kwargs in ({}, {"history": history}):
+        assert scalar.plan_week(diet_type, budget_level, restrictions, **kwargs) == \
+            vectorised.plan_week(diet_type, budget_level, restrictions, **kwargs)
+
+
+def test_template_meals_swap_restricted_dishes():
+    text = "Monday:\n- Breakfast: Greek yogurt parfait\n- Lunch: Lentil soup\n- Dinner: Cheese pasta bake"
+    filtered = filter_meals(text, {"restrictions": ["milk"], "diet_type": "balanced", "budget_level": "medium"})
+    assert "yogurt" not in filtered.lower() and "cheese" not in filtered.lower()
+    assert "- Lunch: Lentil soup" in filtered
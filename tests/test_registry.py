@@ -0,0 +1,57 @@
+# tests/test_registry.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+import registry
+from conftest import ROOT
+from tools import MealPlanner
+
+
+class QuietMealPlanner(MealPlanner):
+    pass
+
+
+@pytest.fixture
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(registry, "_components", dict(registry._components))
+    monkeypatch.setattr(registry, "_classes", {})
+
+
+def test_registered_component_replaces_the_default(fresh_registry, orchestrator_factory):
+    registry.register("meal_planner", f"{__name__}:QuietMealPlanner", "Meals")
+    orchestrator = orchestrator_factory()
+    planner = orchestrator.meal_planner
+    assert isinstance(planner, QuietMealPlanner) and planner.name == "Meals"
+    # Built once per orchestrator, on first use
+    assert orchestrator.meal_planner is planner
+    assert orchestrator_factory().meal_planner is not planner
+
+
+def test_bad_specs_and_roles_are_rejected(fresh_registry):
+    with pytest.raises(ValueError):
+        registry.register("meal_planner", "tools.MealPlanner")
+    with pytest.raises(ValueError):
+        registry._load_plugins("meal_planner")
+    with pytest.raises(KeyError):
+        registry.resolve("weather_agent")
+    registry._load_plugins(" meal_planner = tools:MealPlanner , ")
+    assert registry.resolve("meal_planner") is MealPlanner
+
+
+def test_offline_plan_never_loads_the_gemini_sdk(tmp_path):
+    script = (
+        "import sys\n"
+        "from agents import OrchestratorAgent\n"
+        "from personality_engine import personalize_profile\n"
+        "from user_input import DEFAULT_PROFILE\n"
+        "OrchestratorAgent(user_prefs=DEFAULT_PROFILE, personality=personalize_profile(DEFAULT_PROFILE),"
+        " persist_memory=False, deadline=None).run_full_pipeline()\n"
+        "print('google.generativeai' in sys.modules)\n"
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "False"
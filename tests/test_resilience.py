@@ -0,0 +1,135 @@
+# tests/test_resilience.py
+import threading
+import time
+
+from resilience import CallPool, CircuitBreaker, Deadline, with_fallback
+
+
+def _opened(reset_timeout=0.0):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    return breaker
+
+
+def _offline():
+    return "offline"
+
+
+def test_breaker_opens_after_threshold_and_closes_on_trial_success():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert with_fallback(lambda: "llm", _offline, None, breaker) == ("offline", "circuit open")
+
+    breaker.reset_timeout = 0
+    assert with_fallback(lambda: "llm", _offline, None, breaker) == ("llm", None)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_no_budget_does_not_take_the_half_open_trial():
+    breaker = _opened()
+    assert with_fallback(lambda: "llm", _offline, 0.0, breaker) == ("offline", "no budget left")
+    assert breaker.state == CircuitBreaker.OPEN
+    # The next call with budget left gets the trial and closes the breaker
+    assert with_fallback(lambda: "llm", _offline, 5.0, breaker) == ("llm", None)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_deadline_timeout_is_not_a_failure_and_frees_the_trial():
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return "llm"
+
+    breaker = _opened()
+    result, reason = with_fallback(slow, _offline, 0.01, breaker)
+    assert result == "offline" and reason.startswith("timed out")
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.failures == 1
+    # Not stuck half-open: another trial is allowed once reset_timeout passes
+    assert breaker.allow()
+
+    # The abandoned call reports its own outcome when it finishes
+    release.set()
+    for _ in range(100):
+        if breaker.state == CircuitBreaker.CLOSED:
+            break
+        time.sleep(0.01)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_timeout_in_closed_state_does_not_count_towards_opening():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    release = threading.Event()
+    with_fallback(lambda: release.wait(5), _offline, 0.01, breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+    release.set()
+
+
+def test_too_many_abandoned_calls_open_the_breaker_until_they_finish():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0.0, max_abandoned=2)
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "llm"
+
+    for _ in range(2):
+        assert with_fallback(slow, _offline, 0.01, breaker)[1].startswith("timed out")
+    assert breaker.state == CircuitBreaker.OPEN and breaker.abandoned == 2
+    # Even past reset_timeout, nothing more is started while both are stuck
+    assert with_fallback(slow, _offline, 0.01, breaker) == ("offline", "circuit open")
+    assert len(calls) == 2
+
+    release.set()
+    for _ in range(100):
+        if breaker.abandoned == 0:
+            break
+        time.sleep(0.01)
+    assert breaker.abandoned == 0 and breaker.state == CircuitBreaker.CLOSED
+    assert with_fallback(lambda: "llm", _offline, 1.0, breaker) == ("llm", None)
+
+
+def test_guarded_calls_share_a_bounded_pool():
+    pool = CallPool(2)
+    release = threading.Event()
+    running, most = [], []
+
+    def call(i):
+        running.append(i)
+        most.append(len(running))
+        release.wait(5)
+        running.remove(i)
+        return i
+
+    futures = [pool.submit(lambda i=i: call(i)) for i in range(5)]
+    time.sleep(0.05)
+    assert sorted(running) == [0, 1] and not any(f.done() for f in futures)
+    release.set()
+    assert [f.result(timeout=5) for f in futures] == [0, 1, 2, 3, 4]
+    assert max(most) == 2
+    # Idle workers are reused rather than new threads started
+    assert pool.submit(lambda: "again").result(timeout=5) == "again" and pool._threads == 2
+
+
+def test_llm_error_counts_as_failure():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+    def broken():
+        raise RuntimeError("503")
+
+    assert with_fallback(broken, _offline, 1.0, breaker) == ("offline", "RuntimeError: 503")
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_deadline_remaining_keeps_the_reserve():
+    deadline = Deadline(10.0)
+    assert 9.0 < deadline.remaining() <= 10.0
+    assert deadline.remaining(reserve=9.5) <= 0.5
+    assert deadline.remaining(reserve=20.0) == 0.0
+    assert Deadline(0.0).expired()
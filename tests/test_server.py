@@ -0,0 +1,96 @@
+# tests/test_server.py
+import asyncio
+import json
+import threading
+
+import pytest
+
+from archive import PlanArchive
+from server import HTTPError, PlanServer
+
+
+def _request(server: PlanServer, method: str, target: str, body: dict | None = None) -> tuple:
+    """Send one request to a running server; returns (status, headers, body, trailers)."""
+
+    async def go():
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            payload = json.dumps(body).encode("utf-8") if body is not None else b""
+            writer.write(f"{method} {target} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload)
+            await writer.drain()
+            raw = await reader.read()
+            writer.close()
+            return raw
+
+    head, _, rest = asyncio.run(go()).partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    trailers = {}
+    if headers.get("Transfer-Encoding") == "chunked":
+        content = b""
+        while True:
+            size, _, rest = rest.partition(b"\r\n")
+            if int(size, 16) == 0:
+                break
+            content, rest = content + rest[:int(size, 16)], rest[int(size, 16) + 2:]
+        trailers = dict(line.split(": ", 1) for line in rest.decode("latin-1").split("\r\n") if line)
+    else:
+        content = rest
+    return int(lines[0].split()[1]), headers, content, trailers
+
+
+def test_bad_clock_field_is_a_400_naming_the_field():
+    status, _, body, _ = _request(PlanServer(deadline=None), "POST", "/plan", {"wake_time": "xx"})
+    assert status == 400
+    assert "wake_time" in json.loads(body)["error"]
+    status, _, body, _ = _request(PlanServer(deadline=None), "POST", "/plan", {"work_end": 17})
+    assert status == 400 and "work_end" in json.loads(body)["error"]
+
+
+def test_plan_with_short_hours_is_accepted():
+    status, _, body, _ = _request(PlanServer(deadline=None), "POST", "/plan", {"wake_time": "6:30"})
+    assert status == 200 and body.startswith(b"#")
+
+
+def test_streamed_plan_carries_its_archive_id_as_a_trailer(tmp_path):
+    archive = PlanArchive(str(tmp_path / "archive"))
+    server = PlanServer(deadline=None, archive=archive)
+    status, headers, streamed, trailers = _request(server, "POST", "/plan?stream=1", {"name": "Sam"})
+    assert status == 200
+    assert headers["Trailer"] == "X-Plan-Id"
+    plan_id = int(trailers["X-Plan-Id"])
+    assert archive.get(plan_id) == streamed.decode("utf-8")
+
+    status, headers, whole, _ = _request(server, "POST", "/plan", {"name": "Sam"})
+    assert status == 200 and int(headers["X-Plan-Id"]) != plan_id
+
+
+def test_identical_requests_share_one_run_and_overflow_is_refused(profile, monkeypatch):
+    release = threading.Event()
+    runs = []
+
+    def slow_plan(self, prefs, use_llm, sink):
+        runs.append(prefs["name"])
+        release.wait(5)
+        return "# Plan\n"
+
+    monkeypatch.setattr(PlanServer, "_plan", slow_plan)
+    server = PlanServer(max_pipelines=1, max_queue=0, deadline=None)
+
+    async def go():
+        first, coalesced_first = server.join(profile, False, False)
+        second, coalesced_second = server.join(dict(profile), False, False)
+        with pytest.raises(HTTPError) as refused:
+            server.join(dict(profile, name="Ada"), False, False)
+        assert refused.value.status == 503
+        release.set()
+        async for _ in first.read():
+            pass
+        return first, second, coalesced_first, coalesced_second
+
+    first, second, coalesced_first, coalesced_second = asyncio.run(go())
+    assert second is first and (coalesced_first, coalesced_second) == (False, True)
+    assert runs == [profile["name"]] and first.chunks == [b"# Plan\n"]
+    assert server.stats["coalesced"] == 1 and server.stats["rejected"] == 1
@@ -0,0 +1,69 @@
+# tests/test_streaming.py
+import io
+import threading
+
+import pytest
+
+from fake_gemini import fake_gemini
+from pipeline import OrderedStreamWriter
+
+
+class _Sink(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.flushes = []
+
+    def flush(self):
+        self.flushes.append(self.getvalue())
+
+
+def test_sections_come_out_in_order_as_soon_as_they_can():
+    sink = _Sink()
+    writer = OrderedStreamWriter(sink, ["header", "routine", "meals"])
+    writer.write("meals", "M1 ")
+    writer.write("header", "H ")
+    assert sink.getvalue() == "H "
+    writer.close("header")
+    writer.write("routine", "R ")
+    assert sink.getvalue() == "H R "
+    writer.write("meals", "M2 ")
+    writer.close("meals")
+    assert sink.getvalue() == "H R "
+    writer.close("routine")
+    assert sink.getvalue() == "H R M1 M2 "
+
+
+@pytest.mark.parametrize("use_llm", [False, True])
+def test_streamed_plan_equals_the_whole_plan(orchestrator_factory, use_llm):
+    with fake_gemini(latency=0.0):
+        whole = orchestrator_factory(use_llm=use_llm).run_full_pipeline()
+        sink = _Sink()
+        orchestrator_factory(use_llm=use_llm).stream_pipeline(sink)
+    assert sink.getvalue() == whole
+    # Written in more than one piece, not all at the end
+    assert len(sink.flushes) > 1 and sink.flushes[0] != whole
+
+
+def test_chunks_sent_during_the_fallback_are_dropped(orchestrator_factory, monkeypatch):
+    offline_started, late_sent = threading.Event(), threading.Event()
+    orchestrator = orchestrator_factory(use_llm=True, deadline=0.2)
+    real = orchestrator.routine_agent.generate
+
+    def generate(prefs, personality, use_llm, on_chunk=None, problems=None):
+        if not use_llm:
+            offline_started.set()
+            # The abandoned stream keeps going while the offline routine is made
+            late_sent.wait(2)
+            return real(prefs, personality, False)
+        on_chunk("EARLY ")
+        offline_started.wait(2)
+        on_chunk("LATE ")
+        late_sent.set()
+        return "never used"
+
+    monkeypatch.setattr(orchestrator.routine_agent, "generate", generate)
+    sink = _Sink()
+    with fake_gemini(latency=0.0):
+        orchestrator.stream_pipeline(sink)
+    assert late_sent.is_set() and orchestrator.fallbacks["routine"].startswith("timed out")
+    assert "EARLY " in sink.getvalue() and "LATE " not in sink.getvalue()
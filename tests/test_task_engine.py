@@ -0,0 +1,86 @@
+# tests/test_task_engine.py
+from datetime import date, datetime, timedelta
+
+from calendar_engine import CalendarIndex
+from task_engine import Task, load_tasks, parse_task_lines, prioritize, schedule_tasks
+
+MONDAY = date(2025, 12, 1)
+PREFS = {"wake_time": "08:00", "sleep_time": "22:00"}
+
+
+def _minutes(scheduled, title):
+    return sum((s.end - s.start) // timedelta(minutes=1) for s in scheduled if s.task.title == title)
+
+
+def test_prioritize_by_deadline_then_priority_then_difficulty():
+    tasks = [
+        Task("later", 1),
+        Task("due soon", 3, deadline=date(2025, 12, 3)),
+        Task("easy", 2, difficulty=1),
+        Task("hard", 2, difficulty=3),
+    ]
+    assert [t.title for t in prioritize(tasks)] == ["due soon", "later", "hard", "easy"]
+
+
+def test_parse_task_lines_keeps_known_details():
+    known = load_tasks(None)
+    tasks = parse_task_lines("- (1) Update resume\n* (P3) Water plants\nnot a task", known)
+    assert [(t.title, t.priority) for t in tasks] == [("Update resume", 1), ("Water plants", 3)]
+    assert tasks[0].duration == 90
+
+
+def test_slot_energy_follows_its_remaining_start():
+    # Free 08:00-12:00 and 15:00-16:00. After an easy task takes 08:00-09:00,
+    # the rest of the morning slot starts in the regular riser's peak.
+    index = CalendarIndex()
+    index.add_routine("12:00–15:00 Lunch and errands\n16:00–22:00 Evening", MONDAY, 1)
+    tasks = [Task("easy", 1, duration=60, difficulty=1), Task("hard", 2, duration=60, difficulty=3)]
+    scheduled, unscheduled = schedule_tasks(
+        tasks, index, MONDAY, 1, {"sleep_type": "regular_riser", "work_style": "light_worker"}, PREFS
+    )
+    assert not unscheduled
+    starts = {s.task.title: s.start for s in scheduled}
+    assert starts["easy"] == datetime(2025, 12, 1, 8)
+    assert starts["hard"] == datetime(2025, 12, 1, 9)
+
+
+def test_task_longer_than_a_day_is_split_over_days():
+    task = Task("Thesis chapter", 1, duration=300, difficulty=3)
+    scheduled, unscheduled = schedule_tasks(
+        [task], CalendarIndex(), MONDAY, 7, {"work_style": "balanced_worker"}, PREFS
+    )
+    assert not unscheduled
+    assert [(s.start.date(), s.part, s.parts) for s in scheduled] == [
+        (MONDAY, 1, 3), (MONDAY + timedelta(days=1), 2, 3), (MONDAY + timedelta(days=2), 3, 3)
+    ]
+    assert _minutes(scheduled, "Thesis chapter") == 300
+    assert "[session 1/3]" in str(scheduled[0])
+
+
+def test_remainder_that_does_not_fit_is_carried():
+    task = Task("Big project", 1, duration=200)
+    scheduled, unscheduled = schedule_tasks(
+        [task], CalendarIndex(), MONDAY, 2, {"work_style": "heavy_worker"}, PREFS
+    )
+    assert _minutes(scheduled, "Big project") == 120
+    assert [(t.title, t.duration) for t in unscheduled] == [("Big project", 80)]
+
+
+def test_deadline_limits_the_days_used():
+    task = Task("Report", 1, deadline=MONDAY, duration=180)
+    scheduled, unscheduled = schedule_tasks(
+        [task], CalendarIndex(), MONDAY, 7, {"work_style": "balanced_worker"}, PREFS
+    )
+    assert {s.start.date() for s in scheduled} == {MONDAY}
+    assert unscheduled[0].duration == 60
+
+
+def test_long_task_is_finished_over_a_multi_week_plan(orchestrator_factory, profile):
+    profile["tasks"] = [{"title": "Write thesis", "priority": 1, "duration": 1200, "difficulty": "high"}]
+    orchestrator = orchestrator_factory(profile)
+    placed = 0
+    weeks = list(orchestrator.iter_weeks(4, start_date=MONDAY))
+    for week in weeks:
+        placed += _minutes(week.schedule["scheduled"], "Write thesis")
+    assert placed == 1200
+    assert not weeks[-1].carried
@@ -0,0 +1,84 @@
+# tests/test_templates.py
+import pytest
+
+import gemini_agent
+import templates
+from fake_gemini import fake_gemini
+from llm_cache import LLMCache
+from personality_engine import personalize_profile
+from templates import SECTIONS, TemplateStore, archetype, archetypes, representative_profile, shift_times
+
+
+@pytest.mark.parametrize("section", SECTIONS)
+def test_every_representative_profile_lands_on_its_archetype(section):
+    for key in archetypes(section):
+        assert archetype(section, personalize_profile(representative_profile(section, key))) == key
+
+
+def test_shift_times_moves_anchors_and_interpolates():
+    source = {"wake_time": "07:00", "work_start": "09:00", "work_end": "17:00", "sleep_time": "23:00"}
+    target = {"wake_time": "06:00", "work_start": "08:00", "work_end": "14:00", "sleep_time": "22:00"}
+    assert shift_times("07:00 Wake\n09:00–17:00 Work\n13:00 Lunch\n23:00 Sleep", source, target) == (
+        "06:00 Wake\n08:00–14:00 Work\n11:00 Lunch\n22:00 Sleep"
+    )
+    assert shift_times("07:00 Wake", source, dict(target, work_end="07:00")) is None
+
+
+@pytest.fixture
+def warm_store(tmp_path, monkeypatch):
+    store = TemplateStore(str(tmp_path / "templates.sqlite"), max_age=0)
+    monkeypatch.setattr(templates, "_store", store)
+    with fake_gemini(latency=0.0) as fake:
+        assert store.warm(workers=2) == {"generated": 72 + 12 + 36, "skipped": 0, "failed": 0}
+        yield store, fake
+
+
+def test_warm_up_fills_every_archetype_once(warm_store):
+    store, fake = warm_store
+    calls = fake.calls
+    assert all(counts["stale"] == counts["missing"] == 0 for counts in store.status().values())
+    assert store.warm() == {"generated": 0, "skipped": 120, "failed": 0}
+    assert fake.calls == calls
+
+
+def test_forced_warm_up_skips_the_cache_without_turning_it_off(tmp_path, monkeypatch):
+    with fake_gemini(latency=0.0) as fake:
+        monkeypatch.setattr(gemini_agent, "LLM_CACHE_DISABLED", False)
+        monkeypatch.setattr(gemini_agent, "_cache", LLMCache(str(tmp_path / "cache.sqlite")))
+        TemplateStore(str(tmp_path / "first.sqlite")).warm(["meals"])
+        assert fake.calls == 12
+        # Other plans keep using the cache while a forced warm-up runs
+        TemplateStore(str(tmp_path / "second.sqlite")).warm(["meals"])
+        assert fake.calls == 12
+        answer = gemini_agent.llm("You are a productivity coach.")
+        real = templates._generate
+
+        def generate(section, prefs, use_cache=True):
+            assert gemini_agent.llm("You are a productivity coach.") == answer
+            return real(section, prefs, use_cache)
+
+        monkeypatch.setattr(templates, "_generate", generate)
+        calls = fake.calls
+        counts = TemplateStore(str(tmp_path / "second.sqlite")).warm(["meals"], force=True)
+        assert counts["generated"] == 12 and fake.calls == calls + 12 and not gemini_agent.LLM_CACHE_DISABLED
+
+
+def test_users_are_served_from_their_archetype(warm_store, orchestrator_factory, profile):
+    _, fake = warm_store
+    calls = fake.calls
+    prefs = dict(profile, name="Sam", wake_time="06:30", avoid_ingredients=["oats"])
+    orchestrator = orchestrator_factory(prefs, use_llm=True, use_templates=True)
+    markdown = orchestrator.run_full_pipeline()
+    assert fake.calls == calls
+    assert "Sam" in markdown
+    # The template's wake-up time is moved onto the user's
+    assert orchestrator._templated["routine"].splitlines()[0].lstrip("- ").startswith("06:30")
+    meals, _ = orchestrator._templated["meals"]
+    # Dishes with a restricted ingredient are swapped for the catalog's
+    assert not any("oats" in str(text).lower() for text in meals.values())
+
+
+def test_custom_task_lists_are_not_templated(warm_store, profile):
+    store, _ = warm_store
+    prefs = dict(profile, tasks=["Water the plants"])
+    assert store.render("tasks", prefs, personalize_profile(prefs)) is None
@@ -0,0 +1,58 @@
+# tests/test_tracing.py
+import json
+
+import pytest
+
+import tracing
+from fake_gemini import fake_gemini
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracing._collector.reset()
+    tracing.enable(str(path))
+    yield path
+    tracing.disable()
+    tracing._collector.reset()
+
+
+def test_disabled_tracing_is_a_no_op():
+    assert not tracing.is_enabled()
+    assert tracing.span("anything") is tracing.NOOP_SPAN
+    tracing.annotate(ignored=True)
+
+
+def test_llm_spans_nest_under_their_stage(trace_file, orchestrator_factory):
+    with fake_gemini(latency=0.0):
+        orchestrator_factory(use_llm=True).run_full_pipeline()
+    spans = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    by_id = {s["span_id"]: s for s in spans}
+    root = next(s for s in spans if s["name"] == "Orchestrator.run_full_pipeline")
+    assert root["parent_id"] is None
+    assert {s["trace_id"] for s in spans} == {root["span_id"]}
+
+    stages = {s["attributes"]["stage"] for s in spans if s["name"].startswith("stage.")}
+    assert {"routine", "meals", "tasks", "calendar", "schedule", "markdown"} <= stages
+    llm_spans = [s for s in spans if s["name"] == "llm"]
+    assert {s["attributes"]["stage"] for s in llm_spans} == {"routine", "meals", "tasks"}
+    for s in llm_spans:
+        assert s["attributes"]["prompt_tokens"] > 0
+        # Walk up to the stage span the call ran under
+        parent = by_id[s["parent_id"]]
+        while not parent["name"].startswith("stage."):
+            parent = by_id[parent["parent_id"]]
+        assert parent["attributes"]["stage"] == s["attributes"]["stage"]
+
+
+def test_metrics_count_tokens_and_fallbacks(trace_file, orchestrator_factory, monkeypatch):
+    monkeypatch.setattr("rate_limit.time.sleep", lambda seconds: None)
+    with fake_gemini(latency=0.0, error_rate=1.0):
+        orchestrator_factory(use_llm=True).run_full_pipeline()
+    text = tracing.prometheus_text()
+    assert 'lifenavigator_fallbacks_total{stage="meals"} 1' in text
+    assert 'lifenavigator_span_duration_seconds_count{span="llm"}' in text
+    assert 'lifenavigator_span_errors_total{span="llm"}' in text
+
+    tracing.write_metrics(str(trace_file.parent / "metrics.prom"))
+    assert (trace_file.parent / "metrics.prom").read_text() == text
@@ -0,0 +1,32 @@
+# tests/test_validation.py
+from tools import CalendarManager
+from validation import calendar_problems, routine_problems, section_problems
+
+ROUTINE = "07:00–07:30 Morning hygiene\n09:00–17:00 Work\n18:00–19:00 Gym\n23:00 Wind down"
+
+
+def test_routine_overlaps_are_reported():
+    assert routine_problems(ROUTINE) == []
+    problems = routine_problems(ROUTINE + "\n18:30–19:30 Study")
+    assert len(problems) == 1 and "overlaps" in problems[0]
+
+
+def test_calendar_conflicts_are_problems():
+    assert calendar_problems({"routine": ROUTINE, "conflicts": []}) == []
+    assert calendar_problems({"routine": "", "conflicts": ["a ⟷ b"]}) == [
+        "no routine in the merged schedule", "conflict: a ⟷ b"
+    ]
+
+
+def test_orchestrator_checks_the_merged_calendar(orchestrator_factory, monkeypatch):
+    monkeypatch.setattr(CalendarManager, "DEFAULT_EVENTS", ["2025-11-28 18:00 Dentist (Clinic)"])
+    orchestrator = orchestrator_factory()
+    calendar = orchestrator._calendar(ROUTINE)
+    assert section_problems("calendar", calendar) == orchestrator.conflicts
+    assert len(orchestrator.conflicts) == 1 and "Dentist" in orchestrator.conflicts[0]
+
+    # A full run starts with a clean slate and records what its own calendar has
+    orchestrator.run_full_pipeline()
+    assert orchestrator.conflicts == section_problems("calendar", orchestrator.calendar_manager.merge_with_events(
+        orchestrator._routine()
+    ))
@@ -1,6 +1,18 @@
 # tools.py
-from typing import Dict, List, Tuple, Union
+import io
+from datetime import date, timedelta
+from typing import IO, Any, Callable, Dict, List, Tuple, Union
+from calendar_engine import CalendarIndex, IcsCalendar, Interval, load_ics, parse_event
 from gemini_agent import llm
+from horizon import WeekPlan
+from personality_engine import stage_context
+from recipes import default_catalog
+from task_engine import Task, load_tasks, parse_task_lines, prioritize, schedule_tasks
+from tracing import current_span, traced
+from validation import repair_note
+
+# Key used for the single free-text block in an LLM-generated meal plan
+LLM_MEAL_PLAN_KEY = "LLM-Generated Weekly Meal Plan"
 
 
 class BaseTool:
@@ -9,6 +21,7 @@ class BaseTool:
 
     def log(self, message: str):
         print(f"[{self.name}] {message}")
+        current_span().event(message)
 
 
 class MealPlanner(BaseTool):
@@ -17,23 +30,33 @@ class MealPlanner(BaseTool):
     Can use Gemini for highly personalized plans or fallback to rule-based.
     """
 
+    @traced
     def generate_meal_plan(
         self,
         prefs: dict,
         personality: dict,
-        use_llm: bool = False
+        use_llm: bool = False,
+        on_chunk: Callable[[str], None] | None = None,
+        problems: List[str] | None = None,
+        history: Dict[str, int] | None = None,
+        use_cache: bool = True
     ) -> Tuple[Dict[str, Union[str, Dict[str, str]]], List[str]]:
+        """
+        `history` maps dishes served in recent weeks to how often, so a
+        multi-week plan does not repeat itself (see horizon.py).
+        """
         self.log("Generating weekly meal plan...")
 
         if use_llm:
+            context = stage_context("meals", prefs, personality)
             prompt = f"""
 You are a nutritionist and meal planning expert.
 
 User profile:
-{prefs}
+{context["prefs"]}
 
 Behavioral profile:
-{personality}
+{context["personality"]}
 
 Task:
 Create a 7-day meal plan (Breakfast, Lunch, Dinner).
@@ -55,37 +78,31 @@ Tuesday:
 
 Return only the plan in plain text.
             """
-            plan_text = llm(prompt)
-            meals = {"LLM-Generated Weekly Meal Plan": plan_text}
+            if history:
+                recent = sorted(history, key=history.get, reverse=True)
+                prompt += f"\nFor variety, avoid these dishes from recent weeks: {', '.join(recent)}\n"
+            # A re-request after a failed validation says what to fix
+            prompt += repair_note(problems)
+            plan_text = llm(prompt, use_cache=use_cache, on_chunk=on_chunk)
+            meals = {LLM_MEAL_PLAN_KEY: plan_text}
+            # Shopping list (can be improved / LLM-generated later)
+            shopping_list = [
+                "Oats",
+                "Rice",
+                "Lentils",
+                "Mixed vegetables",
+                "Fruits",
+                "Cooking oil",
+                "Spices"
+            ]
         else:
-            # Simple rule-based fallback
-            default_breakfast = "Oatmeal with fruits"
-            if "milk" in personality.get("restrictions", []):
-                default_breakfast = "Oatmeal with plant-based milk and fruits"
-
-            base_meal = {
-                "Breakfast": default_breakfast,
-                "Lunch": "Grilled chicken with veggies"
-                if personality.get("diet_type") != "vegetarian"
-                else "Paneer / tofu with veggies",
-                "Dinner": "Rice, lentils, and salad"
-            }
-
-            meals = {
-                day: base_meal
-                for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-            }
-
-        # Shopping list (can be improved / LLM-generated later)
-        shopping_list = [
-            "Oats",
-            "Rice",
-            "Lentils",
-            "Mixed vegetables",
-            "Fruits",
-            "Cooking oil",
-            "Spices"
-        ]
+            # Rule-based: score the local recipe catalog, shopping list from the chosen meals
+            meals, shopping_list = default_catalog().plan_week(
+                diet_type=personality.get("diet_type", "balanced"),
+                budget_level=personality.get("budget_level", "medium"),
+                restrictions=personality.get("restrictions", []),
+                history=history
+            )
 
         return meals, shopping_list
 
@@ -95,127 +112,336 @@ class TaskOptimizer(BaseTool):
     Orders and enhances tasks based on user profile.
     """
 
+    @traced
     def optimize_tasks(
         self,
         prefs: dict,
         personality: dict,
-        use_llm: bool = False
-    ) -> Union[List[str], str]:
+        use_llm: bool = False,
+        problems: List[str] | None = None,
+        use_cache: bool = True
+    ) -> List[Task]:
         self.log("Optimizing tasks...")
 
-        base_tasks = [
-            "Pay electricity bill",
-            "Update resume",
-            "Deep clean kitchen",
-            "Call parents",
-            "Read 20 pages of a book"
-        ]
+        base_tasks = load_tasks(prefs.get("tasks"))
 
         if use_llm:
+            context = stage_context("tasks", prefs, personality)
             prompt = f"""
 You are a productivity coach.
 
 Given this user profile:
-{prefs}
+{context["prefs"]}
 
 And behavior profile:
-{personality}
+{context["personality"]}
 
 Reorder and enhance the following tasks.
 - Add priorities (1 = highest).
 - Suggest 1–2 extra personalized tasks if relevant.
 
 Tasks:
-{base_tasks}
+{[t.title for t in base_tasks]}
 
 Return output in bullet list format with (priority) Task.
             """
-            return llm(prompt)
+            prompt += repair_note(problems)
+            parsed = parse_task_lines(llm(prompt, use_cache=use_cache), base_tasks)
+            if parsed:
+                return prioritize(parsed)
+            self.log("Could not parse LLM task list, using rule-based ordering")
+
+        # Deadline / priority ordering (rule-based)
+        return prioritize(base_tasks)
+
+    @traced
+    def schedule_tasks(self, tasks: List[Task], calendar: dict, prefs: dict, personality: dict) -> dict:
+        """Pack tasks into the free time of the merged calendar window."""
+        self.log("Scheduling tasks into free time...")
 
-        # Simple priority ordering (rule-based)
-        prioritized = [
-            "(1) Pay electricity bill",
-            "(1) Update resume",
-            "(2) Deep clean kitchen",
-            "(2) Call parents",
-            "(3) Read 20 pages of a book"
-        ]
-        return prioritized
+        start, end = (date.fromisoformat(d) for d in calendar["window"])
+        scheduled, unscheduled = schedule_tasks(
+            tasks, calendar["index"], start, (end - start).days, personality, prefs
+        )
+        return {"scheduled": scheduled, "unscheduled": unscheduled}
 
 
 class CalendarManager(BaseTool):
     """
     Merges generated content with static or external events.
+    Routine blocks and events are loaded into a CalendarIndex so the merged
+    schedule can be checked for conflicts and searched for free time.
     """
 
-    def merge_with_events(self, routine_text: str) -> dict:
+    DEFAULT_EVENTS = [
+        "2025-11-28 10:00 Team standup meeting (Online)",
+        "2025-11-29 14:00 Doctor appointment (Clinic)"
+    ]
+
+    @traced
+    def merge_with_events(
+        self,
+        routine_text: str,
+        events: List[str] | None = None,
+        start_date: date | None = None,
+        days: int = 7,
+        ics_path: str | None = None,
+        ics: IcsCalendar | None = None
+    ) -> dict:
+        """
+        Merge the routine with `events` and the user's calendar over `days`
+        days from `start_date`. The calendar is `ics` if given (e.g. one
+        loaded for a whole multi-week plan), else load_ics(ics_path).
+        """
         self.log("Merging routine with calendar events...")
 
-        events = [
-            "2025-11-28 10:00 Team standup meeting (Online)",
-            "2025-11-29 14:00 Doctor appointment (Clinic)"
-        ]
+        if ics is None and ics_path:
+            ics = load_ics(ics_path)
+        if events is None:
+            # The demo events only stand in for a calendar the user did not give
+            events = [] if ics else self.DEFAULT_EVENTS
+        events = list(events)
+        parsed = [iv for iv in (parse_event(e) for e in events) if iv is not None]
+        if start_date is None:
+            # Plan the week containing the first event (or, with an .ics feed, the current week)
+            first = date.today() if ics else min((iv.start.date() for iv in parsed), default=date.today())
+            start_date = first - timedelta(days=first.weekday())
+        end_date = start_date + timedelta(days=days)
+
+        index = CalendarIndex()
+        index.add_routine(routine_text, start_date, days)
+        index.add_all(iv for iv in parsed if iv.start.date() < end_date and iv.end.date() >= start_date)
+
+        if ics:
+            # The file is parsed once per version; each window is a lookup
+            imported = ics.between(start_date, end_date)
+            skipped = f", skipped {len(ics.skipped)} malformed" if ics.skipped else ""
+            self.log(f"Imported {len(imported)} events from {ics.path}{skipped}")
+            index.add_all(imported)
+            events.extend(str(iv) for iv in imported)
 
         return {
             "routine": routine_text,
-            "events": events
+            "events": events,
+            "window": (start_date.isoformat(), end_date.isoformat()),
+            "conflicts": [
+                f"{a} ⟷ {b}" for a, b in index.conflicts(start_date, end_date)
+                if not self._expected_overlap(a, b)
+            ],
+            "index": index
         }
 
+    @staticmethod
+    def _expected_overlap(a: Interval, b: Interval) -> bool:
+        # Meetings and appointments during work hours are normal, not conflicts.
+        return {a.kind, b.kind} == {"work", "event"}
+
+
+_PLAIN_TYPES = {str, int, float, bool, type(None)}
+
+
+def _snapshot(value: Any) -> Any:
+    """
+    Private copy of section inputs: dicts, lists and tuples are copied all
+    the way down, other values are kept as they are. Strings are shared
+    rather than copied. The copy has the same types as the inputs, so
+    checking whether they still match is a plain == that runs in C and
+    allocates nothing; only a section that is rendered pays for a copy.
+    """
+    # Containers of plain values (task and event lines, one day's meals) are copied in C
+    if isinstance(value, dict):
+        if set(map(type, value.values())) <= _PLAIN_TYPES:
+            return value.copy()
+        return {k: _snapshot(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if set(map(type, value)) <= _PLAIN_TYPES:
+            return value[:]
+        return type(value)(map(_snapshot, value))
+    return value
+
 
 class MarkdownBuilder(BaseTool):
     """
     Assembles the final life plan into a Markdown document.
+    Each section has its own renderer that writes into a buffer, so render
+    cost stays linear in plan size. Rendered sections are remembered with a
+    snapshot of their inputs (see _snapshot) and reused while the inputs
+    still match it, whether they are new objects or were edited in place.
+    Callers that track changes themselves can pass a version stamp instead,
+    which skips the snapshot.
+    Sections can also be rendered one at a time for streaming
+    (see OrchestratorAgent.stream_pipeline).
     """
 
-    def build_markdown(
-        self,
-        prefs: dict,
-        personality: dict,
-        routine: str,
-        meals: dict,
-        shopping: List[str],
-        tasks: Union[List[str], str],
-        calendar: dict
-    ) -> str:
-        self.log("Building final markdown...")
-
-        md = f"# Agent LifeNavigator – Weekly Plan for {prefs.get('name', 'User')}\n\n"
+    ROUTINE_HEADING = "## 2. Daily Routine\n"
+    MEALS_HEADING = "## 3. Weekly Meal Plan\n"
+    TASKS_HEADING = "## 5. Optimized Tasks\n"
 
-        md += "## 1. Personalized Profile Summary\n"
+    def __init__(self, name: str):
+        super().__init__(name)
+        # section -> (version stamp or input snapshot, text)
+        self._rendered: Dict[str, Tuple[Any, str]] = {}
+        self.rerendered: List[str] = []
+
+    def _section(self, key: str, writer: Callable[..., None], *inputs, version: Any = None) -> str:
+        token = ("version", version) if version is not None else ("inputs", inputs)
+        cached = self._rendered.get(key)
+        if cached is not None and cached[0] == token:
+            return cached[1]
+
+        if version is None:
+            token = ("inputs", _snapshot(inputs))
+        buf = io.StringIO()
+        writer(buf, *inputs)
+        text = buf.getvalue()
+        self._rendered[key] = (token, text)
+        self.rerendered.append(key)
+        return text
+
+    def _write_header(self, out: IO[str], prefs: dict, personality: dict):
+        out.write(f"# Agent LifeNavigator – Weekly Plan for {prefs.get('name', 'User')}\n\n")
+        out.write("## 1. Personalized Profile Summary\n")
         for k, v in personality.items():
-            md += f"- **{k}**: {v}\n"
-        md += "\n"
-
-        md += "## 2. Daily Routine\n"
-        md += routine + "\n\n"
+            out.write(f"- **{k}**: {v}\n")
+        out.write("\n")
 
-        md += "## 3. Weekly Meal Plan\n"
+    def _write_meals(self, out: IO[str], meals: dict):
+        out.write(self.MEALS_HEADING)
         for day, plan in meals.items():
-            md += f"### {day}\n"
+            out.write(f"### {day}\n")
             if isinstance(plan, dict):
                 for meal_type, item in plan.items():
-                    md += f"- **{meal_type}**: {item}\n"
+                    out.write(f"- **{meal_type}**: {item}\n")
             else:
                 # LLM-generated text block
-                md += plan + "\n"
-            md += "\n"
+                out.write(plan + "\n")
+            out.write("\n")
 
-        md += "## 4. Shopping List\n"
+    def _write_shopping(self, out: IO[str], shopping: List[str]):
+        out.write("## 4. Shopping List\n")
         for item in shopping:
-            md += f"- {item}\n"
-        md += "\n"
-
-        md += "## 5. Optimized Tasks\n"
-        if isinstance(tasks, list):
+            out.write(f"- {item}\n")
+        out.write("\n")
+
+    def _write_task_items(self, out: IO[str], tasks: Union[dict, List[str], str]):
+        if isinstance(tasks, dict):
+            # Output of TaskOptimizer.schedule_tasks
+            for item in tasks["scheduled"]:
+                out.write(f"- {item}\n")
+            if tasks["unscheduled"]:
+                out.write("\n**Carried over (no free time left this week):**\n")
+                for item in tasks["unscheduled"]:
+                    out.write(f"- {item}\n")
+        elif isinstance(tasks, list):
             for item in tasks:
-                md += f"- {item}\n"
+                out.write(f"- {item}\n")
         else:
-            md += tasks + "\n"
-        md += "\n"
-
-        md += "## 6. Calendar Schedule\n"
-        for event in calendar["events"]:
-            md += f"- {event}\n"
+            out.write(tasks + "\n")
+
+    def _write_calendar(self, out: IO[str], events: List[str]):
+        out.write("## 6. Calendar Schedule\n")
+        for event in events:
+            out.write(f"- {event}\n")
+        out.write("\n---\nGenerated by Agent LifeNavigator.\n")
+
+    def write_week(self, out: IO[str], week: WeekPlan):
+        """One week of a multi-week plan (see OrchestratorAgent.stream_weeks)."""
+        out.write(f"## Week {week.number}: {week.start:%a %d %b} – {week.end:%a %d %b %Y}\n\n")
+        out.write("### Meals\n")
+        for day, plan in week.meals.items():
+            if isinstance(plan, dict):
+                out.write(f"#### {day}\n")
+                for meal_type, item in plan.items():
+                    out.write(f"- **{meal_type}**: {item}\n")
+            else:
+                out.write(plan + "\n")
+            out.write("\n")
+        out.write("### Shopping List\n")
+        for item in week.shopping:
+            out.write(f"- {item}\n")
+        out.write("\n### Tasks\n")
+        for item in week.schedule["scheduled"] or ["Nothing scheduled"]:
+            out.write(f"- {item}\n")
+        if week.carried:
+            out.write("\n**Carried over to next week:**\n")
+            for item in week.carried:
+                out.write(f"- {item}\n")
+        if week.missed:
+            out.write("\n**Missed deadline:**\n")
+            for item in week.missed:
+                out.write(f"- {item}\n")
+        out.write("\n### Calendar\n")
+        for event in week.events:
+            out.write(f"- {event}\n")
+        out.write("\n")
+
+    def render_header(self, prefs: dict, personality: dict) -> str:
+        # The header's inputs are a few short fields, so they are their own version
+        version = (prefs.get("name", "User"), tuple(personality.items()))
+        return self._section("header", self._write_header, prefs, personality, version=version)
+
+    def render_routine(self, routine: str) -> str:
+        return self.ROUTINE_HEADING + routine + "\n\n"
+
+    def render_meals(self, meals: dict, version: Any = None) -> str:
+        return self._section("meals", self._write_meals, meals, version=version)
+
+    def render_shopping(self, shopping: List[str], version: Any = None) -> str:
+        return self._section("shopping", self._write_shopping, shopping, version=version)
+
+    def render_task_items(self, tasks: Union[dict, List[str], str], version: Any = None) -> str:
+        return self._section("tasks", self._write_task_items, tasks, version=version)
+
+    def render_tasks(self, tasks: Union[dict, List[str], str], version: Any = None) -> str:
+        return self.TASKS_HEADING + self.render_task_items(tasks, version) + "\n"
+
+    def render_calendar(self, calendar: dict, version: Any = None) -> str:
+        return self._section("calendar", self._write_calendar, calendar["events"], version=version)
+
+    def write_markdown(
+        self,
+        out: IO[str],
+        prefs: dict,
+        personality: dict,
+        routine: str,
+        meals: dict,
+        shopping: List[str],
+        tasks: Union[dict, List[str], str],
+        calendar: dict,
+        versions: Dict[str, Any] | None = None
+    ):
+        """
+        Write the full document to `out`, re-rendering only sections whose
+        inputs changed. `versions` optionally maps "meals", "shopping",
+        "tasks" and "calendar" to version stamps for their inputs.
+        """
+        versions = versions or {}
+        self.rerendered = []
+        out.write(self.render_header(prefs, personality))
+        out.write(self.ROUTINE_HEADING)
+        out.write(routine)
+        out.write("\n\n")
+        out.write(self.render_meals(meals, versions.get("meals")))
+        out.write(self.render_shopping(shopping, versions.get("shopping")))
+        out.write(self.TASKS_HEADING)
+        out.write(self.render_task_items(tasks, versions.get("tasks")))
+        out.write("\n")
+        out.write(self.render_calendar(calendar, versions.get("calendar")))
+
+    @traced
+    def build_markdown(
+        self,
+        prefs: dict,
+        personality: dict,
+        routine: str,
+        meals: dict,
+        shopping: List[str],
+        tasks: Union[dict, List[str], str],
+        calendar: dict,
+        versions: Dict[str, Any] | None = None
+    ) -> str:
+        self.log("Building final markdown...")
 
-        md += "\n---\nGenerated by Agent LifeNavigator.\n"
-        return md
+        buf = io.StringIO()
+        self.write_markdown(buf, prefs, personality, routine, meals, shopping, tasks, calendar, versions)
+        return buf.getvalue()
@@ -0,0 +1,303 @@
+# tracing.py
+"""
+Lightweight spans and metrics for the planning pipeline.
+
+Agent and tool methods decorated with @traced, every StageGraph stage and
+every LLM call open a span. A span records its start and end time,
+duration, parent, and attributes such as LLM latency, token counts, cache
+result, fallback decisions and re-requests of sections that failed
+validation. Finished spans can be
+- appended to a JSON-lines file (enable(path=...)), and
+- aggregated into Prometheus-style metrics (prometheus_text()).
+
+Tracing is off by default. While it is off, span() returns a shared no-op
+object and @traced calls straight through, so the cost is one flag check.
+The current span lives in a ContextVar; StageGraph and resilience copy the
+context into their worker threads so child spans find their parent.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from config import METRICS_PATH, TRACE_ENABLED, TRACE_PATH
+
+_enabled = False
+_current: contextvars.ContextVar = contextvars.ContextVar("lifenavigator_span", default=None)
+_ids = iter(range(1, 1 << 62))
+_ids_lock = threading.Lock()
+
+# Histogram buckets for span durations, in seconds
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _next_id() -> int:
+    with _ids_lock:
+        return next(_ids)
+
+
+class Span:
+    """One timed operation. Attributes are plain JSON-serialisable values."""
+
+    __slots__ = ("name", "span_id", "parent_id", "trace_id", "start", "end", "attributes", "events", "_token")
+
+    def __init__(self, name: str, parent: "Span | None" = None, **attributes):
+        self.name = name
+        self.span_id = _next_id()
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        # The stage a span runs under is inherited, so LLM spans can be attributed to it
+        if parent is not None and "stage" in parent.attributes and "stage" not in attributes:
+            attributes["stage"] = parent.attributes["stage"]
+        self.attributes: Dict[str, Any] = attributes
+        self.events: List[Tuple[float, str]] = []
+        self.start = time.time()
+        self.end: float | None = None
+        self._token = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def event(self, message: str):
+        self.events.append((time.time(), message))
+
+    def finish(self, error: BaseException | None = None):
+        if self.end is not None:
+            return
+        self.end = time.time()
+        if error is not None:
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        _collector.record(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "events": [{"time": t, "message": m} for t, m in self.events],
+        }
+
+    # Used as a context manager, the span is also the current span inside the block
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.finish(exc)
+        return False
+
+
+class _NoopSpan:
+    """Stands in for Span while tracing is disabled."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def event(self, message: str):
+        pass
+
+    def finish(self, error: BaseException | None = None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Collector:
+    """Receives finished spans: writes them as JSON lines and folds them into metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self.durations: Dict[str, List[float]] = {}  # span name -> [bucket counts..., sum, count]
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def open(self, path: str | None):
+        with self._lock:
+            if self._file:
+                self._file.close()
+            self._file = open(path, "a") if path else None
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _count(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def record(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) if self._file else None
+        attrs = span.attributes
+        duration = span.duration
+        with self._lock:
+            if line:
+                self._file.write(line + "\n")
+                self._file.flush()
+            hist = self.durations.setdefault(span.name, [0] * (len(DURATION_BUCKETS) + 2))
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    hist[i] += 1
+            hist[-2] += duration
+            hist[-1] += 1
+
+            stage = attrs.get("stage", "")
+            if "cache" in attrs:
+                self._count("lifenavigator_llm_cache_total", result=attrs["cache"], stage=stage)
+            for kind in ("prompt", "output"):
+                tokens = attrs.get(f"{kind}_tokens")
+                if tokens:
+                    self._count("lifenavigator_llm_tokens_total", tokens, kind=kind, stage=stage)
+            if "fallback" in attrs:
+                self._count("lifenavigator_fallbacks_total", stage=stage)
+            if "repairs" in attrs:
+                self._count("lifenavigator_section_repairs_total", attrs["repairs"], stage=stage)
+            if "error" in attrs:
+                self._count("lifenavigator_span_errors_total", span=span.name)
+
+    def reset(self):
+        with self._lock:
+            self.durations.clear()
+            self.counters.clear()
+
+
+_collector = Collector()
+
+
+def enable(path: str | None = None):
+    """Turn tracing on; finished spans are appended to `path` as JSON lines if given."""
+    global _enabled
+    _collector.open(path)
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    _collector.close()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def current_span():
+    """The innermost active span, or the no-op span."""
+    return (_current.get() or NOOP_SPAN) if _enabled else NOOP_SPAN
+
+
+def span(name: str, **attributes):
+    """
+    Open a child of the current span. As a context manager it is the current
+    span inside the block:
+
+        with tracing.span("MealPlanner.generate_meal_plan", use_llm=True) as sp:
+            sp.set(recipes=36)
+
+    Without `with` it does not become current and must be finish()ed, which
+    suits work spread over a generator's lifetime.
+    """
+    if not _enabled:
+        return NOOP_SPAN
+    return Span(name, _current.get(), **attributes)
+
+
+def annotate(**attributes):
+    """Set attributes on the current span (no-op when disabled or outside a span)."""
+    if _enabled:
+        current = _current.get()
+        if current is not None:
+            current.set(**attributes)
+
+
+def traced(func: Callable) -> Callable:
+    """
+    Method decorator for agents and tools: each call runs in a span named
+    "<self.name>.<method>".
+    """
+    operation = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not _enabled:
+            return func(self, *args, **kwargs)
+        with Span(f"{self.name}.{operation}", _current.get()):
+            return func(self, *args, **kwargs)
+    return wrapper
+
+
+def run_in_context(func: Callable, *args, **kwargs):
+    """Bind func to a copy of the caller's context, for running it on another thread."""
+    ctx = contextvars.copy_context()
+    return functools.partial(ctx.run, func, *args, **kwargs)
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def prometheus_text() -> str:
+    """All metrics so far, in the Prometheus text exposition format."""
+    lines = [
+        "# HELP lifenavigator_span_duration_seconds Duration of agent, tool, stage and LLM spans.",
+        "# TYPE lifenavigator_span_duration_seconds histogram",
+    ]
+    with _collector._lock:
+        durations = {name: list(hist) for name, hist in _collector.durations.items()}
+        counters = dict(_collector.counters)
+    for name in sorted(durations):
+        hist = durations[name]
+        for bound, count in zip(DURATION_BUCKETS, hist):
+            lines.append(f'lifenavigator_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+        lines.append(f'lifenavigator_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {hist[-1]}')
+        lines.append(f'lifenavigator_span_duration_seconds_sum{{span="{name}"}} {hist[-2]:.6f}')
+        lines.append(f'lifenavigator_span_duration_seconds_count{{span="{name}"}} {hist[-1]}')
+
+    seen = set()
+    for (metric, labels), value in sorted(counters.items()):
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: str | None = None):
+    """Write prometheus_text() to `path` (default METRICS_PATH), e.g. for a node_exporter textfile collector."""
+    path = path or METRICS_PATH
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+if TRACE_ENABLED:
+    enable(TRACE_PATH)
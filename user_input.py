@@ -51,6 +51,7 @@ def ask_user_interactively() -> dict:
     budget = input("Budget level (low/medium/high, default medium): ").strip() or "medium"
     avoid_raw = input("Ingredients to avoid (comma separated, optional): ").strip()
     avoid_list = [a.strip() for a in avoid_raw.split(",")] if avoid_raw else []
+    calendar_ics = input("Path to a calendar export (.ics, optional): ").strip()
 
     return {
         "name": name,
@@ -63,5 +64,6 @@ def ask_user_interactively() -> dict:
         "wants_skincare": wants_skincare,
         "diet_type": diet,
         "budget_level": budget,
-        "avoid_ingredients": avoid_list
+        "avoid_ingredients": avoid_list,
+        "calendar_ics": calendar_ics or None
     }
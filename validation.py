@@ -1,47 +1,218 @@
 """
 validation.py
 
-Lightweight validation functions that simulate LoopAgent validators.
+Checks for generated plan sections, used by OrchestratorAgent to catch a
+malformed LLM answer and re-request only that section.
+
+Each check parses a section into structured form and returns a list of
+problems (empty = valid). The problems double as repair instructions for
+the follow-up prompt (see repair_note()). Each line is matched once with
+a precompiled, anchored regex and the overlap check is a single pass over
+the sorted blocks, so a section is checked in tens of microseconds and
+the checks can run on every plan of a batch.
 """
 
 from __future__ import annotations
-from typing import Any, Dict, List
 
+import re
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from calendar_engine import DEFAULT_BLOCK
+from recipes import DAYS, MEAL_TYPES
+from task_engine import Task, load_tasks
+
+# A routine needs at least this many timed blocks
+ROUTINE_MIN_BLOCKS = 3
+# Task priorities run from 1 (highest) to this
+LOWEST_PRIORITY = 5
+# At most this many problems are listed in a repair prompt
+MAX_LISTED_PROBLEMS = 8
+
+# The lines CalendarIndex reads as routine blocks: "07:00–07:30 Wake up",
+# "- 18:00 - 19:00: Gym", "23:00 Wind down"
+_ROUTINE_LINE = re.compile(r"[-*• \t]*(\d{1,2}):(\d{2})(?:[ \t]*(?:[–—-]|to)[ \t]*(\d{1,2}):(\d{2}))?[ \t]*:?(.*)")
+# Day headings ("Monday:", "### Tuesday", "**Wednesday**") and meal lines
+# ("- Breakfast: Oats", "* **Lunch:** Dal") of a free-text meal plan
+_MEAL_LINE = re.compile(
+    rf"[-*#>_ \t]*(?:({'|'.join(DAYS)})\b(?:[ \t]*\([^)\n]*\))?[*_ \t]*:?[*_ \t]*$"
+    rf"|({'|'.join(MEAL_TYPES)})\b[*_ \t]*[:–—-](.*))",
+    re.IGNORECASE
+)
+_DAY_NAMES = {day.lower(): day for day in DAYS}
+_MEAL_NAMES = {meal.lower(): meal for meal in MEAL_TYPES}
+_DEFAULT_MINUTES = int(DEFAULT_BLOCK.total_seconds() // 60)
+
+
+def _clock(minutes: int) -> str:
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
 
-def validate_routine(routine: Dict[str, Any]) -> bool:
+
+def parse_routine(text: str) -> Tuple[List[Tuple[int, int, str]], List[str]]:
     """
-    Checks that routine has at least 3 daily blocks and sensible times.
+    Routine text as (start, end, title) blocks in minutes after midnight,
+    plus problems with the times themselves. A block that ends before it
+    starts runs past midnight; a single time is a 30 minute block, as in
+    CalendarIndex.
     """
-    daily = routine.get("daily", [])
-    if not daily or len(daily) < 3:
-        return False
+    blocks = []
+    problems = []
+    for match in map(_ROUTINE_LINE.match, text.splitlines()):
+        if match is None:
+            continue
+        h1, m1, h2, m2, title = match.groups()
+        title = title.strip()
+        hour, minute = int(h1), int(m1)
+        if hour > 23 or minute > 59:
+            problems.append(f"invalid start time {h1}:{m1} ({title})")
+            continue
+        start = hour * 60 + minute
+        if h2 is None:
+            end = start + _DEFAULT_MINUTES
+        else:
+            hour, minute = int(h2), int(m2)
+            if hour > 24 or minute > 59:
+                problems.append(f"invalid end time {h2}:{m2} ({title})")
+                continue
+            end = hour * 60 + minute
+            if end <= start:
+                end += 24 * 60
+        blocks.append((start, end, title))
+    return blocks, problems
+
+
+def routine_problems(text: str) -> List[str]:
+    """Too few timed blocks, impossible times, or blocks that overlap."""
+    blocks, problems = parse_routine(text)
+    if len(blocks) < ROUTINE_MIN_BLOCKS:
+        problems.append(
+            f"only {len(blocks)} timed blocks; give at least {ROUTINE_MIN_BLOCKS} as HH:MM–HH:MM lines"
+        )
+        return problems
+
+    blocks.sort()
+    latest = blocks[0]
+    for block in blocks[1:]:
+        if block[0] < latest[1]:
+            problems.append(
+                f"{_clock(block[0])}–{_clock(block[1])} {block[2]} overlaps "
+                f"{_clock(latest[0])}–{_clock(latest[1])} {latest[2]}"
+            )
+        if block[1] > latest[1]:
+            latest = block
+    # A block running past midnight must end before the first one of the day
+    if latest[1] - 24 * 60 > blocks[0][0] and latest is not blocks[0]:
+        first = blocks[0]
+        problems.append(
+            f"{_clock(latest[0])}–{_clock(latest[1])} {latest[2]} runs into "
+            f"{_clock(first[0])}–{_clock(first[1])} {first[2]}"
+        )
+    return problems
+
 
-    # Check basic structure
-    for block in daily:
-        if not all(k in block for k in ("start", "end", "task")):
-            return False
-    return True
+def parse_meal_text(text: str) -> Dict[str, Dict[str, str]]:
+    """A free-text "Monday:\\n- Breakfast: ..." plan as {day: {meal: dish}}."""
+    plan: Dict[str, Dict[str, str]] = {}
+    day = None
+    for match in map(_MEAL_LINE.match, text.splitlines()):
+        if match is None:
+            continue
+        day_name, meal, dish = match.groups()
+        if day_name:
+            day = plan.setdefault(_DAY_NAMES[day_name.lower()], {})
+        elif day is not None:
+            day[_MEAL_NAMES[meal.lower()]] = dish.strip("*_ \t")
+    return plan
 
 
-def validate_meal_plan(meal_plan: Dict[str, Any]) -> bool:
+def meal_plan_problems(meal_plan: Dict[str, Any]) -> List[str]:
     """
-    Checks that all 7 days exist in the plan.
+    Missing days, missing meals and empty dishes. Values may be
+    {meal: dish} dicts or LLM text blocks, which are parsed first.
     """
-    required_days = {
-        "Monday",
-        "Tuesday",
-        "Wednesday",
-        "Thursday",
-        "Friday",
-        "Saturday",
-        "Sunday",
-    }
-    return required_days.issubset(set(meal_plan.keys()))
+    days: Dict[str, Dict[str, str]] = {}
+    for key, value in meal_plan.items():
+        if isinstance(value, str):
+            days.update(parse_meal_text(value))
+        elif isinstance(value, dict):
+            days[_DAY_NAMES.get(str(key).lower(), key)] = value
 
+    problems = []
+    missing = [day for day in DAYS if day not in days]
+    if missing:
+        problems.append(f"missing days: {', '.join(missing)}")
+    for day in DAYS:
+        meals = days.get(day)
+        if meals is None:
+            continue
+        absent = [meal for meal in MEAL_TYPES if meal not in meals]
+        if absent:
+            problems.append(f"{day} has no {' or '.join(absent)}")
+        empty = [meal for meal in MEAL_TYPES if meal in meals and not str(meals[meal]).strip()]
+        if empty:
+            problems.append(f"{day} has an empty {' and '.join(empty)}")
+    return problems
 
-def validate_schedule_merge(merged: Dict[str, Any]) -> bool:
+
+def task_problems(tasks: Sequence[Task], known: Iterable[Task] = ()) -> List[str]:
+    """No tasks, dropped or duplicated tasks, or priorities out of range."""
+    if not tasks:
+        return ["no tasks"]
+    problems = []
+    seen = set()
+    for task in tasks:
+        title = task.title.lower()
+        if title in seen:
+            problems.append(f"duplicate task: {task.title}")
+        seen.add(title)
+        if not 1 <= task.priority <= LOWEST_PRIORITY:
+            problems.append(f"priority {task.priority} of {task.title} is outside 1–{LOWEST_PRIORITY}")
+    dropped = [t.title for t in known if t.title.lower() not in seen]
+    if dropped:
+        problems.append(f"dropped tasks: {', '.join(dropped)}")
+    return problems
+
+
+def calendar_problems(merged: Dict[str, Any]) -> List[str]:
+    """
+    A merged schedule (CalendarManager.merge_with_events) without routine
+    blocks, and every pair of blocks or events that conflict in it.
+    """
+    problems = []
+    if not str(merged.get("routine") or "").strip():
+        problems.append("no routine in the merged schedule")
+    problems.extend(f"conflict: {conflict}" for conflict in merged.get("conflicts", ()))
+    return problems
+
+
+def section_problems(section: str, result: Any, prefs: dict | None = None) -> List[str]:
     """
-    In a real system, this would check for conflicts.
-    For now just ensures routine exists.
+    Problems with one stage's output: routine text, (meals, shopping), a
+    task list or the merged calendar. `prefs` supplies the user's own
+    tasks, which must all be kept.
     """
-    return "routine" in merged and "daily" in merged["routine"]
+    if section == "routine":
+        return routine_problems(result)
+    if section == "meals":
+        meals, shopping = result
+        problems = meal_plan_problems(meals)
+        if not shopping:
+            problems.append("empty shopping list")
+        return problems
+    if section == "tasks":
+        return task_problems(result, load_tasks((prefs or {}).get("tasks")))
+    if section == "calendar":
+        return calendar_problems(result)
+    raise ValueError(f"No validator for section {section!r}")
+
+
+def repair_note(problems: Sequence[str] | None) -> str:
+    """Prompt addendum asking the model to fix the problems found in its previous answer."""
+    if not problems:
+        return ""
+    listed = "\n".join(f"- {p}" for p in problems[:MAX_LISTED_PROBLEMS])
+    return (
+        "\nYour previous answer had these problems:\n"
+        f"{listed}\n"
+        "Return the complete answer again, in the same format, with them fixed.\n"
+    )
+